@@ -0,0 +1,319 @@
+#Headless batch computation of geodesic bezier curves
+#Standalone:  python batch.py mesh.obj curves.json -o curves.npz --workers 8
+#Blender:     blender scene.blend --background --python batch.py -- -o curves.npz
+#Export:      blender scene.blend --background --python batch.py -- -o curves --export --format raw
+#In Blender the control points are read from Scene.obj_curves, one output file per object (curves_<key>.npz)
+#
+#Input curves, JSON: {"curves": [{"points": [[face, u, v], ...]}, ...]} or a list of point lists
+#              NPZ:  faces (P), uvs (P, 2), offsets (N+1), points of curve i are [offsets[i], offsets[i+1])
+#Output NPZ with the same layout: faces, uvs, offsets of the curve polylines, positions (M, 3) in mesh coordinates
+#Export: segment samples of the stored curves with the scene params, see pack_samples, as NPZ or raw memory-mappable
+#arrays with a JSON offset table (see save_raw)
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+import subprocess
+import numpy as np
+
+import engine
+
+dir = os.path.dirname(os.path.abspath(__file__))
+ENGINE = os.path.join(dir, "bezier", "bin", "splinegui.exe")
+
+#----------INPUT/OUTPUT--------------------------------------------------
+
+#Triangle mesh from obj file
+#Output: vertices (V, 3), triangles (F, 3) with 0-based indices
+def load_obj(path):
+    vertices = []
+    triangles = []
+    with open(path) as f:
+        for line in f:
+            tokens = line.split()
+            if len(tokens) == 0: continue
+            if tokens[0] == 'v': vertices.append([float(x) for x in tokens[1:4]])
+            elif tokens[0] == 'f': triangles.append([int(x.split('/')[0]) - 1 for x in tokens[1:4]])
+    return np.array(vertices, dtype=np.float64), np.array(triangles, dtype=np.int64)
+
+#Output: list of control points of each curve, as (face, u, v) arrays
+def load_curves(path):
+    if path.endswith(".npz"):
+        data = np.load(path)
+        faces, uvs, offsets = data["faces"], data["uvs"], data["offsets"]
+        return [[(int(faces[k]), float(uvs[k][0]), float(uvs[k][1])) for k in range(offsets[i], offsets[i+1])]
+            for i in range(len(offsets) - 1)]
+    with open(path) as f:
+        data = json.load(f)
+    if isinstance(data, dict): data = [curve["points"] for curve in data["curves"]]
+    return [[(int(p[0]), float(p[1]), float(p[2])) for p in curve] for curve in data]
+
+#Polylines in barycentric coords as bulk arrays, positions if the mesh is given
+def pack_polylines(polylines, vertices = None, triangles = None):
+    offsets = np.zeros(len(polylines) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(poly) for poly in polylines])
+    points = np.array([p for poly in polylines for p in poly], dtype=np.float64).reshape(-1, 3)
+    out = {
+        "faces": points[:, 0].astype(np.int32),
+        "uvs": points[:, 1:].astype(np.float32),
+        "offsets": offsets
+    }
+    if vertices is not None:
+        tri = vertices[triangles[out["faces"]]] #(M, 3 corners, 3)
+        u, v = points[:, 1:2], points[:, 2:3]
+        out["positions"] = (tri[:, 0]*(1-u-v) + tri[:, 1]*u + tri[:, 2]*v).astype(np.float32)
+    return out
+
+#Segment samples of several curves as bulk arrays
+#caches: (faces, samples, offsets) of each curve, see utils.load_cache
+#convert: world coords of (faces, uvs), see utils.bary_converter
+#Output: faces (P), uvs (P, 2), params (P) and lengths (P) along each segment, positions (P, 3) in world coordinates,
+#segment_offsets (S+1) with the samples of segment j in [segment_offsets[j], segment_offsets[j+1]),
+#curve_offsets (N+1) with the segments of curve i in [curve_offsets[i], curve_offsets[i+1]), closed (N)
+def pack_samples(caches, convert, closed):
+    faces = np.concatenate([cache[0] for cache in caches])
+    samples = np.concatenate([cache[1] for cache in caches])
+    starts = np.zeros(len(caches) + 1, dtype=np.int64)
+    starts[1:] = np.cumsum([len(cache[0]) for cache in caches])
+    segment_offsets = np.concatenate([cache[2][:-1].astype(np.int64) + start for cache, start in zip(caches, starts)]
+        + [starts[-1:]])
+    curve_offsets = np.zeros(len(caches) + 1, dtype=np.int64)
+    curve_offsets[1:] = np.cumsum([len(cache[2]) - 1 for cache in caches])
+    return {
+        "faces": faces,
+        "uvs": samples[:, :2],
+        "params": samples[:, 2],
+        "lengths": samples[:, 3],
+        "positions": convert(faces, samples[:, :2]).astype(np.float32),
+        "segment_offsets": segment_offsets,
+        "curve_offsets": curve_offsets,
+        "closed": np.array(closed, dtype=np.uint8)
+    }
+
+#Raw little endian arrays one after the other in base.bin, each one aligned to RAW_ALIGN bytes, with their
+#offset table in base.json: {"file": "base.bin", "arrays": {name: {"dtype", "shape", "offset"}}}
+#Consumers map each array with np.memmap(file, dtype, 'r', offset, shape)
+RAW_ALIGN = 64
+
+def save_raw(base, arrays):
+    table = {}
+    with open(base + ".bin", "wb") as f:
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder('<'))
+            f.write(b"\0" * (-f.tell() % RAW_ALIGN))
+            table[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": f.tell()}
+            array.tofile(f)
+    with open(base + ".json", 'w') as f:
+        json.dump({"file": os.path.basename(base) + ".bin", "arrays": table}, f, indent=1)
+
+#fmt: "npz" or "raw"
+#Output: file written, the offset table for raw arrays
+def save_arrays(base, arrays, fmt = "npz"):
+    if fmt == "raw":
+        save_raw(base, arrays)
+        return base + ".json"
+    np.savez(base + ".npz", **arrays)
+    return base + ".npz"
+
+#----------ENGINE POOL---------------------------------------------------
+
+#Engine processes, each one computes in parallel with the others
+#port: of the first engine, the others on the following ports, 0 for ports chosen by the engines
+#The engines already started are closed if one of them fails to start
+class EnginePool:
+    def __init__(self, mesh, workers, port = 0, command = ENGINE):
+        self.processes = []
+        self.conns = []
+        try:
+            for i in range(workers):
+                process = subprocess.Popen([command, mesh, "--port", str(port + i if port else 0)],
+                    universal_newlines=True,
+                    stdout=subprocess.PIPE
+                    )
+                self.processes.append(process)
+            #Engines load the mesh in parallel
+            for process in self.processes:
+                conn = engine.connect(port = engine.wait_ready(process))
+                self.conns.append(conn)
+                engine.handshake(conn)
+        except:
+            self.close()
+            raise
+
+    def set_params(self, algorithm, subdivisions, solver = "dual"):
+        send = engine.params_request(algorithm, subdivisions, solver)
+        for conn in self.conns: conn.discard(conn.send(send))
+
+    def close(self):
+        for conn in self.conns:
+            try:
+                conn.send("k\n")
+                conn.close()
+            except OSError: pass
+        #Engines not connected yet (failed start) do not receive the shutdown request
+        for process in self.processes[len(self.conns):]: process.kill()
+        for process in self.processes: process.wait()
+
+def pbar2str(point):
+    face, u, v = point
+    return str(face) + "\n" + str(u) + "\n" + str(v) + "\n"
+
+#Polyline of a curve with control points [(face, u, v)], segments joined as in EditCurveOperator.write_curve
+#Requests of all the segments are sent before waiting for the first one
+def eval_curve(conn, points):
+    rids = []
+    for first in range(0, len(points) - 3, 3):
+        rids.append(conn.send("".join(pbar2str(p) for p in points[first:first+4])))
+    poly = []
+    for i, rid in enumerate(rids):
+        lines = conn.wait(rid)
+        segment = [(int(c[0]), float(c[1]), float(c[2])) for c in (l.split() for l in lines[1:])]
+        poly += segment if i == 0 else segment[1:]
+    return poly
+
+#Samples of each segment of a curve, as the curve sessions give them (see utils.get_curve_samples)
+#Output: [(polyline [(face, u, v)], (curve parameters, arc lengths))] for each segment
+def eval_curve_samples(conn, points):
+    rids = []
+    for first in range(0, len(points) - 3, 3):
+        rids.append(conn.send("b\n" + "".join(pbar2str(p) for p in points[first:first+4])))
+    segments = []
+    for rid in rids:
+        samples = [l.split() for l in conn.wait(rid)[1:]]
+        segments.append( ([(int(s[0]), float(s[1]), float(s[2])) for s in samples],
+            ([float(s[3]) for s in samples], [float(s[4]) for s in samples])) )
+    return segments
+
+#Evaluate the curves spreading them across the engines, one thread per engine
+#evaluate: eval_curve or eval_curve_samples
+#Output: polyline of each curve in barycentric coords, or what evaluate gives
+def eval_curves(pool, curves, evaluate = eval_curve):
+    todo = queue.Queue()
+    for i in range(len(curves)): todo.put(i)
+    polylines = [None] * len(curves)
+    errors = []
+    def work(conn):
+        while not errors:
+            try: i = todo.get_nowait()
+            except queue.Empty: return
+            try: polylines[i] = evaluate(conn, curves[i])
+            except Exception as e: errors.append(e)
+    threads = [threading.Thread(target=work, args=(conn,)) for conn in pool.conns]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    if errors: raise errors[0]
+    return polylines
+
+def run(mesh, curves, out, args, vertices = None, triangles = None):
+    start = time.perf_counter()
+    pool = EnginePool(mesh, min(args.workers, max(len(curves), 1)), args.port, args.engine)
+    try:
+        pool.set_params(args.algorithm, args.subdivisions, args.solver)
+        polylines = eval_curves(pool, curves)
+    finally: pool.close()
+    np.savez(out, **pack_polylines(polylines, vertices, triangles))
+    elapsed = time.perf_counter() - start
+    print("Curves: ", len(curves), " time: ", round(elapsed, 3), "s, output: ", out)
+
+#----------ENTRY POINTS--------------------------------------------------
+
+#Curves stored in the open .blend file, one output for each object
+#Objects whose topology changed since the curves were drawn, or is unknown (see utils.check_topology), are skipped
+#Output: keys of the skipped objects
+def run_blender(args):
+    import bpy
+    import utils #Registers the Scene.obj_curves properties
+
+    base, ext = os.path.splitext(args.output)
+    skipped = []
+    for item in bpy.context.scene.obj_curves:
+        obj = utils.getObjByKey(item.key)
+        if obj is None or len(item.value) == 0: continue
+        #The faces of the control points are only valid on the mesh they were drawn on
+        if not utils.check_topology(obj, utils.mesh_signature(obj.data)):
+            skipped.append(item.key)
+            continue
+        curves = [[(p.f, p.u, p.v) for p in curve.points_bar] for curve in item.value]
+        mesh = os.path.join(dir, "bezier", "data", "batch_" + item.key + ".obj")
+        utils.save_file(obj.data, mesh)
+        vertices, triangles = load_obj(mesh)
+        run(mesh, curves, base + "_" + item.key + (ext or ".npz"), args, vertices, triangles)
+    return skipped
+
+#Segment samples of the curves stored in the open .blend file, one output for each object (<base>_<key>.npz, or .bin
+#and .json): curves cached with the scene params on the current mesh are exported from the cache, the others are
+#computed by workers engine processes on the exported mesh and cached
+#Objects whose topology changed since the curves were drawn, or is unknown (see utils.check_topology), are skipped
+#Output: files written, keys of the skipped objects
+def export_blender(base, fmt = "npz", workers = os.cpu_count() or 1, port = 0, command = ENGINE):
+    import bpy
+    import utils
+
+    scene = bpy.context.scene
+    written = []
+    skipped = []
+    for item in scene.obj_curves:
+        obj = utils.getObjByKey(item.key)
+        if obj is None or len(item.value) == 0: continue
+        signature = utils.mesh_signature(obj.data)
+        if not utils.check_topology(obj, signature):
+            skipped.append(item.key)
+            continue
+        tag = utils.cache_tag(signature)
+        caches = [utils.load_cache(curve_item, tag) for curve_item in item.value]
+        missing = [i for i, cache in enumerate(caches) if cache is None]
+        if missing:
+            mesh = os.path.join(dir, "bezier", "data", "batch_" + item.key + ".obj")
+            utils.save_file(obj.data, mesh)
+            pool = EnginePool(mesh, min(workers, len(missing)), port, command)
+            try:
+                pool.set_params(scene.spline_algorithm, scene.subdivisions, scene.path_solver)
+                curves = [[(p.f, p.u, p.v) for p in item.value[i].points_bar] for i in missing]
+                results = eval_curves(pool, curves, eval_curve_samples)
+            finally: pool.close()
+            for i, segments in zip(missing, results):
+                utils.store_cache(item.value[i], tag, [poly for poly, table in segments], [table for poly, table in segments])
+                caches[i] = utils.load_cache(item.value[i], tag)
+        arrays = pack_samples(caches, utils.bary_converter(obj), [curve_item.is_closed for curve_item in item.value])
+        arrays["matrix"] = np.array(obj.matrix_world, dtype=np.float32)
+        written.append(save_arrays(base + "_" + item.key, arrays, fmt))
+    return written, skipped
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Headless computation of geodesic bezier curves")
+    parser.add_argument("mesh", nargs="?", help="Triangle mesh (.obj), not needed inside Blender")
+    parser.add_argument("curves", nargs="?", help="Control points (.json or .npz)")
+    parser.add_argument("-o", "--output", default="curves.npz")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of engine processes")
+    parser.add_argument("--port", type=int, default=0, help="Port of the first engine, 0 for any free port")
+    parser.add_argument("--engine", default=ENGINE, help="Engine executable")
+    parser.add_argument("--subdivisions", type=int, default=4)
+    parser.add_argument("--algorithm", choices=engine.ALGORITHMS, default="de_casteljau_uniform")
+    parser.add_argument("--solver", choices=engine.SOLVERS, default="dual", help="Solver of the geodesic paths")
+    parser.add_argument("--export", action="store_true",
+        help="In Blender, export the segment samples of the stored curves with the scene params")
+    parser.add_argument("--format", choices=["npz", "raw"], default="npz", help="Export format")
+    return parser.parse_args(argv)
+
+def main():
+    #Blender passes the script arguments after "--"
+    argv = sys.argv[sys.argv.index("--")+1:] if "--" in sys.argv else sys.argv[1:]
+    args = parse_args(argv)
+    if args.mesh is None and args.export:
+        start = time.perf_counter()
+        written, skipped = export_blender(os.path.splitext(args.output)[0], args.format, args.workers, args.port, args.engine)
+        print("Exported: ", len(written), " objects, time: ", round(time.perf_counter() - start, 3), "s")
+        if skipped: print("Skipped, modified or unknown topology: ", " ".join(skipped))
+        return
+    if args.mesh is None:
+        skipped = run_blender(args)
+        if skipped: print("Skipped, modified or unknown topology: ", " ".join(skipped))
+        return
+    vertices, triangles = load_obj(args.mesh)
+    run(os.path.abspath(args.mesh), load_curves(args.curves), args.output, args, vertices, triangles)
+
+if __name__ == "__main__":
+    main()
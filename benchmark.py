@@ -0,0 +1,168 @@
+#Benchmark of the engine requests over synthetic meshes of increasing size, without Blender
+#python benchmark.py -o results.json --repeat 20
+#Each request is timed from the client (send to complete response) for every mesh, algorithm and subdivision level
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import numpy as np
+
+import engine
+import batch
+
+#----------SYNTHETIC MESHES----------------------------------------------
+
+def icosahedron():
+    t = (1 + 5**0.5) / 2
+    vertices = np.array([[-1, t, 0], [1, t, 0], [-1, -t, 0], [1, -t, 0],
+        [0, -1, t], [0, 1, t], [0, -1, -t], [0, 1, -t],
+        [t, 0, -1], [t, 0, 1], [-t, 0, -1], [-t, 0, 1]], dtype=np.float64)
+    triangles = np.array([[0, 11, 5], [0, 5, 1], [0, 1, 7], [0, 7, 10], [0, 10, 11],
+        [1, 5, 9], [5, 11, 4], [11, 10, 2], [10, 7, 6], [7, 1, 8],
+        [3, 9, 4], [3, 4, 2], [3, 2, 6], [3, 6, 8], [3, 8, 9],
+        [4, 9, 5], [2, 4, 11], [6, 2, 10], [8, 6, 7], [9, 8, 1]], dtype=np.int64)
+    return vertices / np.linalg.norm(vertices, axis=1)[:, None], triangles
+
+#Icosahedron with each triangle split in 4, levels times, projected on the unit sphere
+def icosphere(levels):
+    vertices, triangles = icosahedron()
+    vertices = list(vertices)
+    for level in range(levels):
+        midpoints = {}
+        def midpoint(a, b):
+            key = (min(a, b), max(a, b))
+            if key not in midpoints:
+                p = (vertices[a] + vertices[b]) / 2
+                vertices.append(p / np.linalg.norm(p))
+                midpoints[key] = len(vertices) - 1
+            return midpoints[key]
+        split = []
+        for a, b, c in triangles:
+            ab, bc, ca = midpoint(a, b), midpoint(b, c), midpoint(c, a)
+            split += [[a, ab, ca], [b, bc, ab], [c, ca, bc], [ab, bc, ca]]
+        triangles = np.array(split, dtype=np.int64)
+    return np.array(vertices), triangles
+
+#Torus grid of n x m quads split in triangles, vertices displaced along the tube normal
+def noisy_torus(n, m, noise, rng, radius = 1.0, tube = 0.35):
+    i, j = np.meshgrid(np.arange(n), np.arange(m), indexing="ij")
+    a = 2 * np.pi * i / n
+    b = 2 * np.pi * j / m
+    offset = tube * (1 + noise * rng.uniform(-1, 1, size=a.shape))
+    vertices = np.stack([(radius + offset*np.cos(b)) * np.cos(a),
+        (radius + offset*np.cos(b)) * np.sin(a),
+        offset * np.sin(b)], axis=-1).reshape(-1, 3)
+    idx = lambda i, j: (i % n) * m + (j % m)
+    triangles = []
+    for k in range(n):
+        for l in range(m):
+            triangles.append([idx(k, l), idx(k+1, l), idx(k+1, l+1)])
+            triangles.append([idx(k, l), idx(k+1, l+1), idx(k, l+1)])
+    return vertices, np.array(triangles, dtype=np.int64)
+
+def save_obj(path, vertices, triangles):
+    with open(path, 'w') as f:
+        for x, y, z in vertices: f.write("v " + str(x) + " " + str(y) + " " + str(z) + "\n")
+        for a, b, c in triangles: f.write("f " + str(a+1) + " " + str(b+1) + " " + str(c+1) + "\n")
+
+#Meshes of increasing triangle count: name, vertices, triangles
+def make_meshes(rng, levels):
+    meshes = []
+    for level in range(2, 2 + levels):
+        meshes.append( ("icosphere_" + str(level),) + icosphere(level) )
+    for level in range(levels):
+        n = 16 * 2**level
+        meshes.append( ("torus_" + str(n),) + noisy_torus(n, n // 2, 0.1, rng) )
+    return meshes
+
+#----------REQUESTS------------------------------------------------------
+
+#Random point on a random face, (face, u, v)
+def random_point(rng, n_faces):
+    u, v = rng.uniform(0, 1, size=2)
+    if u + v > 1: u, v = 1 - u, 1 - v
+    return (int(rng.integers(n_faces)), float(u), float(v))
+
+def polygon_str(polygon):
+    return "".join(batch.pbar2str(p) for p in polygon)
+
+#Request of each engine opcode on a random control polygon
+#Output: {opcode name: request}
+def make_requests(rng, n_faces):
+    polygon = [random_point(rng, n_faces) for i in range(4)]
+    return {
+        "bezier_uniform": polygon_str(polygon), #Curve from scratch
+        "compute_geodesic_path": "l\n" + polygon_str(polygon[:2]),
+        "continue_path": "n\n" + polygon_str(polygon[:2]),
+        "curve_samples": "b\n" + polygon_str(polygon), #Segment as sampled in the curve sessions
+    }
+
+def stats(times):
+    times = np.array(times) * 1000
+    return {
+        "n": len(times),
+        "mean_ms": float(times.mean()),
+        "median_ms": float(np.median(times)),
+        "p95_ms": float(np.percentile(times, 95)),
+        "min_ms": float(times.min()),
+        "max_ms": float(times.max())
+    }
+
+#Time every opcode on one engine, requests are sent one at a time to measure latency
+def bench_mesh(conn, rng, n_faces, args):
+    results = []
+    polygon_requests = [make_requests(rng, n_faces) for i in range(args.repeat)]
+    for algorithm in args.algorithms:
+        for subdivisions in range(args.min_subdivisions, args.max_subdivisions + 1):
+            conn.request(engine.params_request(algorithm, subdivisions))
+            times = {}
+            for requests in polygon_requests:
+                for opcode, request in requests.items():
+                    start = time.perf_counter()
+                    conn.request(request)
+                    times.setdefault(opcode, []).append(time.perf_counter() - start)
+            for opcode, opcode_times in times.items():
+                results.append(dict(algorithm=algorithm, subdivisions=subdivisions, opcode=opcode, **stats(opcode_times)))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the engine requests over synthetic meshes")
+    parser.add_argument("-o", "--output", default="benchmark.json")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=10, help="Random control polygons for each configuration")
+    parser.add_argument("--levels", type=int, default=4, help="Mesh sizes for each mesh family")
+    parser.add_argument("--min-subdivisions", type=int, default=1)
+    parser.add_argument("--max-subdivisions", type=int, default=6)
+    parser.add_argument("--algorithms", nargs="+", choices=engine.ALGORITHMS, default=["de_casteljau_uniform", "subdivision_uniform"])
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--engine", default=batch.ENGINE)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    results = {
+        "config": dict(vars(args), platform=platform.platform(), python=sys.version.split()[0]),
+        "meshes": []
+    }
+    for name, vertices, triangles in make_meshes(rng, args.levels):
+        path = os.path.join(batch.dir, "bezier", "data", "bench_" + name + ".obj")
+        save_obj(path, vertices, triangles)
+        start = time.perf_counter()
+        pool = batch.EnginePool(path, 1, args.port, args.engine)
+        load_time = time.perf_counter() - start
+        try: timings = bench_mesh(pool.conns[0], rng, len(triangles), args)
+        finally: pool.close()
+        results["meshes"].append({
+            "name": name,
+            "vertices": len(vertices),
+            "triangles": len(triangles),
+            "load_s": load_time,
+            "timings": timings
+        })
+        print(name, len(triangles), "triangles done")
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=1)
+
+if __name__ == "__main__":
+    main()
@@ -83,7 +83,7 @@ void update_curve_shape(Gui_Spline& spline, const int curve_id,
     points = bezier_adaptive(mesh, polygon, params);
     printf("num points: %d\n", (int)points.size());
   } else if (params.algorithm == spline_algorithm::subdivision_uniform) {
-    points = spline_subdivision_uniform(mesh, polygon, params.subdivisions);
+    points = spline_subdivision_uniform(mesh, polygon, params);
     printf("num points: %d\n", (int)points.size());
   } else if (params.algorithm == spline_algorithm::subdivision_adaptive) {
     points = spline_subdivision_adaptive(mesh, polygon, params);
@@ -170,10 +170,9 @@ void update_curve_shape(Gui_Spline& spline, vector<vec3f>& good_samples,
   } else if (params.algorithm == spline_algorithm::de_casteljau_adaptive) {
     points = bezier_adaptive(mesh, polygon, params);
   } else if (params.algorithm == spline_algorithm::subdivision_uniform) {
-    points = (quadric) ? spline_subdivision_uniform(
-                             mesh, quadric_polygon, params.subdivisions)
-                       : spline_subdivision_uniform(
-                             mesh, polygon, params.subdivisions);
+    points = (quadric)
+                 ? spline_subdivision_uniform(mesh, quadric_polygon, params)
+                 : spline_subdivision_uniform(mesh, polygon, params);
   } else if (params.algorithm == spline_algorithm::subdivision_adaptive) {
     points = spline_subdivision_adaptive(mesh, polygon, params);
   } else if (params.algorithm == spline_algorithm::de_casteljau_classic) {
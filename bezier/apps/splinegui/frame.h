@@ -0,0 +1,140 @@
+#pragma once
+
+#include <cstring>
+#include <string>
+#include <vector>
+
+// Framing of the Blender socket.
+// Request:  "<id> <bytes>\n" followed by the payload, or "<id> <bytes> <ms>\n"
+// when the request must be interrupted if not completed within <ms>
+// milliseconds.
+// Response: zero or more chunks "<id> <bytes> +\n<data>" followed by a final
+// chunk "<id> <bytes> <us>\n<data>"; the payload is the concatenation of the
+// data and <us> is the engine time spent on the request, in microseconds.
+// A final chunk "<id> <bytes> <us> !\n<data>" replaces the chunks already
+// sent: the request failed after part of its response was streamed.
+
+// Largest accepted request payload, bigger lengths are treated as corrupted
+inline const size_t max_frame_size   = size_t(1) << 30;
+inline const size_t max_header_size  = 64;
+inline const size_t frame_chunk_size = size_t(1) << 16;
+
+// Buffered reader of framed requests. Data received after the end of a frame
+// (requests sent without waiting the responses) stays in the buffer.
+struct Frame_Reader {
+  SOCKET       socket = INVALID_SOCKET;
+  vector<char> buffer = vector<char>(frame_chunk_size);
+  size_t       begin  = 0;  // first byte not consumed yet
+  size_t       end    = 0;  // end of received data
+};
+
+// Receive more data in the buffer, compacting consumed bytes first.
+// Output: bytes received, 0 if the peer closed the connection, <0 on errors
+inline int receive(Frame_Reader& reader) {
+  if (reader.begin > 0) {
+    std::memmove(reader.buffer.data(), reader.buffer.data() + reader.begin,
+        reader.end - reader.begin);
+    reader.end -= reader.begin;
+    reader.begin = 0;
+  }
+  if (reader.end == reader.buffer.size())
+    reader.buffer.resize(reader.buffer.size() * 2);
+  return recv(reader.socket, reader.buffer.data() + reader.end,
+      (int)(reader.buffer.size() - reader.end), 0);
+}
+
+// Read the next request. Payloads larger than the buffer are received
+// directly into the request string, without intermediate copies.
+// deadline_ms: time budget of the request, 0 if none
+// Output: 0 on success, 1 if the client closed the connection, -1 on errors
+inline int read_frame(
+    Frame_Reader& reader, int& id, std::string& payload, int& deadline_ms) {
+  // Header
+  auto header_end = (char*)nullptr;
+  while (true) {
+    auto first = reader.buffer.data() + reader.begin;
+    header_end = (char*)std::memchr(first, '\n', reader.end - reader.begin);
+    if (header_end) break;
+    if (reader.end - reader.begin > max_header_size) return -1;
+    auto n = receive(reader);
+    if (n == 0) return 1;
+    if (n < 0) return -1;
+    reader.end += n;
+  }
+  auto header = std::string(reader.buffer.data() + reader.begin, header_end);
+  auto length = (size_t)0;
+  deadline_ms = 0;
+  if (sscanf(header.c_str(), "%d %zu %d", &id, &length, &deadline_ms) < 2)
+    return -1;
+  if (length > max_frame_size) return -1;
+  reader.begin = header_end + 1 - reader.buffer.data();
+
+  // Payload, buffered part first
+  payload.resize(length);
+  auto buffered = std::min(length, reader.end - reader.begin);
+  std::memcpy(payload.data(), reader.buffer.data() + reader.begin, buffered);
+  reader.begin += buffered;
+  for (auto received = buffered; received < length;) {
+    auto n = recv(
+        reader.socket, payload.data() + received, (int)(length - received), 0);
+    if (n == 0) return 1;
+    if (n < 0) return -1;
+    received += n;
+  }
+  return 0;
+}
+
+inline int send_all(SOCKET socket, const char* data, size_t length) {
+  for (auto sent = (size_t)0; sent < length;) {
+    auto n = send(socket, data + sent, (int)(length - sent), 0);
+    if (n == SOCKET_ERROR) return 1;
+    sent += n;
+  }
+  return 0;
+}
+
+// Streaming writer of a response: data is sent in chunks as soon as
+// frame_chunk_size bytes are available, the client starts receiving while
+// the rest is still being computed and the whole payload is never copied.
+struct Frame_Writer {
+  SOCKET      socket = INVALID_SOCKET;
+  int         id     = 0;
+  std::string chunk  = {};
+  bool        failed = false;
+};
+
+// tail: "+" for partial chunks, the engine time for the final one
+inline void send_chunk(Frame_Writer& writer, const std::string& tail) {
+  auto header = std::to_string(writer.id) + " " +
+                std::to_string(writer.chunk.size()) + " " + tail + "\n";
+  if (!writer.failed)
+    writer.failed = send_all(writer.socket, header.data(), header.size()) ||
+                    send_all(writer.socket, writer.chunk.data(),
+                        writer.chunk.size());
+  writer.chunk.clear();
+}
+
+inline Frame_Writer& operator<<(Frame_Writer& writer, const std::string& data) {
+  writer.chunk += data;
+  if (writer.chunk.size() >= frame_chunk_size) send_chunk(writer, "+");
+  return writer;
+}
+
+// Send the final chunk with the engine time of the request, the writer can be
+// reused for another response
+// replace: the final chunk is the whole payload, the chunks already sent are
+// dropped by the client (e.g. "interrupted" after partial data)
+// Output: 0 on success, 1 on errors
+inline int finish(
+    Frame_Writer& writer, long long compute_us, bool replace = false) {
+  send_chunk(writer, std::to_string(compute_us) + (replace ? " !" : ""));
+  auto failed   = writer.failed;
+  writer.failed = false;
+  return failed;
+}
+
+// Polyline in the format of polyline_to_string, written point by point
+inline void write_polyline(Frame_Writer& writer, const vector<mesh_point>& poly) {
+  writer << std::to_string(poly.size()) + "\n";
+  for (auto& point : poly) writer << point_to_string(point);
+}
@@ -0,0 +1,383 @@
+#pragma once
+
+#include <set>
+#include <string>
+#include <unordered_map>
+
+using namespace yocto;
+
+// Text encoding used on the Blender socket
+inline std::string point_to_string(const mesh_point& point) {
+  return std::to_string(point.face) + " " + std::to_string(point.uv.x) + " " +
+         std::to_string(point.uv.y) + "\n";
+}
+
+inline std::string polyline_to_string(const vector<mesh_point>& poly) {
+  auto ret = std::to_string(poly.size()) + "\n";
+  for (auto& point : poly) ret += point_to_string(point);
+  return ret;
+}
+
+// New position of tangent p0 (end 0) or p2 (end 1) mirroring the opposite
+// tangent around anchor p1.
+inline mesh_point rotate_tangent(const bezier_mesh& mesh, const mesh_point& p0,
+    const mesh_point& p1, const mesh_point& p2, int end) {
+  auto l0 = compute_geodesic_path(mesh, p1, p0);
+  auto l2 = compute_geodesic_path(mesh, p1, p2);
+  if (end == 0)
+    return continue_path(mesh, l2, -path_length(path_positions(mesh, l0))).end;
+  return continue_path(mesh, l0, -path_length(path_positions(mesh, l2))).end;
+}
+
+// Tangent of anchor continuing the geodesic from tangent through anchor.
+inline mesh_point extend_tangent(
+    const bezier_mesh& mesh, const mesh_point& tangent, const mesh_point& anchor) {
+  auto path = compute_geodesic_path(mesh, anchor, tangent);
+  return continue_path(mesh, path, -path_length(path_positions(mesh, path)))
+      .end;
+}
+
+inline vector<mesh_point> straight_path(
+    const bezier_mesh& mesh, const mesh_point& start, const mesh_point& end) {
+  auto path = compute_geodesic_path(mesh, start, end);
+  return path_positions_meshpoint(mesh, path);
+}
+
+// Polyline of the segment starting at control point first.
+inline vector<mesh_point> curve_segment(const bezier_mesh& mesh,
+    const bezier_params& params, const vector<mesh_point>& control_points,
+    int first) {
+  auto polygon = bezier_segment{};
+  for (int i = 0; i < 4; ++i) polygon[i] = control_points[first + i];
+  auto points = bezier(mesh, polygon, params);
+  return make_polyline_positions_meshpoints(mesh, points);
+}
+
+// Smooth tangents: mirrors the tangent opposite to the moved handle idx.
+// Returns the index of the updated tangent, -1 if none.
+inline int mirror_tangent(const bezier_mesh& mesh,
+    vector<mesh_point>& control_points, int idx, bool closed) {
+  int last = (int)control_points.size() - 1;
+  if (idx % 3 == 1 && (idx > 1 || closed)) {
+    int p1             = idx == 1 ? last - 1 : idx - 2;
+    control_points[p1] = rotate_tangent(mesh, control_points[p1],
+        control_points[idx - 1], control_points[idx], 0);
+    return p1;
+  }
+  if (idx % 3 == 2 && (idx < last - 1 || closed)) {
+    int p3             = idx == last - 1 ? 1 : idx + 2;
+    control_points[p3] = rotate_tangent(mesh, control_points[idx],
+        control_points[idx + 1], control_points[p3], 1);
+    return p3;
+  }
+  return -1;
+}
+
+// Segments whose control polygon contains one of the given control points.
+inline std::set<int> touched_segments(
+    int num_points, bool closed, const vector<int>& indices) {
+  int  last       = num_points - 1;
+  int  n_segments = last / 3;
+  auto segments   = std::set<int>{};
+  for (auto i : indices) {
+    if (i < 0) continue;
+    if (i < last) segments.insert(i / 3);
+    if (i > 0 && i % 3 == 0) segments.insert(i / 3 - 1);
+    if (closed && (i == 0 || i == last)) {
+      segments.insert(0);
+      segments.insert(n_segments - 1);
+    }
+  }
+  return segments;
+}
+
+// Tangent paths of the anchor closest to idx, empty if not present.
+inline pair<vector<mesh_point>, vector<mesh_point>> anchor_tangents(
+    const bezier_mesh& mesh, const vector<mesh_point>& control_points, int idx,
+    bool closed) {
+  int last   = (int)control_points.size() - 1;
+  int anchor = idx;
+  if (anchor % 3 == 1) anchor -= 1;
+  if (anchor % 3 == 2) anchor += 1;
+  auto tan_1 = vector<mesh_point>{};
+  auto tan_2 = vector<mesh_point>{};
+  if (anchor > 0 || closed)
+    tan_1 = straight_path(mesh,
+        control_points[anchor == 0 ? last - 1 : anchor - 1],
+        control_points[anchor]);
+  if (anchor < last || closed)
+    tan_2 = straight_path(mesh, control_points[anchor],
+        control_points[anchor == last ? 1 : anchor + 1]);
+  return {tan_1, tan_2};
+}
+
+// Editable curve owned by the engine, so that clients only send the edits.
+// Segment polylines are cached and recomputed only when touched.
+// Samples of a segment polyline with their curve parameter and cumulative
+// arc length, so that the client can interpolate points of the curve.
+struct Segment_Samples {
+  vector<mesh_point> points  = {};
+  vector<float>      params  = {};
+  vector<float>      lengths = {};
+};
+
+// Same polyline as curve_segment. With de_casteljau_uniform point j of the
+// k-th of the n subdivided control polygons gets parameter (k + j / 3) / n,
+// the samples of the geodesics between them are parametrized by arc length.
+// The other algorithms do not give the parameters of their points, the whole
+// polyline is parametrized by arc length.
+inline Segment_Samples sample_segment(const bezier_mesh& mesh,
+    const bezier_params& params, const vector<mesh_point>& control_points,
+    int first) {
+  auto polygon = bezier_segment{};
+  for (int i = 0; i < 4; ++i) polygon[i] = control_points[first + i];
+  auto points  = bezier(mesh, polygon, params);
+  auto count   = (float)(points.size() / 4);
+  auto param   = [&](int i) { return (i / 4 + (i % 4) / 3.0f) / count; };
+  auto samples = Segment_Samples{};
+  auto total   = 0.0f;
+  for (int i = 0; i + 1 < (int)points.size(); i++) {
+    auto path      = compute_geodesic_path(mesh, points[i], points[i + 1]);
+    auto path_pts  = path_positions_meshpoint(mesh, path);
+    auto distances = vector<float>(path_pts.size(), 0.0f);
+    for (int k = 1; k < (int)path_pts.size(); k++)
+      distances[k] = distances[k - 1] +
+                     length(eval_position(mesh, path_pts[k]) -
+                            eval_position(mesh, path_pts[k - 1]));
+    auto t0 = param(i), t1 = param(i + 1);
+    auto path_length = distances.empty() ? 0.0f : distances.back();
+    for (int k = 0; k < (int)path_pts.size(); k++) {
+      auto w = path_length > 0 ? distances[k] / path_length : 0.0f;
+      samples.points.push_back(path_pts[k]);
+      samples.params.push_back(t0 + (t1 - t0) * w);
+      samples.lengths.push_back(total + distances[k]);
+    }
+    total += path_length;
+  }
+  if (params.algorithm != spline_algorithm::de_casteljau_uniform && total > 0)
+    for (int k = 0; k < (int)samples.params.size(); k++)
+      samples.params[k] = samples.lengths[k] / total;
+  return samples;
+}
+
+// Polyline with "face u v t length" lines
+inline std::string samples_to_string(const Segment_Samples& samples) {
+  auto ret = std::to_string(samples.points.size()) + "\n";
+  for (int i = 0; i < (int)samples.points.size(); i++) {
+    auto& point = samples.points[i];
+    ret += std::to_string(point.face) + " " + std::to_string(point.uv.x) + " " +
+           std::to_string(point.uv.y) + " " + std::to_string(samples.params[i]) +
+           " " + std::to_string(samples.lengths[i]) + "\n";
+  }
+  return ret;
+}
+
+struct Curve_Session {
+  vector<mesh_point>         control_points = {};
+  vector<Segment_Samples>    segments       = {};
+  bool                       is_closed      = false;
+};
+
+struct Session_Store {
+  std::unordered_map<int, Curve_Session> sessions = {};
+  int                                    next_id  = 0;
+};
+
+// Replacement of the items in [start, end) with items. Splices are applied
+// in order by the client on its own copy of the lists.
+template <typename T>
+struct Splice {
+  int       start = 0;
+  int       end   = 0;
+  vector<T> items = {};
+};
+
+struct Session_Update {
+  vector<Splice<mesh_point>>      points   = {};
+  vector<Splice<Segment_Samples>> segments = {};
+};
+
+inline std::string update_to_string(const Session_Update& update) {
+  auto ret = std::to_string(update.points.size()) + "\n";
+  for (auto& splice : update.points) {
+    ret += std::to_string(splice.start) + " " + std::to_string(splice.end) +
+           " " + std::to_string(splice.items.size()) + "\n";
+    for (auto& point : splice.items) ret += point_to_string(point);
+  }
+  ret += std::to_string(update.segments.size()) + "\n";
+  for (auto& splice : update.segments) {
+    ret += std::to_string(splice.start) + " " + std::to_string(splice.end) +
+           " " + std::to_string(splice.items.size()) + "\n";
+    for (auto& samples : splice.items) ret += samples_to_string(samples);
+  }
+  return ret;
+}
+
+inline Session_Update make_session(const bezier_mesh& mesh,
+    const bezier_params& params, Curve_Session& session,
+    const vector<mesh_point>& control_points, bool closed) {
+  session.control_points = control_points;
+  session.is_closed      = closed;
+  session.segments.clear();
+  for (int first = 0; first + 3 < (int)control_points.size(); first += 3)
+    session.segments.push_back(
+        sample_segment(mesh, params, control_points, first));
+  auto update = Session_Update{};
+  update.segments.push_back({0, 0, session.segments});
+  return update;
+}
+
+// Session of a curve whose segments the client already has, e.g. stored with
+// the curve by an earlier session: they are not computed, the placeholders
+// keep the segment indices of the following updates.
+inline Session_Update restore_session(Curve_Session& session,
+    const vector<mesh_point>& control_points, bool closed) {
+  session.control_points = control_points;
+  session.is_closed      = closed;
+  session.segments.assign(
+      max(((int)control_points.size() - 1) / 3, 0), Segment_Samples{});
+  return {};
+}
+
+inline Session_Update move_point(const bezier_mesh& mesh,
+    const bezier_params& params, Curve_Session& session, int idx,
+    const mesh_point& point, bool smooth) {
+  auto& control_points = session.control_points;
+  int   last           = (int)control_points.size() - 1;
+  auto  update         = Session_Update{};
+  auto  moved          = vector<int>{idx};
+  // Closed curve: first and last anchors coincide
+  if (session.is_closed && idx == 0) moved.push_back(last);
+  if (session.is_closed && idx == last) moved.push_back(0);
+  for (auto i : moved) control_points[i] = point;
+  if (smooth)
+    moved.push_back(
+        mirror_tangent(mesh, control_points, idx, session.is_closed));
+  for (auto i : moved)
+    if (i >= 0) update.points.push_back({i, i + 1, {control_points[i]}});
+
+  for (auto s : touched_segments(
+           (int)control_points.size(), session.is_closed, moved)) {
+    session.segments[s] = sample_segment(mesh, params, control_points, s * 3);
+    update.segments.push_back({s, s + 1, {session.segments[s]}});
+  }
+  return update;
+}
+
+// Appends a segment ending in point, its first tangent continues the last one.
+inline Session_Update extend_session(const bezier_mesh& mesh,
+    const bezier_params& params, Curve_Session& session,
+    const mesh_point& point) {
+  auto& control_points = session.control_points;
+  int   n              = (int)control_points.size();
+  auto  added          = vector<mesh_point>{
+      extend_tangent(mesh, control_points[n - 2], control_points[n - 1]),
+      point, point};
+  control_points.insert(control_points.end(), added.begin(), added.end());
+  int s = (int)session.segments.size();
+  session.segments.push_back(sample_segment(mesh, params, control_points, n - 1));
+
+  auto update = Session_Update{};
+  update.points.push_back({n, n, added});
+  update.segments.push_back({s, s, {session.segments.back()}});
+  return update;
+}
+
+// First control point of the segment and local parameter of the global
+// parameter t0 (integer part is the segment index).
+inline pair<int, float> segment_param(const Curve_Session& session, float t0) {
+  auto first = (int)t0 * 3;
+  auto t     = t0 - (int)t0;
+  if (first >= (int)session.control_points.size() - 1) {
+    first -= 3;
+    t = 1;
+  }
+  return {first, t};
+}
+
+inline bezier_segment session_polygon(const Curve_Session& session, int first) {
+  auto polygon = bezier_segment{};
+  for (int i = 0; i < 4; ++i) polygon[i] = session.control_points[first + i];
+  return polygon;
+}
+
+inline Session_Update split_session(const bezier_mesh& mesh,
+    const bezier_params& params, Curve_Session& session, float t0) {
+  auto [first, t]      = segment_param(session, t0);
+  auto& control_points = session.control_points;
+  auto  res    = insert_point(mesh, session_polygon(session, first), t);
+  auto  points = vector<mesh_point>{res[0][0], res[0][1], res[0][2], res[0][3],
+      res[1][1], res[1][2], res[1][3]};
+  control_points.erase(
+      control_points.begin() + first, control_points.begin() + first + 4);
+  control_points.insert(
+      control_points.begin() + first, points.begin(), points.end());
+
+  int  s      = first / 3;
+  auto halves = vector<Segment_Samples>{
+      sample_segment(mesh, params, control_points, first),
+      sample_segment(mesh, params, control_points, first + 3)};
+  session.segments.erase(session.segments.begin() + s);
+  session.segments.insert(
+      session.segments.begin() + s, halves.begin(), halves.end());
+
+  auto update = Session_Update{};
+  update.points.push_back({first, first + 4, points});
+  update.segments.push_back({s, s + 1, halves});
+  return update;
+}
+
+// Removes control points idx-1, idx, idx+1: first segment if idx is 1, last
+// segment if idx is the last tangent, otherwise merges the two segments of
+// anchor idx.
+inline Session_Update delete_segment(const bezier_mesh& mesh,
+    const bezier_params& params, Curve_Session& session, int idx) {
+  auto& control_points = session.control_points;
+  auto& segments       = session.segments;
+  auto  update         = Session_Update{};
+  control_points.erase(
+      control_points.begin() + idx - 1, control_points.begin() + idx + 2);
+  update.points.push_back({idx - 1, idx + 2, {}});
+  if (idx % 3 == 0) {
+    int  s      = idx / 3 - 1;
+    auto merged = sample_segment(mesh, params, control_points, s * 3);
+    segments.erase(segments.begin() + s, segments.begin() + s + 2);
+    segments.insert(segments.begin() + s, merged);
+    update.segments.push_back({s, s + 2, {merged}});
+  } else {
+    int s = idx == 1 ? 0 : (int)segments.size() - 1;
+    segments.erase(segments.begin() + s);
+    update.segments.push_back({s, s + 1, {}});
+  }
+  return update;
+}
+
+// Closing adds a segment from the last anchor to the first one, unless they
+// already overlap. Opening keeps the closing segment.
+inline Session_Update close_session(const bezier_mesh& mesh,
+    const bezier_params& params, Curve_Session& session, bool closed,
+    bool smooth) {
+  auto& control_points = session.control_points;
+  auto  update         = Session_Update{};
+  if (closed && !session.is_closed &&
+      !(control_points.front() == control_points.back())) {
+    int  n     = (int)control_points.size();
+    auto added = vector<mesh_point>{};
+    if (smooth) {
+      added = {
+          extend_tangent(mesh, control_points[n - 2], control_points[n - 1]),
+          extend_tangent(mesh, control_points[1], control_points[0]),
+          control_points[0]};
+    } else {
+      added = {control_points[n - 1], control_points[0], control_points[0]};
+    }
+    control_points.insert(control_points.end(), added.begin(), added.end());
+    int s = (int)session.segments.size();
+    session.segments.push_back(
+        sample_segment(mesh, params, control_points, n - 1));
+    update.points.push_back({n, n, added});
+    update.segments.push_back({s, s, {session.segments.back()}});
+  }
+  session.is_closed = closed;
+  return update;
+}
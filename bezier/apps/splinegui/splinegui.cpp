@@ -7,6 +7,8 @@
 #include <ws2tcpip.h>
 #define DEFAULT_PORT "27015"
 #define DEFAULT_BUFLEN 2048
+//Checked by the client in the handshake, increase on incompatible changes of the requests
+const int protocol_version = 5;
 #undef near
 #undef far
 
@@ -15,6 +17,13 @@
 #include <yocto/yocto_commonio.h>
 #include <yocto/yocto_geometry.h>
 
+#include <atomic>
+#include <chrono>
+#include <condition_variable>
+#include <deque>
+#include <memory>
+#include <mutex>
+#include <shared_mutex>
 #include <thread>
 #include <vector>
 #include <sstream>
@@ -29,6 +38,9 @@
 #include "app.h"
 using namespace yocto;
 
+#include "session.h"
+#include "frame.h"
+
 //
 #include "editing.h"
 #include "playback.h"
@@ -1842,178 +1854,517 @@ istream& read_point_bar(istream& str, vector<mesh_point>& points){
   return str;
 }
 
-int send_polyline(SOCKET ListenSocket, vector<mesh_point>& poly){
-  int n = poly.size();
-  std::string ret =  std::to_string(n) + "\n";
-  send(ListenSocket, ret.c_str(), ret.length(), 0);
-  ret = "";
-  for(int i = 0; i < n; i++){
-    ret += std::to_string(poly[i].face) + " " + std::to_string(poly[i].uv.x) + " " + std::to_string(poly[i].uv.y) + "\n"; 
+//Distance of p from the polyline
+float polyline_distance(const vector<vec3f>& polyline, const vec3f& p){
+  auto distance = flt_max;
+  for(int i = 0; i + 1 < (int)polyline.size(); i++){
+    auto a  = polyline[i];
+    auto ab = polyline[i + 1] - a;
+    auto t  = clamp(dot(p - a, ab) / max(dot(ab, ab), 1e-12f), 0.0f, 1.0f);
+    distance = min(distance, length(p - (a + ab * t)));
+  }
+  return distance;
+}
+
+//Each available algorithm with each path solver on polygon, at the subdivisions of params
+//Deviation is measured from a de_casteljau_uniform curve with 2 more subdivisions, relative to the mesh size
+//Output: a line "<algorithm> <solver> <median ms> <max deviation> <mean deviation> <points>" for each option
+std::string profile_algorithms(App& app, const bezier_params& params, const bezier_segment& polygon, int repeat){
+  auto positions = [&app](const vector<mesh_point>& points) {
+    auto result = vector<vec3f>{};
+    for(auto& point : make_polyline_positions_meshpoints(app.mesh, points)) result.push_back(eval_position(app.mesh, point));
+    return result;
+  };
+  auto reference_params = params;
+  reference_params.algorithm = spline_algorithm::de_casteljau_uniform;
+  reference_params.subdivisions += 2;
+  set_path_solver(path_solver::dual);
+  auto reference = positions(bezier(app.mesh, polygon, reference_params));
+
+  std::string ret;
+  for(int a = 0; a < (int)spline_algorithm_names.size(); a++){
+    if(!is_available((spline_algorithm)a)) continue;
+    for(int s = 0; s < (int)path_solver_names.size(); s++){
+      auto option = params;
+      option.algorithm = (spline_algorithm)a;
+      option.solver = (path_solver)s;
+      set_path_solver(option.solver);
+      auto times = vector<double>{};
+      auto points = vector<mesh_point>{};
+      for(int r = 0; r < max(repeat, 1); r++){
+        check_interrupted(params);
+        auto start = std::chrono::steady_clock::now();
+        points = bezier(app.mesh, polygon, option);
+        times.push_back(std::chrono::duration<double, std::milli>(std::chrono::steady_clock::now() - start).count());
+      }
+      std::sort(times.begin(), times.end());
+      auto curve = positions(points);
+      auto max_deviation = 0.0f, mean_deviation = 0.0f;
+      for(auto& p : curve){
+        auto d = polyline_distance(reference, p);
+        max_deviation = max(max_deviation, d);
+        mean_deviation += d / curve.size();
+      }
+      ret += spline_algorithm_names[a] + " " + path_solver_names[s] + " " + std::to_string(times[times.size() / 2]) + " " +
+        std::to_string(max_deviation) + " " + std::to_string(mean_deviation) + " " + std::to_string(curve.size()) + "\n";
+    }
+  }
+  set_path_solver(params.solver);
+  return ret;
+}
+
+//Control point index of a session request, out_of_range if not in [first, end)
+int read_point_index(std::istringstream& str, int first, int end){
+  std::string line;
+  std::getline(str, line);
+  int idx = std::stoi(line);
+  if(idx < first || idx >= end) throw std::out_of_range("no control point " + line);
+  return idx;
+}
+
+//Curve session request: <op>\n<session id>\n<args>
+//Edits are computed on a copy of the session that replaces it once complete, so that an interrupted
+//or failed request leaves the session as it was
+//Output: session id followed by the op result
+std::string session_request(App& app, const bezier_params& params, Session_Store& store, std::istringstream& str){
+  std::string line;
+  vector<mesh_point> tmp;
+  std::getline(str, line);
+  char op = line[0];
+  std::getline(str, line);
+  int id = std::stoi(line);
+  auto& mesh   = app.mesh;
+  //Create (or reset) session: <closed>\n<control points>
+  if(op == 'c'){
+    if(id < 0) id = store.next_id++;
+    std::getline(str, line);
+    bool closed = line == "1";
+    while(str) read_point_bar(str, tmp);
+    auto session = Curve_Session{};
+    auto ret = std::to_string(id) + "\n" + update_to_string(make_session(mesh, params, session, tmp, closed));
+    store.sessions[id] = std::move(session);
+    return ret;
+  }
+  //Restore session without computing its segments: <closed>\n<control points>
+  if(op == 'r'){
+    std::getline(str, line);
+    bool closed = line == "1";
+    while(str) read_point_bar(str, tmp);
+    auto& session = store.sessions[id];
+    return std::to_string(id) + "\n" + update_to_string(restore_session(session, tmp, closed));
+  }
+  auto found = store.sessions.find(id);
+  if(found == store.sessions.end()) throw std::out_of_range("no session " + std::to_string(id));
+  std::string ret = std::to_string(id) + "\n";
+  //Tangent paths of anchor: <idx>
+  if(op == 't'){
+    auto& session = found->second;
+    auto [tan_1, tan_2] = anchor_tangents(mesh, session.control_points, read_point_index(str, 0, session.control_points.size()), session.is_closed);
+    return ret + polyline_to_string(tan_1) + polyline_to_string(tan_2);
+  }
+  //Quit session
+  if(op == 'q'){
+    store.sessions.erase(found);
+    return ret;
+  }
+  auto session = found->second;
+  //Move point: <idx>\n<smooth>\n<point>, followed by the anchor tangent paths
+  if(op == 'm'){
+    int idx = read_point_index(str, 0, session.control_points.size());
+    std::getline(str, line);
+    bool smooth = line == "1";
+    read_point_bar(str, tmp);
+    ret += update_to_string(move_point(mesh, params, session, idx, tmp[0], smooth));
+    auto [tan_1, tan_2] = anchor_tangents(mesh, session.control_points, idx, session.is_closed);
+    ret += polyline_to_string(tan_1) + polyline_to_string(tan_2);
+  }
+  //Extend with a new segment ending in: <point>
+  else if(op == 'i'){
+    read_point_bar(str, tmp);
+    ret += update_to_string(extend_session(mesh, params, session, tmp[0]));
+  }
+  //Split at: <t0>
+  else if(op == 's'){
+    std::getline(str, line);
+    ret += update_to_string(split_session(mesh, params, session, std::stof(line)));
+  }
+  //Delete segment around: <idx>, the three control points from idx - 1 are removed
+  else if(op == 'x'){
+    int idx = read_point_index(str, 1, (int)session.control_points.size() - 1);
+    ret += update_to_string(delete_segment(mesh, params, session, idx));
+  }
+  //Close or open: <closed>\n<smooth>
+  else if(op == 'o'){
+    std::getline(str, line);
+    bool closed = line == "1";
+    std::getline(str, line);
+    bool smooth = line == "1";
+    ret += update_to_string(close_session(mesh, params, session, closed, smooth));
+  }
+  found->second = std::move(session);
+  return ret;
+}
+
+//Compute the response payload of a single request, with the params and the sessions of the client
+//Response is streamed on out
+void handle_request(App& app, bezier_params& params, Session_Store& sessions, const std::string& request, Frame_Writer& out){
+  std::istringstream str(request);
+  std::string line; //For reading input
+  vector<mesh_point> tmp; //Storing input points
+  set_path_solver(params.solver);
+  //Extend curve request
+  if(request[0] == 'n') {
+    std::getline(str, line); //Command line 'n', discard
+    while(str) read_point_bar(str, tmp);
+    //Compute tangent, new control point (Tangent extension)
+    out << point_to_string(extend_tangent(app.mesh, tmp[0], tmp[1]));
+    return;
+  }
+  //Curve session request: e\n<payload>
+  else if(request[0] == 'e'){
+    std::getline(str, line); //Command line 'e', discard
+    out << session_request(app, params, sessions, str);
+    return;
+  }
+  //Line for control polygon
+  else if(request[0] == 'l'){
+    std::getline(str, line); //Command line 'l', discard
+    while(str) read_point_bar(str, tmp);
+    //Compute path and send
+    write_polyline(out, straight_path(app.mesh, tmp[0], tmp[1]));
+    return;
+  }
+  //Handshake: protocol version and size of the loaded mesh
+  else if(request[0] == 'h'){
+    out << "bezier " + std::to_string(protocol_version) + "\n" + std::to_string(app.mesh.triangles.size()) + " " + std::to_string(app.mesh.positions.size()) + "\n";
+    return;
+  }
+  //Geometry update keeping the topology: g\n<vertices>\n followed by the positions as raw little endian floats (x y z)
+  //Response: the handshake mesh size, or an error line if the number of vertices differs
+  else if(request[0] == 'g'){
+    std::getline(str, line); //Command line 'g', discard
+    std::getline(str, line);
+    auto positions = vector<vec3f>(std::stoi(line));
+    auto offset = str ? (size_t)str.tellg() : request.size();
+    auto bytes = positions.size() * sizeof(vec3f);
+    auto valid = request.size() - offset == bytes;
+    if(valid) std::memcpy(positions.data(), request.data() + offset, bytes);
+    if(!valid || !update_mesh_positions(app.mesh, positions)) {
+      out << std::string("error\n");
+      return;
+    }
+    init_bvh(app);
+    out << std::to_string(app.mesh.triangles.size()) + " " + std::to_string(app.mesh.positions.size()) + "\n";
+    return;
+  }
+  //Load time and memory of the mesh and of each lazily built structure
+  //Response: a line "<name> <built> <build ms> <bytes>" for the mesh and each mesh_data
+  else if(request[0] == 'm'){
+    auto& mesh = app.mesh;
+    out << "mesh 1 " + std::to_string(mesh.load_ms) + " " + std::to_string(mesh_bytes(mesh)) + "\n";
+    for(int data = 0; data < (int)mesh_data_names.size(); data++){
+      auto built = has_mesh_data(mesh, (mesh_data)data);
+      out << mesh_data_names[data] + " " + std::to_string(built) + " " + std::to_string(built ? mesh.data_build_ms[data] : 0.0) + " " +
+        std::to_string(mesh_data_bytes(mesh, (mesh_data)data)) + "\n";
+    }
+    return;
+  }
+  //Cubic segments of the paths of an svg file, coords in [0, 1] with y up: v\n<filename>\n
+  //Response: number of paths, then for each path the number of segments and a line "x0 y0 x1 y1 x2 y2 x3 y3" per segment
+  else if(request[0] == 'v'){
+    std::getline(str, line); //Command line 'v', discard
+    std::getline(str, line);
+    auto svg = load_svg(line);
+    auto paths = vector<const Svg_Path*>{};
+    for(auto& shape : svg)
+      for(auto& path : shape.paths)
+        if(path.size() > 0) paths.push_back(&path);
+    out << std::to_string(paths.size()) + "\n";
+    for(auto path : paths){
+      out << std::to_string(path->size()) + "\n";
+      for(auto& segment : *path){
+        std::string ret;
+        for(auto& p : segment) ret += std::to_string(p.x) + " " + std::to_string(p.y) + " ";
+        ret.back() = '\n';
+        out << ret;
+      }
+    }
+    return;
+  }
+  //Params of the client: o<d|s>\n<subdivisions>\n, optionally followed by <algorithm>\n<path solver>\n
+  //with the names in spline_algorithm_names and path_solver_names, replacing d (de Casteljau) or s (subdivision)
+  //Empty response as acknowledgment, "error <name>" if the algorithm or the solver is not available
+  //The params are unchanged on errors
+  else if(request[0] == 'o'){
+    auto algorithm = request[1] == 'd' ? spline_algorithm::de_casteljau_uniform : spline_algorithm::subdivision_uniform;
+    auto solver = params.solver;
+    std::getline(str, line); //Command line 'o', discard
+    std::getline(str, line); //number of subdivision
+    auto subdivisions = std::stoi(line);
+    if(std::getline(str, line) && !line.empty()){
+      auto name = std::find(spline_algorithm_names.begin(), spline_algorithm_names.end(), line) - spline_algorithm_names.begin();
+      if(name == spline_algorithm_names.size() || !is_available((spline_algorithm)name)){
+        out << "error " + line + "\n";
+        return;
+      }
+      algorithm = (spline_algorithm)name;
+      std::getline(str, line);
+      name = std::find(path_solver_names.begin(), path_solver_names.end(), line) - path_solver_names.begin();
+      if(name == path_solver_names.size()){
+        out << "error " + line + "\n";
+        return;
+      }
+      solver = (path_solver)name;
+    }
+    params.subdivisions = subdivisions;
+    params.algorithm = algorithm;
+    params.solver = solver;
+    return;
+  }
+  //Time and deviation of every algorithm and path solver: f\n<repeat>\n<control polygon>
+  //Response: see profile_algorithms
+  else if(request[0] == 'f'){
+    std::getline(str, line); //Command line 'f', discard
+    std::getline(str, line);
+    int repeat = std::stoi(line);
+    while(str) read_point_bar(str, tmp);
+    auto polygon = bezier_segment{};
+    for (int i = 0; i < tmp.size(); ++i) polygon[i] = tmp[i];
+    out << profile_algorithms(app, params, polygon, repeat);
+    return;
+  }
+  //Samples of a curve segment, as in the curve sessions: b\n<control polygon>
+  //Response: "face u v t length" lines, see samples_to_string
+  else if(request[0] == 'b'){
+    std::getline(str, line); //Command line 'b', discard
+    while(str) read_point_bar(str, tmp);
+    out << samples_to_string(sample_segment(app.mesh, params, tmp, 0));
+    return;
+  }
+  //Calculate curve from scratch
+  while(str) read_point_bar(str, tmp); 
+  auto polygon = bezier_segment{};
+  for (int i = 0; i < tmp.size(); ++i) {
+    polygon[i] = tmp[i];
+  }
+  auto points = bezier(app.mesh, polygon, params);
+  write_polyline(out, make_polyline_positions_meshpoints(app.mesh, points));
+}
+
+//Request received and waiting to be computed
+struct Queued_Request {
+  int id = 0;
+  std::string payload = {};
+  std::chrono::steady_clock::time_point deadline = std::chrono::steady_clock::time_point::max();
+  bool cancelled = false;
+};
+
+//Client connection, with its own params and curve sessions
+//Requests of a connection are computed in order, one at a time, by any worker of the server
+struct Connection {
+  SOCKET socket = INVALID_SOCKET;
+  Frame_Reader reader = {};
+  Frame_Writer writer = {};
+  Session_Store sessions = {}; //Curves edited by the client
+  bezier_params params = {}; //Set by the params requests of the client
+  std::deque<Queued_Request> requests = {}; //Guarded by the server mutex
+  bool scheduled = false; //In the server queue or being computed, guarded by the server mutex
+  int running = -1; //Id of the request being computed, guarded by the server mutex
+  std::atomic<bool> cancel_running{false};
+  std::chrono::steady_clock::time_point deadline = std::chrono::steady_clock::time_point::max(); //Of the running request
+
+  Connection(SOCKET socket, const bezier_params& defaults) : socket(socket), reader{socket}, writer{socket}, params(defaults) {
+    //Computations of the running request stop when it is cancelled or its deadline has passed,
+    //the response is then "interrupted"
+    params.interrupted = [this]() {
+      return cancel_running || std::chrono::steady_clock::now() > deadline;
+    };
   }
-  send(ListenSocket, ret.c_str(), ret.length(), 0);
+  ~Connection() { closesocket(socket); }
+};
+
+//Requests of all the connections are computed by a pool of workers over the same mesh:
+//they only read it, geometry updates wait for the running requests and have exclusive access
+struct Server {
+  App& app;
+  SOCKET listen_socket = INVALID_SOCKET;
+  std::shared_mutex mesh_mutex;
+  std::mutex mutex;
+  std::condition_variable ready;
+  std::deque<std::shared_ptr<Connection>> queue; //Connections with requests to compute
+  int clients = 0; //Connected clients
+  bool closing = false;
+
+  Server(App& app, SOCKET listen_socket) : app(app), listen_socket(listen_socket) {}
+};
 
-  return 0;
+//Queue a connection for the workers, unless it is already queued or running
+//Called with the server mutex held
+void schedule(Server& server, const std::shared_ptr<Connection>& conn){
+  if(conn->scheduled || conn->requests.empty()) return;
+  conn->scheduled = true;
+  server.queue.push_back(conn);
+  server.ready.notify_one();
 }
 
-int listen_blender(SOCKET ListenSocket, App& app){
-    SOCKET ClientSocket;
+//Stop the workers and the accept loop
+void stop_server(Server& server){
+  {
+    std::lock_guard<std::mutex> lock(server.mutex);
+    if(server.closing) return;
+    server.closing = true;
+  }
+  server.ready.notify_all();
+  closesocket(server.listen_socket);
+}
 
-    ClientSocket = INVALID_SOCKET;
+//Reader thread of a connection: cancel messages "x\n<id>\n" (no response) apply immediately,
+//the other requests are queued, so that a cancel reaches the engine during a long computation
+//The reader ends after a close request "a" (no response) or when the client disconnects,
+//the connection is released after its last queued request
+//A shutdown request "k" (no response) stops the whole engine, it is sent by the process owning the engine
+//The engine exits when the last client disconnects, as when Blender is closed without a shutdown request
+void receive_requests(std::shared_ptr<Connection> conn, std::shared_ptr<Server> server){
+  while(true){
+    Queued_Request request;
+    int deadline_ms = 0;
+    int iResult = read_frame(conn->reader, request.id, request.payload, deadline_ms);
+    bool close = iResult == 0 && (request.payload[0] == 'a' || request.payload[0] == 'k');
+    if(iResult != 0 || close){
+      if(iResult >= 0) printf("Connection closing...\n");
+      else printf("recv failed: %d\n", WSAGetLastError());
+      bool last;
+      {
+        std::lock_guard<std::mutex> lock(server->mutex);
+        last = --server->clients == 0;
+      }
+      if(last || (close && request.payload[0] == 'k')) stop_server(*server);
+      return;
+    }
+    std::lock_guard<std::mutex> lock(server->mutex);
+    if(request.payload[0] == 'x'){
+      int target = std::atoi(request.payload.c_str() + 1);
+      if(target == conn->running) conn->cancel_running = true;
+      for(auto& queued : conn->requests)
+        if(queued.id == target) queued.cancelled = true;
+      continue;
+    }
+    if(deadline_ms > 0) request.deadline = std::chrono::steady_clock::now() + std::chrono::milliseconds(deadline_ms);
+    conn->requests.push_back(std::move(request));
+    schedule(*server, conn);
+  }
+}
+
+//Mesh data used by a request, built before it is computed if missing
+vector<mesh_data> request_needs(const bezier_params& params, const std::string& request){
+  auto solver = params.solver == path_solver::primal ? mesh_data::primal_solver : mesh_data::dual_solver;
+  switch(request[0]){
+    case 'h': case 'g': case 'v': case 'm': return {};
+    //Selecting the primal solver builds it, so that the next requests do not wait for it
+    case 'o': return request.find("\nprimal") != std::string::npos ? vector<mesh_data>{mesh_data::primal_solver} : vector<mesh_data>{};
+    case 'f': return {mesh_data::dual_solver, mesh_data::primal_solver};
+    default: return {solver};
+  }
+}
+
+//Compute a request reading the mesh concurrently with the other workers, or with exclusive access
+//when it writes the mesh data: geometry updates and the first request needing a missing structure
+void compute_request(Server& server, Connection& conn, const std::string& request){
+  auto& mesh = server.app.mesh;
+  auto needs = request_needs(conn.params, request);
+  if(request[0] != 'g'){
+    std::shared_lock<std::shared_mutex> mesh_lock(server.mesh_mutex);
+    auto built = std::all_of(needs.begin(), needs.end(), [&mesh](mesh_data data) { return has_mesh_data(mesh, data); });
+    if(built) return handle_request(server.app, conn.params, conn.sessions, request, conn.writer);
+  }
+  std::unique_lock<std::shared_mutex> mesh_lock(server.mesh_mutex);
+  for(auto data : needs)
+    if(!has_mesh_data(mesh, data)) build_mesh_data(mesh, data);
+  handle_request(server.app, conn.params, conn.sessions, request, conn.writer);
+}
+
+//Worker thread: computes the next request of the first queued connection
+void serve_requests(std::shared_ptr<Server> server){
+  while(true){
+    std::shared_ptr<Connection> conn;
+    Queued_Request request;
+    {
+      std::unique_lock<std::mutex> lock(server->mutex);
+      server->ready.wait(lock, [&server]() { return server->closing || !server->queue.empty(); });
+      if(server->closing) return;
+      conn = std::move(server->queue.front());
+      server->queue.pop_front();
+      request = std::move(conn->requests.front());
+      conn->requests.pop_front();
+      conn->running = request.id;
+      conn->cancel_running = request.cancelled;
+    }
+    conn->deadline = request.deadline;
+    conn->writer.id = request.id;
+    auto start = std::chrono::steady_clock::now();
+    auto replace = false;
+    //Chunks of the response may have been streamed already, the final chunk replaces them
+    try {
+      compute_request(*server, *conn, request.payload);
+    } catch (const operation_interrupted&) {
+      replace = true;
+      conn->writer.chunk.clear();
+      conn->writer << std::string("interrupted\n");
+    } catch (const std::exception& e) {
+      //Malformed request or unknown session: the client gets the error, the engine keeps serving
+      replace = true;
+      conn->writer.chunk.clear();
+      conn->writer << "error " + std::string(e.what()) + "\n";
+    }
+    auto elapsed = std::chrono::steady_clock::now() - start;
+    finish(conn->writer, std::chrono::duration_cast<std::chrono::microseconds>(elapsed).count(), replace);
+    //The next request of the connection can go to any worker
+    std::lock_guard<std::mutex> lock(server->mutex);
+    conn->running = -1;
+    conn->scheduled = false;
+    schedule(*server, conn);
+  }
+}
+
+//Accept loop: each client gets its own connection, e.g. Blender's interactive one
+//and the ones of a background refinement, computed concurrently by the workers
+int listen_blender(SOCKET ListenSocket, App& app, int workers){
+    auto server = std::make_shared<Server>(app, ListenSocket);
+    auto pool = vector<std::thread>{};
+    for(int i = 0; i < workers; i++) pool.emplace_back(serve_requests, server);
 
-    // Accept a client socket
     std::cout << "waiting for client\n";
     fflush(stdout);
-    ClientSocket = accept(ListenSocket, NULL, NULL);
-    if (ClientSocket == INVALID_SOCKET) {
-        printf("accept failed: %d\n", WSAGetLastError());
-        closesocket(ListenSocket);
-        WSACleanup();
-        return 1;
+    while(true){
+        // Accept a client socket
+        SOCKET ClientSocket = accept(ListenSocket, NULL, NULL);
+        if (ClientSocket == INVALID_SOCKET) break;
+        //Requests are tagged with an id echoed in the response, the client can send several requests without waiting
+        //Requests are read with a buffered reader and responses are streamed in chunks, so payloads can be of any size
+        auto conn = std::make_shared<Connection>(ClientSocket, app._bezier_params);
+        {
+            std::lock_guard<std::mutex> lock(server->mutex);
+            server->clients += 1;
+        }
+        std::thread(receive_requests, conn, server).detach();
     }
 
-    //Send and recv
-    char recvbuf[DEFAULT_BUFLEN];
-    int iResult, iSendResult;
-    int recvbuflen = DEFAULT_BUFLEN;
-    std::string line; //For reading input
-    vector<mesh_point> tmp; //Storing input points
-    // Receive until the peer shuts down the connection
-    do {
-
-        iResult = recv(ClientSocket, recvbuf, recvbuflen, 0);
-        if (iResult > 0) {
-          //Close socket request
-          if(recvbuf[0] == 'a') {
-              closesocket(ListenSocket); 
-              std::cout<<"connention closed...\n";
-              return 0;
-          }
-          //Extend curve request
-          if(recvbuf[0] == 'n') {
-            std::istringstream str(std::string(recvbuf, iResult));
-            std::getline(str, line); //Command line 'n', discard
-            while(str) read_point_bar(str, tmp);
-            //Compute tangent
-            auto path = compute_geodesic_path(app.mesh, tmp[1], tmp[0]);
-            auto positions = path_positions(app.mesh, path);
-            float tan_len = path_length(positions);
-            auto tangent = continue_path(app.mesh, path, -tan_len);
-            //Send new control point (Tangent extension)
-            line =  std::to_string(tangent.end.face) + " " + std::to_string(tangent.end.uv.x) + " " + std::to_string(tangent.end.uv.y) + "\n";
-            send(ClientSocket, line.c_str(), line.length(), 0);
-          //Rotate tangent
-          }else if(recvbuf[0] == 'r'){
-            geodesic_path result;
-            int end = 0;
-            if(recvbuf[1] == '1') end = 1;
-            std::istringstream str(std::string(recvbuf, iResult));
-            std::getline(str, line); //Command line 'r', discard
-            while(str) read_point_bar(str, tmp);
-            //Compute path and send
-            auto p1 = compute_geodesic_path(app.mesh, tmp[1], tmp[0]);
-            auto p2 = compute_geodesic_path(app.mesh, tmp[1], tmp[2]);
-            if(end == 0){
-              auto positions = path_positions(app.mesh, p1);
-              float tan_len = path_length(positions);
-              result = continue_path(app.mesh, p2, -tan_len);
-            }
-            else{
-              auto positions = path_positions(app.mesh, p2);
-              float tan_len = path_length(positions);
-              result = continue_path(app.mesh, p1, -tan_len);
-            };
-            line =  std::to_string(result.end.face) + " " + std::to_string(result.end.uv.x) + " " + std::to_string(result.end.uv.y) + "\n";
-            send(ClientSocket, line.c_str(), line.length(), 0);
-          }
-          //Line for control polygon
-          else if(recvbuf[0] == 'l'){
-            std::istringstream str(std::string(recvbuf, iResult));
-            std::getline(str, line); //Command line 'l', discard
-            while(str) read_point_bar(str, tmp);
-            //Compute path and send
-            auto path = compute_geodesic_path(app.mesh, tmp[0], tmp[1]);
-            auto res = path_positions_meshpoint(app.mesh, path);  
-            send_polyline(ClientSocket, res);
-          }
-          //Eval point for split
-           else if(recvbuf[0] == 'p'){
-            //vector<mesh_point> tmp;
-            std::istringstream str(std::string(recvbuf, iResult));
-            std::getline(str, line); //Command line 'l', discard
-            std::getline(str, line);
-            float t0 = std::stof(line);
-            while(str) read_point_bar(str, tmp);
-            bezier_segment polygon = bezier_segment{};
-            for (int i = 0; i < tmp.size(); ++i) polygon[i] = tmp[i];
-            mesh_point result = eval_bezier_point(app.mesh, polygon, t0, 0.f, 1.0f);
-            line =  std::to_string(result.face) + " " + std::to_string(result.uv.x) + " " + std::to_string(result.uv.y) + "\n";
-            send(ClientSocket, line.c_str(), line.length(), 0);
-           }
-          //split polygon
-          else if(recvbuf[0] == 's'){
-            std::istringstream str(std::string(recvbuf, iResult));  
-            std::getline(str, line); //Command line 'l', discard
-            std::getline(str, line); //t0
-            float t0 = std::stof(line);
-            while(str) read_point_bar(str, tmp);
-
-            bezier_segment polygon = bezier_segment{};
-            for (int i = 0; i < tmp.size(); ++i) {
-              polygon[i] = tmp[i];
-              std::cout<<"Polygon  f: " << tmp[i].face << " u: " << tmp[i].uv.x << " v: " << tmp[i].uv.y<< "\n";
-            }
-            
-            auto res = insert_point( app.mesh, polygon, t0);
-            vector<mesh_point> to_send; //Storing ouput points
-            //Print
-            //for(int i = 0; i<4; i++) std::cout<<"Segment 1  f: " << res[0][i].face << " u: " << res[0][i].uv.x << " v: " << res[0][i].uv.y<< "\n";
-            //for(int i = 0; i<4; i++) std::cout<<"Segment 2  f: " << res[1][i].face << " u: " << res[1][i].uv.x << " v: " << res[1][i].uv.y <<"\n";
-            //End print
-            for(int i = 0; i<4; i++) to_send.push_back( res[0][i] );
-            for(int i = 1; i<4; i++) to_send.push_back( res[1][i] );
-
-            send_polyline(ClientSocket, to_send);
-          }
-          //Params
-          else if(recvbuf[0] == 'o'){
-            if(recvbuf[1] == 'd' ) app._bezier_params.algorithm = spline_algorithm::de_casteljau_uniform;
-            else  app._bezier_params.algorithm = spline_algorithm::subdivision_uniform;
-            //Set subdivisions
-            std::istringstream str(std::string(recvbuf, iResult));  
-            std::getline(str, line); //Command line 'o', discard
-            std::getline(str, line); //number of subdivision
-            int n = std::stoi(line);
-            app._bezier_params.subdivisions = n;
-          }
-          //Calculate curve from scratch
-          else{
-            std::istringstream str(std::string(recvbuf, iResult));
-            while(str) read_point_bar(str, tmp); 
-            //Calculate curve
-            auto polygon = bezier_segment{};
-            for (int i = 0; i < tmp.size(); ++i) {
-              polygon[i] = tmp[i];
-            }
-            auto points = bezier_uniform(app.mesh, polygon, app._bezier_params);
-            auto res = make_polyline_positions_meshpoints(app.mesh, points);
-            // Send curve
-            send_polyline(ClientSocket, res);
-          }
-
-          tmp.clear();
-        } else if (iResult == 0)
-            printf("Connection closing...\n");
-        else {
-            printf("recv failed: %d\n", WSAGetLastError());
-            closesocket(ClientSocket);
-            WSACleanup();
-            return 1;
+    //The listen socket is closed when the server stops, anything else is an error
+    int status = 0;
+    {
+        std::lock_guard<std::mutex> lock(server->mutex);
+        if(!server->closing) {
+            printf("accept failed: %d\n", WSAGetLastError());
+            status = 1;
         }
-    } while (iResult > 0);
-    return 0;
+    }
+    stop_server(*server);
+    for(auto& worker : pool) worker.join();
+    WSACleanup();
+    return status;
 }
 
-int blender_connection(App& app) {
+int blender_connection(App& app, const string& port, int workers) {
     WSADATA wsaData;
     int iResult;
 
@@ -2034,7 +2385,7 @@ int blender_connection(App& app) {
     hints.ai_flags = AI_PASSIVE;
 
     // Resolve the local address and port to be used by the server
-    iResult = getaddrinfo(NULL, DEFAULT_PORT, &hints, &result);
+    iResult = getaddrinfo(NULL, port.c_str(), &hints, &result);
     if (iResult != 0) {
         printf("getaddrinfo failed: %d\n", iResult);
         WSACleanup();
@@ -2069,7 +2420,14 @@ int blender_connection(App& app) {
         return 1;
     }
 
-    t1 = std::thread(listen_blender, ListenSocket, std::ref(app));
+    //Handshake line: clients can connect from now on
+    //The port actually bound is printed, with port 0 the system picks a free one
+    sockaddr_in bound = {};
+    socklen_t bound_size = sizeof(bound);
+    getsockname(ListenSocket, (sockaddr*)&bound, &bound_size);
+    printf("READY %d\n", ntohs(bound.sin_port));
+    fflush(stdout);
+    t1 = std::thread(listen_blender, ListenSocket, std::ref(app), workers);
     return 0;
 }
 
@@ -2083,6 +2441,8 @@ int main(int num_args, const char* args[]) {
   bool   log_colors = true;
   string playback   = "";
   int    msaa       = 1;
+  string port       = DEFAULT_PORT;
+  int    workers    = std::max((int)std::thread::hardware_concurrency(), 1);
 
   auto cli = make_cli("bezier", "interactive viewer for mesh processing");
   add_option(cli, "mesh", app.filename, "Model filenames", true);
@@ -2094,6 +2454,8 @@ int main(int num_args, const char* args[]) {
   add_option(cli, "--colors/--no-colors", log_colors, "Colored logs");
   add_option(cli, "--msaa", msaa, "OpenGL multisample anti-aliasing");
   add_option(cli, "--playback", playback, "Playback recorded input session");
+  add_option(cli, "--port", port, "Port of the Blender connection, 0 for any free port");
+  add_option(cli, "--workers", workers, "Threads computing the requests of the clients");
   parse_cli(cli, num_args, args);
 
   // Load model and init bvh for fast click-intersection.
@@ -2122,7 +2484,7 @@ int main(int num_args, const char* args[]) {
     app.playback = true;
   }
   */
-  blender_connection(app);
+  blender_connection(app, port, workers);
   t1.join();
   //run_ui(win, draw);
 
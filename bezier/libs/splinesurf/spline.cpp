@@ -73,7 +73,7 @@ geodesic_path my_compute_geodesic_path(const bezier_mesh& mesh,
 
   vector<int> parents;
   auto        strip = get_strip(mesh.solver, mesh.triangles, mesh.positions,
-      mesh.adjacencies, mesh.v2t, mesh.angles, end, start, parents);
+      mesh.adjacencies, mesh.v2t_table, end, start, parents);
   auto        path  = geodesic_path{};
   auto [cleaned, new_start, new_end] = cleaned_strip(
       mesh.triangles, mesh.positions, mesh.adjacencies, strip, start, end);
@@ -89,11 +89,17 @@ geodesic_path my_compute_geodesic_path(const bezier_mesh& mesh,
       new_start, new_end, cleaned);
   return path;
 }
+static thread_local path_solver current_solver = path_solver::dual;
+
+void set_path_solver(path_solver solver) { current_solver = solver; }
+
 geodesic_path compute_geodesic_path(const bezier_mesh& mesh,
     const mesh_point& start, const mesh_point& end, int thread_id) {
   // profile_function();
   check_point(start);
   check_point(end);
+  if (current_solver == path_solver::primal)
+    return my_compute_geodesic_path(mesh, start, end, thread_id);
   auto path = geodesic_path{};
   if (start.face == end.face) {
     path.start = start;
@@ -1130,6 +1136,7 @@ void subdivide_bezier_adaptive(const bezier_mesh& mesh,
     vector<mesh_point>& result, int& count_path, int& count_eval,
     int depth = 0) {
   // resulting beziers: (P0, Q0, R0, S) (S, R1, Q2, P3)
+  check_interrupted(params);
 
   if (depth > params.max_depth) {
     printf("%s: reached max depth!\n", __FUNCTION__);
@@ -1178,6 +1185,7 @@ void subdivide_bezier_adaptive(const bezier_mesh& mesh,
     const bezier_segment& input, bezier_params params,
     vector<mesh_point>& result, int depth = 0) {
   // resulting beziers: (P0, Q0, R0, S) (S, R1, Q2, P3)
+  check_interrupted(params);
 
   // if (depth > params.max_depth) {
   //   return;
@@ -1277,6 +1285,7 @@ vector<mesh_point> bezier_uniform(const bezier_mesh& mesh,
     result.clear();
     result.reserve(segments.size() * 2);
     for (auto i = 0; i < segments.size(); i++) {
+      check_interrupted(params);
       auto [split0, split1] = subdivide_bezier_polygon(mesh, segments[i], 0.5);
       count += 6;
       result.push_back(split0);
@@ -1302,6 +1311,7 @@ vector<mesh_point> bezier_uniform(const bezier_mesh& mesh,
     result.clear();
     result.reserve(segments.size() * 2);
     for (auto i = 0; i < segments.size(); i++) {
+      check_interrupted(params);
       auto [split0, split1] = subdivide_bezier_polygon(mesh, segments[i], 0.5);
       result.push_back(split0);
       result.push_back(split1);
@@ -1312,28 +1322,31 @@ vector<mesh_point> bezier_uniform(const bezier_mesh& mesh,
       (mesh_point*)segments.data() + segments.size() * 3};
 }
 
-// vector<mesh_point> bezier(const bezier_mesh& mesh,
-//     const bezier_segment& control_points, const bezier_params& params) {
-//   // profile_function();
-//   switch (params.algorithm) {
-//     case spline_algorithm::de_casteljau_uniform: {
-//       if (params.parallel)
-//         return bezier_uniform_parallel(mesh, control_points, params);
-//       else
-//         return bezier_uniform(mesh, control_points, params);
-//     }
-//     case spline_algorithm::de_casteljau_adaptive: {
-//       return bezier_adaptive(mesh, control_points, params);
-//     }
-//     case spline_algorithm::subdivision_uniform: {
-//       return spline_subdivision_uniform(
-//           mesh, control_points, params.subdivisions);
-//     }
-//     case spline_algorithm::subdivision_adaptive: {
-//       return spline_subdivision_adaptive(mesh, control_points, params);
-//     }
-//   }
-// }
+vector<mesh_point> bezier(const bezier_mesh& mesh,
+    const bezier_segment& control_points, const bezier_params& params) {
+  // profile_function();
+  switch (params.algorithm) {
+    case spline_algorithm::de_casteljau_adaptive: {
+      return bezier_adaptive(mesh, control_points, params);
+    }
+    case spline_algorithm::de_casteljau_classic: {
+      auto badones = vector<int>{};
+      return de_casteljau_classic(mesh, control_points, params, badones);
+    }
+    case spline_algorithm::subdivision_uniform: {
+      return spline_subdivision_uniform(mesh, control_points, params);
+    }
+    case spline_algorithm::subdivision_adaptive: {
+      return spline_subdivision_adaptive(mesh, control_points, params);
+    }
+    default: {
+      if (params.parallel)
+        return bezier_uniform_parallel(mesh, control_points, params);
+      else
+        return bezier_uniform(mesh, control_points, params);
+    }
+  }
+}
 
 // weighted averages (Note:gradients needs to be a vector such that at the
 // i-th entry constains the gradient field of the squared distance field from
@@ -1510,8 +1523,9 @@ pair<spline_node, spline_node> split_spline_node(const bezier_mesh& mesh,
 }
 
 vector<mesh_point> spline_subdivision_uniform(const bezier_mesh& mesh,
-    const bezier_segment& control_points, int num_subdivisions) {
+    const bezier_segment& control_points, const bezier_params& params) {
   time_function();
+  auto num_subdivisions = params.subdivisions;
   auto size = 7;
   struct parametric_path {
     geodesic_path path = {};
@@ -1569,6 +1583,7 @@ vector<mesh_point> spline_subdivision_uniform(const bezier_mesh& mesh,
   auto p      = vector<mesh_point>{};
 
   for (int subdiv = 0; subdiv < num_subdivisions; subdiv++) {
+    check_interrupted(params);
     std::swap(p, q);
 
     auto new_size = 2 * size - 3;
@@ -1594,6 +1609,7 @@ vector<mesh_point> spline_subdivision_uniform(const bezier_mesh& mesh,
     count_paths += 3;
     count_eval += 6;
     for (int j = 4; j < 2 * size - 8; j += 2) {
+      check_interrupted(params);
       q[j]           = prev;
       prev           = eval_geodesic_path(mesh.triangles, mesh.positions,
           mesh.adjacencies, curr_path.path, curr_path.t, 0.75);
@@ -1639,8 +1655,10 @@ vector<mesh_point> spline_subdivision_uniform(const bezier_mesh& mesh,
   return q;
 }
 vector<mesh_point> spline_subdivision_uniform(const bezier_mesh& mesh,
-    const quadratic_bezier_segment& control_points, int num_subdivisions) {
-  auto size = 6;
+    const quadratic_bezier_segment& control_points,
+    const bezier_params&            params) {
+  auto num_subdivisions = params.subdivisions;
+  auto size             = 6;
   struct parametric_path {
     geodesic_path path = {};
     vector<float> t    = {};
@@ -1686,6 +1704,7 @@ vector<mesh_point> spline_subdivision_uniform(const bezier_mesh& mesh,
   curr_path.t    = path_parameters(
       curr_path.path, mesh.triangles, mesh.positions, mesh.adjacencies);
   for (int subdiv = 0; subdiv < num_subdivisions; subdiv++) {
+    check_interrupted(params);
     std::swap(p, q);
 
     auto new_size = 2 * size - 2;
@@ -1700,6 +1719,7 @@ vector<mesh_point> spline_subdivision_uniform(const bezier_mesh& mesh,
     count_paths += 1;
     count_eval += 1;
     for (int j = 2; j < 2 * size - 4; j += 2) {
+      check_interrupted(params);
       q[j]           = eval_geodesic_path(mesh.triangles, mesh.positions,
           mesh.adjacencies, curr_path.path, curr_path.t, 0.25);
       q[j + 1]       = eval_geodesic_path(mesh.triangles, mesh.positions,
@@ -1769,6 +1789,7 @@ vector<mesh_point> spline_subdivision_adaptive(const bezier_mesh& mesh,
   auto P                 = vector<spline_node>{};
   bool max_depth_reached = false;
   while (!Q.empty()) {
+    check_interrupted(params);
     auto curr = Q.back();
     Q.pop_back();
     if (P.size() > 0 && P.back().depth == curr.depth && curr.is_good) {
@@ -1997,6 +2018,7 @@ vector<mesh_point> de_casteljau_classic(const bezier_mesh& mesh,
   polyline.push_back(polygon[0]);
   geodesic_path L01, L12, L;
   for (int i = 1; i < pow(2, params.subdivisions); ++i) {
+    check_interrupted(params);
     auto p01 = eval_path_point(mesh, L0, t);
     auto p12 = eval_path_point(mesh, L1, t);
     auto p23 = eval_path_point(mesh, L2, t);
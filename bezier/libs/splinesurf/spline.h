@@ -8,6 +8,7 @@
 #include <Eigen/Dense>
 #include <Eigen/Sparse>
 #include <deque>
+#include <functional>
 #include <iostream>
 
 #include "karcher.h"
@@ -27,6 +28,13 @@ inline bool check_point(const mesh_point& point) {
   return true;
 }
 
+// Structures of bezier_mesh built on first use by the computations needing
+// them, see build_mesh_data in splineio.h. The adjacencies are always built.
+// primal_solver: solver and v2t_table
+enum struct mesh_data { normals = 0, dual_solver, primal_solver };
+const auto mesh_data_names = vector<string>{
+    "normals", "dual_solver", "primal_solver"};
+
 // namespace flipout {
 // struct flipout_mesh;
 // }
@@ -42,9 +50,14 @@ struct bezier_mesh {
   vector<vector<int>>            v2t          = {};
   vector<vector<float>>          angles       = {};
   vector<float>                  total_angles = {};
+  // Compressed v2t, used by the primal path solver
+  vertex_table<int>              v2t_table    = {};
   dual_geodesic_solver           dual_solver  = {};
   Eigen::SparseMatrix<double, 1> Grad;
   float                          avg_edge_length = 0.f;
+  // Milliseconds spent building each mesh_data, and loading the mesh
+  array<double, 3> data_build_ms = {};
+  double           load_ms       = 0;
 };
 
 enum struct spline_algorithm {
@@ -62,6 +75,18 @@ const auto spline_algorithm_names = vector<string>{
 
 };
 
+// Karcher needs the HEAVY mesh data, flipout is not built
+inline bool is_available(spline_algorithm algorithm) {
+  return algorithm != spline_algorithm::karcher &&
+         algorithm != spline_algorithm::flipout;
+}
+
+// Solver of the geodesic paths: strips from the dual graph of the triangles
+// (compute_geodesic_path) or from the graph of the vertices
+// (my_compute_geodesic_path, needs mesh.solver and mesh.v2t_table)
+enum struct path_solver { dual = 0, primal };
+const auto path_solver_names = vector<string>{"dual", "primal"};
+
 const auto levels_names = vector<string>{
     "control polygon", "first level", "second level", "third level", "curve"};
 
@@ -75,8 +100,22 @@ struct bezier_params {
   float            min_curve_size = 0.001;
   int              max_depth      = 10;
   bool             parallel       = false;
+  path_solver      solver         = path_solver::dual;
+  // Polled between subdivision steps, long computations stop by throwing
+  // operation_interrupted when it returns true
+  std::function<bool()> interrupted = {};
 };
 
+// Computation stopped by bezier_params::interrupted (cancelled by the client
+// or past its deadline)
+struct operation_interrupted : std::exception {
+  const char* what() const noexcept override { return "operation interrupted"; }
+};
+
+inline void check_interrupted(const bezier_params& params) {
+  if (params.interrupted && params.interrupted()) throw operation_interrupted{};
+}
+
 using bezier_segment = array<mesh_point, 4>;
 
 using quadratic_bezier_segment = array<mesh_point, 3>;
@@ -174,6 +213,8 @@ std::array<bezier_segment, 2> insert_point_spline(const bezier_mesh& mesh,
     const bezier_segment& polygon, const float& t0,
     const bezier_params& params);
 
+// Curve points with params.algorithm, unavailable algorithms fall back to
+// de_casteljau_uniform. The points are joined by geodesic paths.
 vector<mesh_point> bezier(const bezier_mesh& mesh,
     const bezier_segment& control_points, const bezier_params& params);
 
@@ -212,6 +253,10 @@ RDC_algorithm(bezier_mesh& mesh, const bezier_segment& control_points);
 geodesic_path compute_geodesic_path(const bezier_mesh& mesh,
     const mesh_point& start, const mesh_point& end, int thread_id = 0);
 
+// Solver used by compute_geodesic_path in the calling thread, so that each
+// thread can compute with the params of its own request
+void set_path_solver(path_solver solver);
+
 geodesic_path my_compute_geodesic_path(const bezier_mesh& mesh,
     const mesh_point& start, const mesh_point& end, int thread_id = 0);
 
@@ -446,10 +491,11 @@ inline void print(const bezier_segment& segment) {
 }
 
 vector<mesh_point> spline_subdivision_uniform(const bezier_mesh& mesh,
-    const array<mesh_point, 4>& control_points, int num_subdivisions);
+    const array<mesh_point, 4>& control_points, const bezier_params& params);
 
 vector<mesh_point> spline_subdivision_uniform(const bezier_mesh& mesh,
-    const quadratic_bezier_segment& control_points, int num_subdivisions);
+    const quadratic_bezier_segment& control_points,
+    const bezier_params&            params);
 
 vector<mesh_point> spline_subdivision_adaptive(const bezier_mesh& mesh,
     const array<mesh_point, 4>& polygon, const bezier_params& params);
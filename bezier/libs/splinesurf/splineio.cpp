@@ -2,6 +2,8 @@
 
 #include <yocto/yocto_commonio.h>
 
+#include <chrono>
+
 #include "ext/json.hpp"
 
 using json = nlohmann::json;
@@ -152,7 +154,92 @@ void read_blender_obj(const string& filename, vector<vec3f>& positions, vector<v
       }*/
 }
 
+// Data depending on the positions, the topology must be already set
+// Only the structures already built are rebuilt
+static void init_mesh_geometry(bezier_mesh& mesh) {
+  // Normalize positions in the cube [-1, 1]^3
+  auto bbox = invalidb3f;
+  for (auto& p : mesh.positions) bbox = merge(bbox, p);
+  auto center = (bbox.max + bbox.min) / 2;
+  auto scale  = 1.0f / max(bbox.max - bbox.min);
+  for (auto& p : mesh.positions) p = (p - center) * scale;
+
+  for (auto data = 0; data < (int)mesh_data_names.size(); data++)
+    if (has_mesh_data(mesh, (mesh_data)data))
+      build_mesh_data(mesh, (mesh_data)data);
+#if HEAVY
+  build_mesh_data(mesh, mesh_data::normals);
+  build_mesh_data(mesh, mesh_data::dual_solver);
+  build_mesh_data(mesh, mesh_data::primal_solver);
+  init_mesh(mesh, true);
+#endif
+}
+
+bool has_mesh_data(const bezier_mesh& mesh, mesh_data data) {
+  switch (data) {
+    case mesh_data::normals: return !mesh.normals.empty();
+    case mesh_data::dual_solver: return !mesh.dual_solver.graph.empty();
+    case mesh_data::primal_solver: return !mesh.v2t_table.empty();
+  }
+  return false;
+}
+
+void build_mesh_data(bezier_mesh& mesh, mesh_data data) {
+  auto start = std::chrono::steady_clock::now();
+  switch (data) {
+    case mesh_data::normals: {
+      mesh.normals = compute_normals(mesh.triangles, mesh.positions);
+    } break;
+    case mesh_data::dual_solver: {
+      mesh.dual_solver = make_dual_geodesic_solver(
+          mesh.triangles, mesh.positions, mesh.adjacencies);
+    } break;
+    case mesh_data::primal_solver: {
+      // The angles are needed only by the experimental algorithms (HEAVY)
+      auto v2t = vertex_to_triangles(
+          mesh.triangles, mesh.positions, mesh.adjacencies);
+      mesh.solver = make_geodesic_solver(
+          mesh.triangles, mesh.positions, mesh.adjacencies, v2t);
+      mesh.v2t_table = make_vertex_table(v2t);
+    } break;
+  }
+  mesh.data_build_ms[(int)data] = std::chrono::duration<double, std::milli>(
+      std::chrono::steady_clock::now() - start)
+                                      .count();
+}
+
+template <typename T>
+static size_t vector_bytes(const vector<T>& v) {
+  return v.capacity() * sizeof(T);
+}
+template <typename T>
+static size_t vector_bytes(const vector<vector<T>>& v) {
+  auto bytes = v.capacity() * sizeof(vector<T>);
+  for (auto& item : v) bytes += item.capacity() * sizeof(T);
+  return bytes;
+}
+
+size_t mesh_data_bytes(const bezier_mesh& mesh, mesh_data data) {
+  switch (data) {
+    case mesh_data::normals: return vector_bytes(mesh.normals);
+    case mesh_data::dual_solver:
+      return vector_bytes(mesh.dual_solver.graph) +
+             vector_bytes(mesh.dual_solver.parent_faces);
+    case mesh_data::primal_solver:
+      return vector_bytes(mesh.v2t_table.offsets) +
+             vector_bytes(mesh.v2t_table.values) +
+             vector_bytes(mesh.solver.graph);
+  }
+  return 0;
+}
+
+size_t mesh_bytes(const bezier_mesh& mesh) {
+  return vector_bytes(mesh.triangles) + vector_bytes(mesh.adjacencies) +
+         vector_bytes(mesh.positions);
+}
+
 bool load_mesh(const string& filename, bezier_mesh& mesh, string& error) {
+  auto start = std::chrono::steady_clock::now();
   mesh = bezier_mesh{};
 
   vector<int>   points;
@@ -192,20 +279,18 @@ bool load_mesh(const string& filename, bezier_mesh& mesh, string& error) {
 #endif
 
   // bumped_sphere(0.0001f, mesh.positions);
-  // Normalize positions in the cube [-1, 1]^3
-  auto bbox = invalidb3f;
-  for (auto& p : mesh.positions) bbox = merge(bbox, p);
-  auto center = (bbox.max + bbox.min) / 2;
-  auto scale  = 1.0f / max(bbox.max - bbox.min);
-  for (auto& p : mesh.positions) p = (p - center) * scale;
-
-  mesh.normals     = compute_normals(mesh.triangles, mesh.positions);
   mesh.adjacencies = face_adjacencies(mesh.triangles);
-  mesh.dual_solver = make_dual_geodesic_solver(
-      mesh.triangles, mesh.positions, mesh.adjacencies);
-#if HEAVY
-  init_mesh(mesh, true);
-#endif
+  init_mesh_geometry(mesh);
+  mesh.load_ms = std::chrono::duration<double, std::milli>(
+      std::chrono::steady_clock::now() - start)
+                     .count();
+  return true;
+}
+
+bool update_mesh_positions(bezier_mesh& mesh, const vector<vec3f>& positions) {
+  if (positions.size() != mesh.positions.size()) return false;
+  mesh.positions = positions;
+  init_mesh_geometry(mesh);
   return true;
 }
 
@@ -216,6 +301,7 @@ bool load_mesh(const string& filename, bezier_mesh& mesh, string& error) {
 Svg load_svg(const string& filename) {
   struct NSVGimage* image;
   image = nsvgParseFromFile(filename.c_str(), "px", 96);
+  if (image == nullptr) return {};
   printf("size: %f x %f\n", image->width, image->height);
   auto size = vec2f{image->width, image->height};
 
@@ -3,6 +3,19 @@
 #include "spline.h"
 
 bool load_mesh(const string& filename, bezier_mesh& mesh, string& error);
+// Replaces the vertex positions keeping the topology, recomputes the data that
+// depends on them. Returns false if the number of vertices differs.
+bool update_mesh_positions(bezier_mesh& mesh, const vector<vec3f>& positions);
+
+// Lazily built structures: the dual solver is needed by the default path
+// solver (compute_geodesic_path), the primal one by my_compute_geodesic_path,
+// the normals by straightest_geodesic_biermann. Built structures are rebuilt
+// by update_mesh_positions.
+bool   has_mesh_data(const bezier_mesh& mesh, mesh_data data);
+void   build_mesh_data(bezier_mesh& mesh, mesh_data data);
+size_t mesh_data_bytes(const bezier_mesh& mesh, mesh_data data);
+// Bytes of triangles, adjacencies and positions
+size_t mesh_bytes(const bezier_mesh& mesh);
 
 bool load_bezier_params(const string& filename, vector<mesh_point>& points,
     bezier_params& params, string& error);
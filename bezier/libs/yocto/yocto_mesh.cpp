@@ -76,6 +76,12 @@ static int find_in_vec(const vec3i &vec, int x) {
   return -1;
 }
 
+static int find_in_vec(const vertex_table<int>::row &vec, int x) {
+  for (auto i = 0; i < (int)vec.size(); i++)
+    if (vec[i] == x) return i;
+  return -1;
+}
+
 }  // namespace yocto
 
 // -----------------------------------------------------------------------------
@@ -2043,7 +2049,7 @@ vector<int> strip_on_dual_graph(const dual_geodesic_solver &solver,
 
 // TODO: cleanup
 static int node_is_neighboor(const geodesic_solver &solver, int vid, int node) {
-  auto nbr = solver.graph[vid];
+  auto &nbr = solver.graph[vid];
   for (auto i = 0; i < nbr.size(); ++i) {
     if (nbr[i].node == node) {
       return i;
@@ -2079,11 +2085,13 @@ static bool set_ord(int s, int prev_entry, int next_entry, bool nei_is_dual) {
 // }
 
 // TODO: cleanup
-static void fill_strip(vector<int> &strip, const vector<vector<int>> &v2t,
-    int vid, int first, int last, bool nei_is_dual, bool ccw) {
-  auto  start = first, end = last;
-  auto &star = v2t[vid];
-  auto  s    = (int)star.size();
+// V2T: vector<vector<int>> or vertex_table<int>
+template <typename V2T>
+static void fill_strip(vector<int> &strip, const V2T &v2t, int vid, int first,
+    int last, bool nei_is_dual, bool ccw) {
+  auto        start = first, end = last;
+  const auto &star  = v2t[vid];
+  auto        s     = (int)star.size();
   if (ccw && !nei_is_dual)
     end = (s - 1 + end) % s;  // I can stop one face earlier;
   if (start == end) {
@@ -2106,10 +2114,11 @@ static void fill_strip(vector<int> &strip, const vector<vector<int>> &v2t,
 // TODO: cleanup
 // TO DO (claudio):the connectivity of a mesh_point changed again,modify this
 // function accordingly.
+template <typename V2T>
 static int get_entry(vector<int> &strip, const geodesic_solver &solver,
     const vector<vec3i> &triangles, const vector<vec3f> &positions,
-    const vector<vec3i> &adjacencies, const vector<vector<int>> &v2t,
-    const vector<vector<float>> &angles, int parent, const mesh_point &p) {
+    const vector<vec3i> &adjacencies, const V2T &v2t, int parent,
+    const mesh_point &p) {
   strip = {p.face};
   if (auto [is_vert, offset] = point_is_vert(p); is_vert) {
     auto vid   = triangles[p.face][offset];
@@ -2121,8 +2130,8 @@ static int get_entry(vector<int> &strip, const geodesic_solver &solver,
     assert(entry >= 0);
     auto star        = v2t[vid];
     auto s           = (int)star.size();
-    auto it          = find(star.begin(), star.end(), p.face);
-    auto first       = (int)distance(star.begin(), it);
+    auto it          = std::find(star.begin(), star.end(), p.face);
+    auto first       = (int)std::distance(star.begin(), it);
     auto last        = (entry % 2) ? (entry - 1) / 2 : (entry / 2) % s;
     auto ccw         = set_ord(s, first, last, entry % 2);
     auto nei_is_dual = (bool)(entry % 2);  // TODO(fabio): ma qusto e' giusto?
@@ -2186,16 +2195,17 @@ static int get_entry(vector<int> &strip, const geodesic_solver &solver,
 }
 
 // TODO: cleanup
-void close_strip(vector<int> &strip, const vector<vector<int>> &v2t, int vid,
-    int prev_tri, int last_tri) {
+template <typename V2T>
+static void close_strip(
+    vector<int> &strip, const V2T &v2t, int vid, int prev_tri, int last_tri) {
   auto star    = v2t[vid];
   auto s       = (int)star.size();
-  auto prev_it = find(star.begin(), star.end(), prev_tri);
+  auto prev_it = std::find(star.begin(), star.end(), prev_tri);
   assert(prev_it != star.end());
-  auto first   = (int)distance(star.begin(), prev_it);
-  auto next_it = find(star.begin(), star.end(), last_tri);
+  auto first   = (int)std::distance(star.begin(), prev_it);
+  auto next_it = std::find(star.begin(), star.end(), last_tri);
   assert(next_it != star.end());
-  auto last = (int)distance(star.begin(), next_it);
+  auto last = (int)std::distance(star.begin(), next_it);
   auto ccw  = set_ord(s, first, last, true);
   fill_strip(strip, v2t, vid, first, last, true, ccw);
 }
@@ -2203,17 +2213,17 @@ void close_strip(vector<int> &strip, const vector<vector<int>> &v2t, int vid,
 // TODO: cleanup
 // particular case of "get strip" when one of the two point is the parent of
 // the other so the size of the strip is one or two
+template <typename V2T>
 static vector<int> short_strip(const geodesic_solver &solver,
     const vector<vec3i> &triangles, const vector<vec3f> &positions,
-    const vector<vec3i> &adjacencies, const vector<vector<int>> &v2t,
-    const vector<vector<float>> &angles, const mesh_point &source,
+    const vector<vec3i> &adjacencies, const V2T &v2t, const mesh_point &source,
     const mesh_point &target) {
   auto entry = 0;
   auto strip = vector<int>{};
   if (auto [is_vert, offset] = point_is_vert(target); is_vert) {
     auto vid = triangles[target.face][offset];
-    entry    = get_entry(strip, solver, triangles, positions, adjacencies, v2t,
-           angles, vid, source);
+    entry    = get_entry(
+        strip, solver, triangles, positions, adjacencies, v2t, vid, source);
     if (entry < 0) return {target.face};
     if (strip.back() != target.face) {
       close_strip(strip, v2t, vid, strip.back(), target.face);
@@ -2221,8 +2231,8 @@ static vector<int> short_strip(const geodesic_solver &solver,
     reverse(strip.begin(), strip.end());
   } else if (auto [is_vert, offset] = point_is_vert(source); is_vert) {
     auto vid = triangles[source.face][offset];
-    entry    = get_entry(strip, solver, triangles, positions, adjacencies, v2t,
-           angles, vid, target);
+    entry    = get_entry(
+        strip, solver, triangles, positions, adjacencies, v2t, vid, target);
     if (strip.back() != source.face) {
       close_strip(strip, v2t, vid, strip.back(), source.face);
     }
@@ -2237,10 +2247,10 @@ static vector<int> short_strip(const geodesic_solver &solver,
 // source to the last one
 // TODO(fabio_): may be the names could change in order to get the call
 // more consistent with the output)
-vector<int> get_strip(const geodesic_solver &solver,
+template <typename V2T>
+static vector<int> get_strip_impl(const geodesic_solver &solver,
     const vector<vec3i> &triangles, const vector<vec3f> &positions,
-    const vector<vec3i> &adjacencies, const vector<vector<int>> &v2t,
-    const vector<vector<float>> &angles, const mesh_point &source,
+    const vector<vec3i> &adjacencies, const V2T &v2t, const mesh_point &source,
     const mesh_point &target, vector<int> &parents) {
   if (target.face == source.face) return {target.face};
   parents = point_to_point_geodesic_path(
@@ -2251,13 +2261,13 @@ vector<int> get_strip(const geodesic_solver &solver,
   auto ccw = false, nei_is_dual = false;
   if (N == 0) {
     return short_strip(
-        solver, triangles, positions, adjacencies, v2t, angles, source, target);
+        solver, triangles, positions, adjacencies, v2t, source, target);
   } else if (N == 1) {
     auto v      = parents[0];
-    prev_entry  = get_entry(strip, solver, triangles, positions, adjacencies,
-         v2t, angles, v, target);
+    prev_entry  = get_entry(
+        strip, solver, triangles, positions, adjacencies, v2t, v, target);
     next_entry  = get_entry(strip_to_point, solver, triangles, positions,
-         adjacencies, v2t, angles, v, source);
+        adjacencies, v2t, v, source);
     first       = find_in_vec(v2t[v], strip.back());
     nei_is_dual = next_entry % 2;
     last        = (nei_is_dual) ? (next_entry - 1) / 2 : next_entry / 2;
@@ -2270,7 +2280,7 @@ vector<int> get_strip(const geodesic_solver &solver,
     return strip;
   } else {
     prev_entry = get_entry(strip, solver, triangles, positions, adjacencies,
-        v2t, angles, parents[0], target);
+        v2t, parents[0], target);
   }
 
   for (auto i = 0; i < N; ++i) {
@@ -2278,7 +2288,7 @@ vector<int> get_strip(const geodesic_solver &solver,
     if (i == N - 1) {
       first      = find_in_vec(v2t[v], strip.back());
       next_entry = get_entry(strip_to_point, solver, triangles, positions,
-          adjacencies, v2t, angles, v, source);
+          adjacencies, v2t, v, source);
       last       = find_in_vec(v2t[v], strip_to_point.back());
       ccw        = set_ord((int)v2t[v].size(), first, last, next_entry % 2);
     } else {
@@ -2305,6 +2315,24 @@ vector<int> get_strip(const geodesic_solver &solver,
   return strip;
 }
 
+// The angles are not needed to walk around the vertices of the path
+vector<int> get_strip(const geodesic_solver &solver,
+    const vector<vec3i> &triangles, const vector<vec3f> &positions,
+    const vector<vec3i> &adjacencies, const vector<vector<int>> &v2t,
+    const vector<vector<float>> &angles, const mesh_point &source,
+    const mesh_point &target, vector<int> &parents) {
+  return get_strip_impl(solver, triangles, positions, adjacencies, v2t, source,
+      target, parents);
+}
+
+vector<int> get_strip(const geodesic_solver &solver,
+    const vector<vec3i> &triangles, const vector<vec3f> &positions,
+    const vector<vec3i> &adjacencies, const vertex_table<int> &v2t,
+    const mesh_point &source, const mesh_point &target, vector<int> &parents) {
+  return get_strip_impl(solver, triangles, positions, adjacencies, v2t, source,
+      target, parents);
+}
+
 }  // namespace yocto
 
 // -----------------------------------------------------------------------------
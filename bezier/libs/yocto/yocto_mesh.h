@@ -72,6 +72,44 @@ inline int mod3(int i) { return (i > 2) ? i - 3 : i; }
 vector<vector<int>> vertex_to_triangles(const vector<vec3i>& triangles,
     const vector<vec3f>& positions, const vector<vec3i>& adjacencies);
 
+// Table with a variable number of values for each vertex, stored as
+// compressed rows: the values of vertex v are values[offsets[v] :
+// offsets[v+1]]. Same read access of a vector<vector<T>> with a single
+// allocation and rows contiguous in memory.
+template <typename T>
+struct vertex_table {
+  struct row {
+    const T* first = nullptr;
+    const T* last  = nullptr;
+    const T* begin() const { return first; }
+    const T* end() const { return last; }
+    size_t   size() const { return last - first; }
+    const T& operator[](size_t i) const { return first[i]; }
+    const T& back() const { return *(last - 1); }
+  };
+  vector<int> offsets = {};
+  vector<T>   values  = {};
+  size_t      size() const { return offsets.empty() ? 0 : offsets.size() - 1; }
+  bool        empty() const { return offsets.empty(); }
+  row         operator[](int v) const {
+    return {values.data() + offsets[v], values.data() + offsets[v + 1]};
+  }
+};
+
+// Compressed copy of rows, see vertex_table
+template <typename T>
+inline vertex_table<T> make_vertex_table(const vector<vector<T>>& rows) {
+  auto table = vertex_table<T>{};
+  table.offsets.resize(rows.size() + 1);
+  table.offsets[0] = 0;
+  for (auto v = 0; v < (int)rows.size(); v++)
+    table.offsets[v + 1] = table.offsets[v] + (int)rows[v].size();
+  table.values.reserve(table.offsets.back());
+  for (auto& row : rows)
+    table.values.insert(table.values.end(), row.begin(), row.end());
+  return table;
+}
+
 // Face adjacent to t and opposite to vertex vid
 int opposite_face(const vector<vec3i>& triangles,
     const vector<vec3i>& adjacencies, int t, int vid);
@@ -312,6 +350,11 @@ vector<int> get_strip(const geodesic_solver& solver,
     const vector<vec3i>& adjacencies, const vector<vector<int>>& v2t,
     const vector<vector<float>>& angles, const mesh_point& source,
     const mesh_point& target, vector<int>& parents);
+// Same strip from the compressed vertex to triangles table
+vector<int> get_strip(const geodesic_solver& solver,
+    const vector<vec3i>& triangles, const vector<vec3f>& positions,
+    const vector<vec3i>& adjacencies, const vertex_table<int>& v2t,
+    const mesh_point& source, const mesh_point& target, vector<int>& parents);
 
 }  // namespace yocto
 
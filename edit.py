@@ -1,17 +1,22 @@
 import sys
 import os
+import time
 import bpy
 import numpy as np
 
 from bpy_extras import view3d_utils
 from mathutils import Vector
-from mathutils.interpolate import poly_3d_calc
+from mathutils import kdtree
 
 dir = os.path.dirname(bpy.context.space_data.text.filepath) #Get directory of the .py file
 sys.path.append(dir) #Setting it as the python directory in the Blender Text editor
 
 import utils
 import spline
+import profiling
+
+SPLIT_STEPS = 100 #Ctrl+wheel steps along the whole curve in split mode, ten times more with shift
+PICK_RADIUS = 60 #Pixels from the click within which a control point or the curve is picked
 
 def create_poly(obj_name, color, bevel = 0.01):
     data = bpy.data.curves.new(name=obj_name+'_data', type='CURVE')  
@@ -29,16 +34,6 @@ def create_poly(obj_name, color, bevel = 0.01):
     data.bevel_depth = bevel
     return obj_tan
 
-def rotate_tan(p0, p1, p2, end):
-    send = "r" + str(end) + "\n"
-    send += utils.pbar2str( p0 ) 
-    send += utils.pbar2str( p1 ) 
-    send += utils.pbar2str( p2 ) 
-    try: spline.comm.s.sendall(send.encode())
-    except: return False
-    new_control = spline.comm.s.recv(2048).decode().splitlines()[0].split()
-    return [int(new_control[0]), [float(new_control[1]), float(new_control[2])]]
-
 def print_debug():
     print("_________________")
     print("Total geo objects: ", bpy.context.scene.total)
@@ -74,7 +69,20 @@ class EditCurveOperator(bpy.types.Operator):
         self.drag     = False
         
         self.split_mode = False
-        self.t0 = 0.1
+        self.t0 = 0.1 #Split parameter, integer part is the segment index
+        self.s0 = 0.0 #Arc length of the split point along the curve
+        
+        self.moving = None #Drag step being computed by the engine
+        self.next_move = None #Latest drag position received meanwhile, sent when the step is done
+        self.move_start = 0.0
+        self.timer = None #Polls the drag step while the mouse does not move
+        
+        self.session = -1 #Engine session of the edited curve
+        self.segments = [] #Polylines of the bezier segments in 3d coords
+        self.tables = [] #Curve parameter and arc length of each segment sample
+        self.polylines = [] #Polylines of the bezier segments in barycentric coords, cached with the curve
+        self.samples_tree = None #KD-tree of the segment samples, built by the first pick after the segments change
+        self.samples_index = [] #(segment, sample) of each point of samples_tree
 
     def modal(self, context, event):
         global is_running
@@ -98,34 +106,46 @@ class EditCurveOperator(bpy.types.Operator):
             self.init_refs()
             bpy.context.view_layer.objects.active = self.tan
             bpy.ops.object.mode_set(mode = 'EDIT') 
-            if not self.draw_curve(): return {'FINISHED'} 
-            if not self.draw_tan(context):   return {'FINISHED'}
+            tans = self.open_session(context)
+            if tans is None: return {'FINISHED'} 
+            if not self.draw_tan(context, tans): return {'FINISHED'}
         #Exit
         elif event.type == 'ESC':
+            #The drag step being computed is abandoned, the engine stops it
+            try:
+                if self.moving is not None: self.moving.cancel()
+                spline.comm.conn.discard(utils.session_end(spline.comm.conn, self.session).rid)
+            except: pass
+            self.stop_timer()
             bpy.data.objects.remove(self.tan, do_unlink=True)
             is_running = False
             return {'FINISHED'}
 
         #Split mode functions
         elif self.split_mode:
-            if event.type == 'WHEELUPMOUSE' and event.ctrl:
-                n_splines = (len(self.points_bar) - 1)/3
-                if self.t0 < n_splines: 
-                    self.t0 = self.t0 + 0.1
-                    self.t0 = round(self.t0,1)
-                if not self.draw_t0(): return {'FINISHED'}
-            elif event.type == 'WHEELDOWNMOUSE' and event.ctrl:
-                if self.t0 > 0: 
-                    self.t0 = self.t0 - 0.1
-                    self.t0 = round(self.t0,1)
-                if not self.draw_t0(): return {'FINISHED'}
+            if event.type in {'WHEELUPMOUSE', 'WHEELDOWNMOUSE'} and event.ctrl:
+                #Arc length uniform steps
+                length = utils.curve_length(self.tables)
+                step = length / SPLIT_STEPS
+                if event.shift: step /= 10
+                if event.type == 'WHEELDOWNMOUSE': step = -step
+                self.s0 = min(max(self.s0 + step, 0.0), length)
+                self.draw_t0()
             elif event.type == 'LEFTMOUSE' and event.value == 'RELEASE':
-                if not self.split(context): return {'FINISHED'} 
+                #Clicking on the curve splits there, elsewhere at the point chosen with the wheel
+                hit_obj, loc, normal, face_index = utils.ray_cast(context, event)
+                if hit_obj and bpy.context.scene.objects[hit_obj.name] == self.target:
+                    picked = self.pick_curve(context, (event.mouse_region_x, event.mouse_region_y), hit_obj.matrix_world @ loc)
+                    if picked is not None:
+                        segment, k = picked
+                        self.s0 = utils.curve_length(self.tables[:segment]) + self.tables[segment][1][k]
+                        self.draw_t0()
+                tans = self.split(context)
+                if tans is None: return {'FINISHED'} 
                 self.split_mode = False
                 self.t0 = 0.1
                 self.report({'INFO'}, "Splitted")
-                if not self.draw_curve(): return {'FINISHED'}
-                if not self.draw_tan(context): return {'FINISHED'} 
+                if not self.draw_tan(context, tans): return {'FINISHED'} 
                 self.push_state()
             elif event.type== 'S' and event.value== 'RELEASE':
                 self.split_mode = False
@@ -134,12 +154,16 @@ class EditCurveOperator(bpy.types.Operator):
                 self.report({'INFO'}, "Exit split mode")
             return {'RUNNING_MODAL'}
         #Normal editing operations       
+        elif event.type == 'TIMER':
+            if not self.step_drag(context): return {'FINISHED'}
+            return {'RUNNING_MODAL'}
         elif event.type == 'LEFTMOUSE':
             if event.value == 'PRESS': self.clicking = True
             if event.value == 'RELEASE':
                 self.clicking = False
                 if self.drag:
                     self.drag = False
+                    if not self.step_drag(context, wait=True): return {'FINISHED'}
                     self.push_state()
                     return {'RUNNING_MODAL'}
                 #If was not dragging pick
@@ -149,7 +173,7 @@ class EditCurveOperator(bpy.types.Operator):
                 if utils.key_name in hit_obj and hit_obj[utils.key_name] == self.target[utils.key_name]:
                     #Correct object hit
                     coord = event.mouse_region_x, event.mouse_region_y
-                    if not self.pick(context, coord): return {'FINISHED'}  
+                    if not self.pick(context, coord, hit_obj.matrix_world @ loc): return {'FINISHED'}  
                     if not self.draw_tan(context): return {'FINISHED'}
                     self.push_state()
             return {'RUNNING_MODAL'}
@@ -163,78 +187,30 @@ class EditCurveOperator(bpy.types.Operator):
                 coord = event.mouse_region_x, event.mouse_region_y
                 if self.curve_item.is_closed: return {'RUNNING_MODAL'}
                 #Get barycentric coords
-                mesh = self.target.data
-                poly = mesh.polygons[face_index]
-                corners = [mesh.vertices[vid].co for vid in poly.vertices]
-                bcoords = poly_3d_calc(corners, loc)
-                new_point = [face_index , bcoords[1:]]
-                #Add control point
-                try: 
-                    utils.send_tan_extension(spline.comm.s, self.points_bar[-2], self.points_bar[-1])
-                    new_control = spline.comm.s.recv(2048).decode().splitlines()[0].split()
+                new_point = utils.hit_point(self.target.data, face_index, loc)
+                #Add control point, new last anchor tangents requested together
+                context.scene.curr_idx = len(self.points_bar) + 2
+                extend = utils.session_extend(spline.comm.conn, self.target, self.session, new_point)
+                tans = self.request_tans(context)
+                try: update = extend.result()
                 except:
                     self.invalidate_target()
                     return {'FINISHED'}
-                new_bar = [int(new_control[0]), [float(new_control[1]), float(new_control[2])]]
-                new_points_bar = [self.points_bar[-1].get(), new_bar, new_point, new_point]
-                
-                if not self.add_curve(context, new_points_bar): return {'FINISHED'} 
-                if not self.draw_tan(context): return {'FINISHED'}
+                self.apply_update(update)
+                if not self.draw_tan(context, tans): return {'FINISHED'}
                 self.push_state()
             return {'RUNNING_MODAL'}
         #Drag
         elif event.type == 'MOUSEMOVE' and self.clicking:
             if not self.drag:
                 self.drag = True
-            hit_obj, loc, normal, face_index = utils.ray_cast(context, event)
+            with profiling.timed("drag/ray_cast"): hit_obj, loc, normal, face_index = utils.ray_cast(context, event)
             if not hit_obj: return {'RUNNING_MODAL'}
             hit_obj = bpy.context.scene.objects[hit_obj.name]
             if utils.key_name in hit_obj and hit_obj[utils.key_name] == self.target[utils.key_name]:
-                idx = context.scene.curr_idx
                 #Calculate barycentric coords
-                mesh = self.target.data
-                poly = mesh.polygons[face_index]
-                corners = [mesh.vertices[vid].co for vid in poly.vertices]
-                bcoords = poly_3d_calc(corners, loc)
-                new_point = [face_index , bcoords[1:]]
-                #Update point
-                utils.update_point(self.points_bar[idx], new_point)
-                            
-                #Closed curve cases
-                if self.curve_item.is_closed and idx == 0:
-                    utils.update_point(self.points_bar[idx-1], new_point)
-                    
-                if self.curve_item.is_closed and idx == len(self.points_bar) - 1:
-                    utils.update_point(self.points_bar[0], new_point)
-                     
-                #Draw
-                if not self.draw_curve(): return {'FINISHED'}
-                #Update tangents
-                if self.curve_item.smooth:
-                    idx = context.scene.curr_idx
-                    if idx % 3 == 1 and (idx > 1 or self.curve_item.is_closed):
-                        p1 = idx-2
-                        p2 = idx-1
-                        p3 = idx
-                        if idx == 1: p1 = len(self.points_bar) -2 
-                        new_point = rotate_tan(self.points_bar[p1].get(), self.points_bar[p2].get(), self.points_bar[p3].get(), 0)
-                        if not new_point:
-                            self.invalidate_target()
-                            return {'FINISHED'}
-                        utils.update_point(self.points_bar[p1], new_point)
-                        
-                    if idx%3==2 and (idx<len(self.points_bar)-2 or self.curve_item.is_closed):
-                        p1 = idx
-                        p2 = idx+1
-                        p3 = idx+2
-                        if idx == len(self.points_bar) -2: p3 = 1
-                        new_point = rotate_tan(self.points_bar[p1].get(), self.points_bar[p2].get(), self.points_bar[p3].get(), 1)
-                        if not new_point:
-                            self.invalidate_target()
-                            return {'FINISHED'}
-                        utils.update_point(self.points_bar[p3], new_point)
-                     
-                if not self.draw_tan(context): return {'FINISHED'}
+                self.next_move = utils.hit_point(self.target.data, face_index, loc)
+                if not self.step_drag(context): return {'FINISHED'}
             return {'RUNNING_MODAL'}
         #Sharp/smooth tangents switch
         elif event.type== 'T' and event.value== 'RELEASE':
@@ -255,53 +231,32 @@ class EditCurveOperator(bpy.types.Operator):
             bpy.context.view_layer.objects.active = self.tan
             bpy.ops.object.mode_set(mode = 'EDIT') 
             self.tan.data.splines[0].points[0].select = True 
-            if not self.draw_t0(): return {'FINISHED'}
+            self.s0 = utils.curve_length(self.tables) / SPLIT_STEPS
+            self.draw_t0()
             return {'RUNNING_MODAL'}
             
         #Close spline
         elif event.type == 'C' and event.value == 'RELEASE':
             #print("Closed test: ", self.curve_item.is_closed)
             #self.push_state()
-            if not self.curve_item.is_closed: 
-                
-                #Close spline
-                start = self.points_bar[0].get()
-                end   = self.points_bar[-1].get()
-                #Check if already overlapping 
-                if start[0] != end[0] or start[1][0] != end[1][0] or start[1][1] != end[1][1]:  
-                    if self.curve_item.smooth:
-                        #Extension 1
-                        try:
-                            utils.send_tan_extension(spline.comm.s, self.points_bar[1], self.points_bar[0])
-                            new_control = spline.comm.s.recv(2048).decode().splitlines()[0].split()
-                        except:
-                            self.invalidate_target()
-                            return {'FINISHED'}
-                        new_bar_1 = [int(new_control[0]), [float(new_control[1]), float(new_control[2])]]
-                        #extension 2
-                        try:
-                            utils.send_tan_extension(spline.comm.s, self.points_bar[-2], self.points_bar[-1])
-                            new_control_2 = spline.comm.s.recv(2048).decode().splitlines()[0].split()
-                        except:
-                            self.invalidate_target()
-                            return {'FINISHED'}
-                        new_bar_2 = [int(new_control_2[0]), [float(new_control_2[1]), float(new_control_2[2])]]
-                        new_points_bar = [self.points_bar[-1].get(), new_bar_2, new_bar_1, self.points_bar[0].get()]
-                    else: new_points_bar = [self.points_bar[-1].get(), self.points_bar[-1].get(), self.points_bar[0].get(), self.points_bar[0].get()]
-                    if not self.add_curve(context, new_points_bar): return {'FINISHED'}
-                self.curve_item.is_closed = True
-                self.report({'INFO'}, "Spline closed")
-            else: 
-                self.curve_item.is_closed = False
-                self.report({'INFO'}, "Spline opened")
+            closed = not self.curve_item.is_closed
+            try: update = utils.session_close(spline.comm.conn, self.target, self.session, closed, self.curve_item.smooth).result()
+            except:
+                self.invalidate_target()
+                return {'FINISHED'}
+            self.apply_update(update)
+            if len(update[0]) > 0: context.scene.curr_idx = len(self.points_bar) - 1
+            self.curve_item.is_closed = closed
+            if closed: self.report({'INFO'}, "Spline closed")
+            else: self.report({'INFO'}, "Spline opened")
             self.push_state()
             return {'RUNNING_MODAL'}
         #Delete
         elif event.type == 'X' and event.value == 'RELEASE':
             #self.push_state()
-            self.delete_segment(context)
-            if not self.draw_curve(): return {'FINISHED'} 
-            if not self.draw_tan(context):   return {'FINISHED'}
+            tans = self.delete_segment(context)
+            if tans is None: return {'FINISHED'} 
+            if not self.draw_tan(context, tans): return {'FINISHED'}
             self.push_state()
         return {'RUNNING_MODAL'}
 
@@ -319,9 +274,12 @@ class EditCurveOperator(bpy.types.Operator):
             if not self.init_refs(): return {'CANCELLED'}
             bpy.ops.object.mode_set(mode='OBJECT') 
             bpy.ops.object.select_all(action='DESELECT')
-            spline.set_server(self.target)
-            if not self.draw_curve(): return {'CANCELLED'}
-            if not self.draw_tan(context): return {'CANCELLED'} 
+            if not spline.set_server(self.target):
+                self.invalidate_target()
+                return {'CANCELLED'}
+            tans = self.open_session(context)
+            if tans is None: return {'CANCELLED'}
+            if not self.draw_tan(context, tans): return {'CANCELLED'} 
             self.push_state()
             is_running = True
             context.window_manager.modal_handler_add(self)
@@ -353,39 +311,56 @@ class EditCurveOperator(bpy.types.Operator):
         self.points_bar = self.curve_item.points_bar
         return True
     
+    #Drag steps are computed one at a time without blocking Blender, so that ESC can abandon a slow one
+    #Positions received meanwhile are merged in the latest, sent when the previous step is drawn
+    #wait: block until every step is drawn
+    #Output: False if the target has been invalidated
+    def step_drag(self, context, wait = False):
+        while True:
+            if self.moving is not None:
+                try:
+                    if not wait and not self.moving.done(): return True
+                    update, tans = self.moving.result()
+                except:
+                    self.stop_timer()
+                    self.invalidate_target()
+                    return False
+                self.moving = None
+                #Draw
+                with profiling.timed("drag/write_curve"): self.apply_update(update)
+                with profiling.timed("drag/draw_tan"):
+                    if not self.draw_tan(context, tans):
+                        self.stop_timer()
+                        return False
+                profiling.record("drag/total", time.perf_counter() - self.move_start)
+            if self.next_move is None:
+                self.stop_timer()
+                return True
+            #Update point, tangents and changed segments
+            self.move_start = time.perf_counter()
+            self.moving = utils.session_move(spline.comm.conn, self.target, self.session, context.scene.curr_idx, self.next_move, self.curve_item.smooth)
+            self.next_move = None
+            if not wait:
+                if self.timer is None: self.timer = context.window_manager.event_timer_add(0.01, window=context.window)
+                return True
+
+    def stop_timer(self):
+        if self.timer is not None:
+            bpy.context.window_manager.event_timer_remove(self.timer)
+            self.timer = None
+    
     def push_state(self):
+        #Undo restores the segments with the control points
+        utils.store_cache(self.curve_item, utils.cache_tag(spline.comm.signature), self.polylines, self.tables)
         bpy.context.view_layer.objects.active = None
         bpy.ops.ed.undo_push()
         bpy.context.view_layer.objects.active = self.tan
     
-    def eval_point(self):
-        n_splines = (len(self.points_bar) - 1)/3
-        anchor = int(self.t0) * 3
-        t0_loc = self.t0 - int(self.t0)
-        if anchor == n_splines*3: 
-            anchor -= 3
-            t0_loc = 1
-        #print("Anchor: ", anchor, " t0: ", t0_loc)
-        
-        send = "p\n"+str(t0_loc)+"\n"
-        for i in range(4): send += utils.pbar2str( self.points_bar[anchor + i].get() ) 
-        spline.comm.s.sendall(send.encode())
-        new_control = spline.comm.s.recv(2048).decode().splitlines()[0].split()
-        return [int(new_control[0]), float(new_control[1]), float(new_control[2])]
-    
+    #Split point interpolated on the segment samples, the engine is called only for the split
     def draw_t0(self):
-        #Set coord
-        p_bar = []
-        try: 
-            p_bar.append( self.eval_point() ) 
-            utils.convert_coords(self.target, p_bar)
-        except:
-            self.invalidate_target()
-            return False
-        
-        x, y, z = p_bar[0]
+        self.t0, point = utils.eval_arc_length(self.segments, self.tables, self.s0)
+        x, y, z = point
         self.tan.data.splines[0].points[0].co = (x, y, z, 1.0) 
-        return True
     
     def draw_pickable(self, context):
         pickable = range(0, len(self.points_bar), 3) 
@@ -411,7 +386,26 @@ class EditCurveOperator(bpy.types.Operator):
                 poly.points[1].co = (x, y, z, 1)        
         
         
-    def pick(self, context, point_2d):
+    #Segment sample closest to location (world coords of the click on the target), if within PICK_RADIUS of the click
+    #Output: segment index and sample index, None if the curve is not under the click
+    def pick_curve(self, context, point_2d, location):
+        if self.samples_tree is None:
+            self.samples_tree = kdtree.KDTree(sum(len(segment) for segment in self.segments))
+            self.samples_index = []
+            for i, segment in enumerate(self.segments):
+                for k, co in enumerate(segment):
+                    self.samples_tree.insert(co, len(self.samples_index))
+                    self.samples_index.append( (i, k) )
+            self.samples_tree.balance()
+        co, index, dist = self.samples_tree.find(location)
+        if index is None: return None
+        co_2d = view3d_utils.location_3d_to_region_2d(context.region, context.space_data.region_3d, co)
+        if co_2d is None or (co_2d - Vector(point_2d)).length > PICK_RADIUS: return None
+        return self.samples_index[index]
+
+    #Pick the closest control point, or the closest anchor of the segment under the click
+    #location: click on the target in world coords
+    def pick(self, context, point_2d, location):
         obj = self.target
         points_bar = self.points_bar
         
@@ -444,92 +438,96 @@ class EditCurveOperator(bpy.types.Operator):
                 face_idx = p_item.get()[0]
                 hit_obj, _, _, hit_face = utils.ray_cast(context, None, co_2d)
                 if hit_obj and utils.key_name in hit_obj:
-                    if hit_obj[utils.key_name] == obj[utils.key_name] and hit_face == face_idx:
+                    if hit_obj[utils.key_name] == obj[utils.key_name] and hit_face == utils.triangle_polygon(obj.data, face_idx):
                         #Not occluded, can be selected
                         if best_idx == -1 or dist <= best_dist:
                             best_idx = idx
                             best_dist = dist
-        if best_idx != context.scene.curr_idx: 
-            if best_dist < 60: context.scene.curr_idx =  best_idx
-            else: context.scene.curr_idx = 0
-        
+        if best_idx != -1 and best_dist < PICK_RADIUS:
+            context.scene.curr_idx = best_idx
+            return True
+        #Anchor of the picked segment on the side of the click, so that X deletes around it
+        picked = self.pick_curve(context, point_2d, location)
+        if picked is None:
+            context.scene.curr_idx = 0
+            return True
+        segment, k = picked
+        params = self.tables[segment][0]
+        context.scene.curr_idx = 3 * segment if params[k] < 0.5 else 3 * (segment + 1)
         return True
     
+    #Output: pending tangents of the new anchor, None if failed
     def split(self, context):
-        #Send request
-        old_len = len(self.points_bar)
         anchor = int(self.t0) * 3
-        t0_loc = self.t0 - int(self.t0)
-        if anchor == len(self.points_bar) - 1: 
-            anchor -= 3
-            t0_loc = 1 
-        points_bar = []
-        for i in range(4): points_bar.append( self.points_bar[anchor + i].get() )
-        try: utils.send_split(spline.comm.s, points_bar, t0_loc)
+        if anchor == len(self.points_bar) - 1: anchor -= 3
+        context.scene.curr_idx = anchor + 3
+        split = utils.session_split(spline.comm.conn, self.target, self.session, self.t0)
+        tans = self.request_tans(context)
+        try: update = split.result()
         except:
             self.invalidate_target()
-            return False
-        new_points, _ = utils.recv_points(spline.comm.s)
-        to_push = [p.get() for p in self.points_bar[-3:]]
-        #Add new points
-        for p in to_push: utils.add_point(self.points_bar, p) 
-        #Move points
-        if old_len - anchor > 7:
-            from_idx = len(self.points_bar) - 4
-            to_idx = anchor + 6
-            for i in range(from_idx, anchor + 6, -1): 
-                utils.update_point(self.points_bar[i], self.points_bar[i-3].get())
-        
-        #Copy new points
-        for i in range( len(new_points) ):
-            p_bar = [new_points[i][0], [new_points[i][1], new_points[i][2]]]
-            utils.update_point(self.points_bar[anchor + i], p_bar)
-            
-        context.scene.curr_idx = anchor + 3
-        return True
+            return None
+        self.apply_update(update)
+        return tans
     
-    def draw_curve(self):
-        poly = self.curve.data.splines.new('POLY')
-        for i in range(0, len(self.points_bar) - 1, 3):
-            segment = []
-            for j in range(4): segment.append(self.points_bar[i+j].get())
-            try: curve_seg = utils.get_curve(spline.comm.s, self.target, segment)
-            except:
-                self.invalidate_target()
-                return False
-
-            old_len = len( poly.points )
-            poly.points.add( len(curve_seg)-1 ) 
-            #If first segment add first point
-            if i == 0: 
-                x,y,z = curve_seg[0]
-                poly.points[0].co = (x, y, z, 1) 
-            for i, coord in enumerate(curve_seg[1:]):
-                x,y,z = coord
-                poly.points[i + old_len].co = (x, y, z, 1)
-        self.curve.data.splines.remove( self.curve.data.splines[0] )
-        return True
+    #Create (or reset after undo) the engine session of the curve and draw all its segments
+    #Segments cached with the curve are not computed again, the engine only gets the control points
+    #Output: pending tangents of the current anchor, None if failed
+    def open_session(self, context):
+        if self.session < 0: self.session = utils.new_session_id()
+        points_bar = [p.get() for p in self.points_bar]
+        cache = utils.load_cache(self.curve_item, utils.cache_tag(spline.comm.signature))
+        if cache is None:
+            create = utils.session_create(spline.comm.conn, self.target, self.session, points_bar, self.curve_item.is_closed)
+        else:
+            create = utils.session_restore(spline.comm.conn, self.target, self.session, points_bar, self.curve_item.is_closed)
+        tans = self.request_tans(context)
+        try: update = create.result()
+        except:
+            self.invalidate_target()
+            return None
+        if cache is None:
+            self.segments, self.tables, self.polylines = [], [], []
+        else:
+            self.segments, self.tables, self.polylines = utils.cached_segments(utils.bary_converter(self.target), cache)
+        self.samples_tree = None
+        self.apply_update(update)
+        return tans
     
-    def draw_tan(self, context):
-        self.tan.data.splines.clear()
-        
-        tan_1 = []
-        tan_2 = []
-        
+    #Send tangents request of the anchor closest to the current point, without waiting
+    def request_tans(self, context):
         idx = context.scene.curr_idx #Closest anchor point
         if idx % 3 == 1: idx -= 1
         if idx % 3 == 2: idx += 1
+        return utils.session_tangents(spline.comm.conn, self.target, self.session, idx)
+    
+    #Apply engine changes to the control points and segments, then redraw
+    def apply_update(self, update):
+        utils.apply_update(update, self.points_bar, self.segments, self.tables, self.polylines)
+        if len(update[1]) > 0: self.samples_tree = None
+        self.write_curve()
+    
+    #Rebuild the curve spline from the segment polylines
+    def write_curve(self):
+        curve = []
+        for i, curve_seg in enumerate(self.segments):
+            curve += curve_seg if i == 0 else curve_seg[1:]
+        spline.write_polyline(self.curve.data, curve)
+    
+    #tans: tangent paths (or their pending request) if already available, requested to the engine otherwise
+    def draw_tan(self, context, tans = None):
+        self.tan.data.splines.clear()
         
-        poly = None
-        if idx > 0 or self.curve_item.is_closed:
-            p1 = idx-1
-            p2 = idx
-            if idx == 0: p1 = len(self.points_bar) -2
-            try: tan_1 = utils.get_straight_path(spline.comm.s, self.target, self.points_bar[p1].get(), self.points_bar[p2].get())
+        if tans is None: tans = self.request_tans(context)
+        if isinstance(tans, utils.Pending):
+            try: tans = tans.result()
             except:
                 self.invalidate_target()
-                return False 
-            utils.convert_coords(self.target, tan_1)
+                return False
+        tan_1, tan_2 = tans
+        
+        poly = None
+        if len(tan_1) > 0:
             poly = self.tan.data.splines.new('POLY')
             poly.points.add(len(tan_1)-1)
             for i, coord in enumerate(tan_1):
@@ -538,15 +536,7 @@ class EditCurveOperator(bpy.types.Operator):
                 poly.points[i].hide = True
             poly.points[0].hide = False
             poly.points[-1].hide = False
-        if idx < len(self.points_bar) - 2 or self.curve_item.is_closed:
-            p1 = idx
-            p2 = idx+1
-            if idx == len(self.points_bar) -1: p2 = 1
-            try: tan_2 = utils.get_straight_path(spline.comm.s, self.target, self.points_bar[p1].get(), self.points_bar[p2].get())
-            except:
-                self.invalidate_target()
-                return False
-            utils.convert_coords(self.target, tan_2)
+        if len(tan_2) > 0:
             old_len = 0
             from_idx = 1
             if poly is None: 
@@ -577,10 +567,11 @@ class EditCurveOperator(bpy.types.Operator):
         
         return True
     
+    #Output: pending tangents of the current anchor, None if failed
     def delete_segment(self, context):
         if len(self.points_bar) == 4: 
             self.report({'WARNING'}, "Only one segment present") 
-            return
+            return self.request_tans(context)
         idx = context.scene.curr_idx #Closest anchor point
         if idx % 3 == 1: idx -= 1
         if idx % 3 == 2: idx += 1
@@ -590,37 +581,24 @@ class EditCurveOperator(bpy.types.Operator):
             idx -= 1
             context.scene.curr_idx -= 3
         
-        self.points_bar.remove(idx + 1)
-        self.points_bar.remove(idx)
-        self.points_bar.remove(idx -1)
-        
-        if context.scene.curr_idx > len(self.points_bar) - 1:
-            context.scene.curr_idx = len(self.points_bar) - 1
-        
-    def add_curve(self, context, new_points_bar):
-        utils.add_point(self.points_bar, new_points_bar[1])
-        utils.add_point(self.points_bar, new_points_bar[2])
-        utils.add_point(self.points_bar, new_points_bar[3])
-        #Calculate additional curve and draw
-        try: curve = utils.get_curve(spline.comm.s, self.target, new_points_bar)
+        #Three control points are removed
+        if context.scene.curr_idx > len(self.points_bar) - 4:
+            context.scene.curr_idx = len(self.points_bar) - 4
+        delete = utils.session_delete(spline.comm.conn, self.target, self.session, idx)
+        tans = self.request_tans(context)
+        try: update = delete.result()
         except:
             self.invalidate_target()
-            return False
-        poly_line = self.curve.data.splines[0]
-        old_len_curve = len( poly_line.points )
-        poly_line.points.add( len(curve)-1 )
-        for i, coord in enumerate(curve[1:]):
-            x,y,z = coord
-            poly_line.points[i + old_len_curve].co = (x, y, z, 1)
-        context.scene.curr_idx = len(self.points_bar) - 1
-        return True
+            return None
+        self.apply_update(update)
+        return tans
     
     def invalidate_target(self):
         global is_running
         is_running = False
         
+        spline.drop_server(self.target[utils.key_name])
         del self.target[utils.key_name]
-        utils.reset_spline_server(spline.comm)
         bpy.data.objects.remove(self.tan, do_unlink=True)
         self.report({'WARNING'}, "Geometry modified, curves on the objects invalidated")        
     
@@ -0,0 +1,211 @@
+import os
+import json
+import shutil
+import select
+import socket
+import time
+import threading
+
+HOST = "127.0.0.1"  # The server's hostname or IP address
+PORT = 27015  # The port used by the server
+
+#Request stopped by the engine: cancelled, or not completed before its deadline
+class Interrupted(Exception):
+    pass
+
+#Request the engine could not compute: malformed, or on a session it does not have
+class RequestFailed(Exception):
+    pass
+
+#Connection to the C++ engine
+#Requests are framed as "<id> <bytes>\n<payload>" ("<id> <bytes> <ms>\n<payload>" with a deadline) and responses
+#echo the request id, so several requests can be in flight on the same socket and responses are matched by id
+#Large responses are streamed in chunks "<id> <bytes> +\n<data>", the last chunk is "<id> <bytes> <us>\n<data>"
+#with the engine time spent on the request in microseconds, or "<id> <bytes> <us> !\n<data>" when it replaces
+#the chunks already received (request interrupted after part of its response was streamed)
+class EngineConnection:
+    def __init__(self, sock):
+        self.s = sock
+        self.next_id = 0
+        self.buffer = bytearray() #Received data not parsed yet
+        self.pos = 0 #Start of the data not parsed yet in buffer
+        self.partial = {} #Chunks of responses still being received, by id
+        self.responses = {} #Received responses not claimed yet, by id
+        self.discarded = set() #Ids of requests whose response is not needed
+        self.sent_at = {} #Send time of requests in flight, by id
+        self.last_timing = (0.0, 0.0) #Round trip and engine time in seconds of the last response returned by wait
+        self.recorder = None #Recorder logging requests and responses, if recording
+
+    #Send request without waiting for the response
+    #request: text, or bytes for binary payloads (geometry updates)
+    #deadline: seconds after which the engine interrupts the request, None for no limit
+    #Output: request id, to be passed to wait
+    def send(self, request, deadline = None):
+        rid = self.send_frame(request, deadline)
+        self.sent_at[rid] = time.perf_counter()
+        if self.recorder: self.recorder.request(rid, request)
+        return rid
+
+    def send_frame(self, request, deadline = None):
+        rid = self.next_id
+        self.next_id += 1
+        data = request if isinstance(request, bytes) else request.encode()
+        header = str(rid) + " " + str(len(data))
+        if deadline is not None: header += " " + str(max(int(deadline * 1000), 1))
+        self.s.sendall(header.encode() + b"\n")
+        self.s.sendall(data)
+        return rid
+
+    #Stop the computation of request rid and drop its response
+    #The cancel message has no response, the engine answers "interrupted" to the cancelled request
+    def cancel(self, rid):
+        self.send_frame("x\n" + str(rid) + "\n")
+        self.discard(rid)
+
+    #Response of request rid will be dropped when received
+    def discard(self, rid):
+        self.sent_at.pop(rid, None)
+        if rid in self.responses: del self.responses[rid]
+        else: self.discarded.add(rid)
+
+    #Block until the response of request rid is received, responses of other requests are kept
+    #Output: response lines, Interrupted is raised if the engine stopped the request, RequestFailed if it failed
+    def wait(self, rid):
+        while rid not in self.responses: self.receive()
+        payload, engine_time, received_at = self.responses.pop(rid)
+        self.last_timing = (received_at - self.sent_at.pop(rid, received_at), engine_time)
+        if payload == b"interrupted\n": raise Interrupted("Request " + str(rid) + " interrupted by the engine")
+        if payload.startswith(b"error "): raise RequestFailed("Request " + str(rid) + ": " + payload.decode().strip())
+        return payload.decode().splitlines()
+
+    #Receive the responses already available without blocking
+    #Output: True if the response of request rid is received, wait returns it immediately
+    def poll(self, rid):
+        while rid not in self.responses and (self.pos < len(self.buffer) or select.select([self.s], [], [], 0)[0]):
+            self.receive()
+        return rid in self.responses
+
+    def receive(self):
+        rid, payload, engine_time = self.recv_frame()
+        if self.recorder: self.recorder.response(rid, payload, engine_time)
+        if rid in self.discarded: self.discarded.remove(rid)
+        else: self.responses[rid] = (payload, engine_time, time.perf_counter())
+
+    def request(self, request):
+        return self.wait(self.send(request))
+
+    #Read chunks until a response is complete
+    #Output: request id, payload and engine time in seconds
+    def recv_frame(self):
+        while True:
+            end = self.buffer.find(b"\n", self.pos)
+            while end < 0:
+                self.recv_more()
+                end = self.buffer.find(b"\n", self.pos)
+            header = self.buffer[self.pos:end].split()
+            rid, n = int(header[0]), int(header[1])
+            self.pos = end + 1
+            while len(self.buffer) - self.pos < n: self.recv_more()
+            chunks = self.partial.setdefault(rid, [])
+            chunks.append(bytes(self.buffer[self.pos:self.pos+n]))
+            self.pos += n
+            if len(header) < 3 or header[2] != b"+":
+                del self.partial[rid]
+                if len(header) > 3 and header[3] == b"!": chunks = chunks[-1:]
+                engine_time = int(header[2]) / 1e6 if len(header) > 2 else 0.0
+                return rid, b"".join(chunks), engine_time
+
+    def recv_more(self):
+        #Drop parsed data before growing the buffer
+        if self.pos > 0:
+            del self.buffer[:self.pos]
+            self.pos = 0
+        chunk = self.s.recv(1 << 16)
+        if not chunk: raise ConnectionError("Engine connection closed")
+        self.buffer += chunk
+
+    def close(self):
+        self.s.shutdown(socket.SHUT_RDWR)
+        self.s.close()
+
+#Log of engine requests and responses with timestamps, one JSON object per line:
+#{"event": "mesh", "t": seconds, "file": mesh copy}, a new engine was started on this mesh, ids restart from 0
+#{"event": "request", "t": seconds, "id": id, "data": request}, with "binary": true for binary requests
+#{"event": "response", "t": seconds, "id": id, "engine_us": engine time, "data": response}
+class Recorder:
+    def __init__(self, path):
+        self.path = path
+        self.f = open(path, 'w', buffering=1)
+        self.start = time.perf_counter()
+        self.meshes = 0
+
+    def write(self, event, **data):
+        data["event"] = event
+        data["t"] = time.perf_counter() - self.start
+        self.f.write(json.dumps(data) + "\n")
+
+    #Copy of the engine mesh next to the trace, the engine input file is overwritten for each object
+    def mesh(self, mesh_path):
+        name = os.path.splitext(os.path.basename(self.path))[0] + "_mesh" + str(self.meshes) + ".obj"
+        shutil.copyfile(mesh_path, os.path.join(os.path.dirname(self.path), name))
+        self.meshes += 1
+        self.write("mesh", file=name)
+
+    #Binary requests are logged as latin-1 text, one character for each byte
+    def request(self, rid, request):
+        if isinstance(request, bytes): self.write("request", id=rid, data=request.decode("latin-1"), binary=True)
+        else: self.write("request", id=rid, data=request)
+
+    def response(self, rid, payload, engine_time):
+        self.write("response", id=rid, engine_us=int(engine_time * 1e6), data=payload.decode())
+
+    def close(self):
+        self.f.close()
+
+#Operation names of the requests, used for profiling and replay reports
+opcode_names = {'h': "handshake", 'g': "geometry", 'n': "tan_extension", 'l': "straight_path", 
+    'o': "params", 'f': "profile_algorithms", 'm': "mesh_stats", 'b': "curve_samples", 'v': "svg", 'x': "cancel", 'a': "close", 'k': "shutdown"}
+session_names = {'c': "create", 'r': "restore", 'm': "move", 'i': "extend", 's': "split", 'x': "delete", 
+    'o': "close", 't': "tangents", 'q': "end"}
+
+def request_name(request):
+    if isinstance(request, bytes): request = request[:3].decode("latin-1")
+    if request[0] == 'e': return "session_" + session_names.get(request[2], request[2])
+    return opcode_names.get(request[0], "curve")
+
+PROTOCOL_VERSION = 5 #Must match protocol_version in splinegui.cpp
+
+#Names of spline_algorithm and path_solver in spline.h, karcher and flipout are not built in the engine
+ALGORITHMS = ["de_casteljau_uniform", "de_casteljau_adaptive", "de_casteljau_classic", "subdivision_uniform", "subdivision_adaptive"]
+SOLVERS = ["dual", "primal"]
+
+#Params request: algorithm and solver replace the d (de Casteljau) or s (subdivision) of the first line
+def params_request(algorithm, subdivisions, solver = "dual"):
+    send = "od\n" if algorithm.startswith("de_casteljau") else "os\n"
+    return send + str(subdivisions) + "\n" + algorithm + "\n" + solver + "\n"
+
+#Block until the engine process prints its handshake line "READY <port>", then keep draining its output
+#in background so that the engine never blocks on a full stdout pipe
+#Output: port of the engine
+def wait_ready(process):
+    for line in process.stdout:
+        if line.startswith("READY"):
+            threading.Thread(target=lambda: process.stdout.read(), daemon=True).start()
+            return int(line.split()[1])
+    raise ConnectionError("Engine exited before being ready")
+
+#Check the protocol version of the engine
+#Output: number of triangles and vertices of the loaded mesh
+def handshake(conn):
+    lines = conn.request("h\n")
+    name, version = lines[0].split()
+    if name != "bezier" or int(version) != PROTOCOL_VERSION:
+        raise ConnectionError("Unsupported engine: " + lines[0])
+    triangles, vertices = lines[1].split()
+    return int(triangles), int(vertices)
+
+#Create TCP socket for geodesic spline calculations
+def connect(host = HOST, port = PORT):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.connect((host, port))
+    return EngineConnection(sock)
@@ -0,0 +1,62 @@
+#Latency instrumentation: wall time of each phase of the operations, kept in rolling histograms
+#Phases are named "<operation>/<phase>", e.g. "session_move/engine" or "drag/ray_cast"
+import json
+import time
+from collections import deque
+
+HISTORY = 1000 #Samples kept for each phase
+
+enabled = True
+
+class Histogram:
+    def __init__(self, size = HISTORY):
+        self.samples = deque(maxlen=size) #Seconds, oldest dropped first
+        self.count = 0 #Total samples, also the dropped ones
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+
+    #Percentiles in milliseconds of the samples kept
+    def summary(self):
+        values = sorted(self.samples)
+        def percentile(p):
+            return values[min(int(p * len(values)), len(values) - 1)] * 1000
+        return {
+            "count": self.count,
+            "mean_ms": sum(values) / len(values) * 1000,
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "max_ms": values[-1] * 1000
+        }
+
+histograms = {}
+
+def record(name, seconds):
+    if not enabled: return
+    if name not in histograms: histograms[name] = Histogram()
+    histograms[name].add(seconds)
+
+#Time a block: with profiling.timed("drag/ray_cast"): ...
+class timed:
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.start)
+        return False
+
+def summary():
+    return {name: h.summary() for name, h in sorted(histograms.items()) if len(h.samples) > 0}
+
+def reset():
+    histograms.clear()
+
+def dump(path):
+    with open(path, 'w') as f:
+        json.dump(summary(), f, indent=1)
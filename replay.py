@@ -0,0 +1,124 @@
+#Replay of a trace recorded from the Geodesic panel ("Record requests") against engine builds, without Blender
+#python replay.py trace.jsonl --engine old\splinegui.exe --engine new\splinegui.exe -o report.json
+#python replay.py trace.jsonl --connect 127.0.0.1:27015     (already running engine or stand-in server, single mesh traces)
+#Requests are re-issued one at a time in the recorded order, latencies are compared with the recorded ones
+import os
+import json
+import argparse
+import statistics
+
+import engine
+import batch
+
+#Output: list of (mesh file, [(request, recorded response, recorded round trip, recorded engine time)])
+def load_trace(path):
+    runs = []
+    requests = {}
+    with open(path) as f:
+        for line in f:
+            e = json.loads(line)
+            if e["event"] == "mesh":
+                runs.append( (os.path.join(os.path.dirname(path), e["file"]), []) )
+                requests = {}
+            elif e["event"] == "request":
+                request = e["data"].encode("latin-1") if e.get("binary") else e["data"]
+                item = {"request": request, "sent": e["t"], "response": None, "roundtrip": None, "engine": None}
+                requests[e["id"]] = item
+                runs[-1][1].append(item)
+            elif e["event"] == "response" and e["id"] in requests:
+                item = requests.pop(e["id"])
+                item["response"] = e["data"]
+                item["roundtrip"] = e["t"] - item["sent"]
+                item["engine"] = e["engine_us"] / 1e6
+    return runs
+
+#Replay requests on conn
+#Output: [(round trip, engine time, same response as recorded)] for each request, None for requests without response
+def replay_run(conn, items):
+    results = []
+    for item in items:
+        #Deadlines and cancellations are not replayed
+        if item["response"] in (None, "interrupted\n") or engine.request_name(item["request"]) in ("close", "shutdown", "cancel"):
+            results.append(None)
+            continue
+        rid = conn.send(item["request"])
+        lines = conn.wait(rid)
+        roundtrip, engine_time = conn.last_timing
+        results.append( (roundtrip, engine_time, lines == item["response"].splitlines()) )
+    return results
+
+#Results of each request of the trace on one target
+def replay(runs, args, command = None):
+    results = []
+    for mesh, items in runs:
+        if command is None:
+            host, port = args.connect.split(":")
+            conn = engine.connect(host, int(port))
+            try: results += replay_run(conn, items)
+            finally: conn.close()
+        else:
+            pool = batch.EnginePool(mesh, 1, args.port, command)
+            try: results += replay_run(pool.conns[0], items)
+            finally: pool.close()
+    return results
+
+def median_ms(values):
+    return statistics.median(values) * 1000 if values else None
+
+#Per operation medians of recorded and replayed latencies
+def report(items, targets):
+    ops = {}
+    for i, item in enumerate(items):
+        if any(res[i] is None for res in targets.values()): continue
+        op = ops.setdefault(engine.request_name(item["request"]), {"n": 0, "recorded": ([], []), "targets": {}})
+        op["n"] += 1
+        op["recorded"][0].append(item["roundtrip"])
+        op["recorded"][1].append(item["engine"])
+        for name, res in targets.items():
+            t = op["targets"].setdefault(name, ([], [], 0))
+            roundtrip, engine_time, same = res[i]
+            t[0].append(roundtrip)
+            t[1].append(engine_time)
+            op["targets"][name] = (t[0], t[1], t[2] + (not same))
+    out = {}
+    for name, op in sorted(ops.items()):
+        out[name] = {
+            "n": op["n"],
+            "recorded": {"roundtrip_ms": median_ms(op["recorded"][0]), "engine_ms": median_ms(op["recorded"][1])},
+            "targets": {t: {"roundtrip_ms": median_ms(r), "engine_ms": median_ms(e), "mismatches": m}
+                for t, (r, e, m) in op["targets"].items()}
+        }
+    return out
+
+def print_report(out):
+    for name, op in out.items():
+        rec = op["recorded"]["engine_ms"]
+        line = "{:<22} n={:<6} recorded {:8.2f} ms".format(name, op["n"], rec)
+        for t, res in op["targets"].items():
+            diff = (res["engine_ms"] - rec) / rec * 100 if rec else 0.0
+            line += " | {} {:8.2f} ms ({:+.0f}%, {} mismatches)".format(os.path.basename(t), res["engine_ms"], diff, res["mismatches"])
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded engine requests and compare latencies")
+    parser.add_argument("trace")
+    parser.add_argument("--engine", action="append", default=[], help="Engine executable, can be repeated to compare builds")
+    parser.add_argument("--connect", help="host:port of a running engine instead of starting one")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("-o", "--output", help="JSON report")
+    args = parser.parse_args()
+
+    runs = load_trace(args.trace)
+    items = [item for mesh, run in runs for item in run]
+    targets = {}
+    if args.connect: targets[args.connect] = replay(runs, args)
+    for command in args.engine or ([] if args.connect else [batch.ENGINE]):
+        targets[command] = replay(runs, args, command)
+    out = report(items, targets)
+    print_report(out)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(out, f, indent=1)
+
+if __name__ == "__main__":
+    main()
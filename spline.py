@@ -3,43 +3,331 @@ import os
 import bpy
 import bmesh
 import numpy as np
+import itertools
+import threading
+from collections import deque
 from bpy_extras import view3d_utils
+from bpy_extras.io_utils import ImportHelper, ExportHelper
 from mathutils import Vector
-from mathutils.interpolate import poly_3d_calc
 
 dir = os.path.dirname(bpy.context.space_data.text.filepath) #Get directory of the .py file
 sys.path.append(dir) #Setting it as the python directory in the Blender Text editor 
 
 import utils
+import engine
+import batch
+import profiling
+import edit
 
 class GeodesicCurveInfo:
     def __init__(self):        
         self.points_bar  = [] #Control points in barycentric coordinates
         self.points_idx  = [] #Indices of control points in the mesh (subgroup of polygon_idx)
         
-comm = utils.ServerCommunication()
+pool = utils.ServerPool() #Engines of the objects
+comm = utils.ServerCommunication() #Engine of the working object, one of the pool
+export_lock = threading.Lock() #Mesh files written by the engine start threads and by the parallel jobs
 
+#Start or stop logging engine requests for replay.py
+def toggle_recording(scene, context):
+    if scene.record_requests:
+        comm.recorder = engine.Recorder(bpy.path.abspath(scene.record_path))
+        #Engine already connected, its mesh will not be saved again
+        if comm.conn is not None:
+            comm.recorder.mesh(comm.mesh)
+            comm.conn.recorder = comm.recorder
+    elif comm.recorder is not None:
+        comm.recorder.close()
+        comm.recorder = None
+        if comm.conn is not None: comm.conn.recorder = None
+
+bpy.types.Scene.record_path = bpy.props.StringProperty(name="Trace", subtype='FILE_PATH', default="//geodesic_trace.jsonl")
+bpy.types.Scene.record_requests = bpy.props.BoolProperty(name="Record requests", default=False, update=toggle_recording)
+bpy.types.Scene.rebuild_workers = bpy.props.IntProperty(name="Engines", min=1, max=64, default=1,
+    description="Engine processes computing the curves of each object when rebuilding all the curves")
+bpy.types.Scene.engine_pool_size = bpy.props.IntProperty(name="Engine pool", min=1, max=64, default=2,
+    description="Engine processes kept running, one per object; beyond this number the least recently used one is closed")
+bpy.types.Scene.auto_rebuild = bpy.props.BoolProperty(name="Auto rebuild", default=False,
+    description="Rebuild all the curves on file load and when the curve parameters change")
+
+REBUILD_BATCH = 512 #Segment requests in flight while rebuilding the curves of an object
 
 #----------MOVE CONTROL POINT OPERATOR COMMUNICATION FUNCTIONS------------
 
-#Control if requested object is the current working mesh, otherwise close it and create new process
-def set_server(obj):
-    if obj[utils.key_name] != comm.obj_key:
-        #Close communication if other communication was active
-        if comm.obj_key is not None:
-            utils.close_spline_server(comm)
-        utils.save_file(obj.data, dir + "\\bezier\\data\\tmp.obj")
-        utils.run_spline_server(dir, comm)
-        comm.obj_key = obj[utils.key_name]
+#Engine of obj from the pool, started in background if not running
+#Only the mesh buffers are copied here, the export and the start run in the start thread (see export_mesh)
+def pooled_server(obj):
+    key = obj[utils.key_name]
+    server = pool.get(key)
+    if server is None:
+        server = utils.ServerCommunication()
+        server.obj_key = key
+        utils.start_spline_server(dir, server, export_mesh(obj))
+        pool.add(key, server, bpy.context.scene.engine_pool_size)
+    return server
+
+#Make the engine of obj the working one, starting it in background if needed
+#Called in advance (first click, object activation) so that the engine is usually ready when the curve is requested
+def warm_server(obj):
+    global comm
+    server = pooled_server(obj)
+    if server is comm: return
+    #The trace recording follows the working engine
+    recorder = comm.recorder
+    if recorder is not None:
+        comm.recorder = None
+        if comm.conn is not None: comm.conn.recorder = None
+        server.recorder = recorder
+        if server.conn is not None:
+            recorder.mesh(server.mesh)
+            server.conn.recorder = recorder
+    comm = server
+
+#Kill the engine of the object with key, its curves have been invalidated
+def drop_server(key):
+    pool.remove(key)
+
+#Mesh file of obj for the engine, written again only if the mesh changed since its last export
+#The mesh buffers are copied now, the returned function hashes and writes them without bpy access,
+#so that it can run in background
+#Output: export function returning the file path and the mesh signature
+def export_mesh(obj):
+    return export_buffers(obj[utils.key_name], *utils.mesh_buffers(obj.data))
+
+#Export function of the buffers of utils.mesh_buffers for the object with key, see export_mesh
+#signature: of the buffers if already known
+def export_buffers(key, co, triangles, signature = None):
+    mesh = dir + "\\bezier\\data\\tmp_" + key + ".obj"
+    def export():
+        nonlocal signature
+        if signature is None: signature = utils.buffers_signature(co, triangles)
+        with export_lock:
+            if pool.exported.get(key) != signature:
+                utils.save_buffers(mesh, co, triangles)
+                pool.exported[key] = signature
+        return mesh, signature
+    return export
+
+#Engine of obj ready to use as the working one, waiting for the start if needed
+#refresh: redraw the curves of obj if it has been deformed
+#Output: False if the topology changed since the curves were drawn or since the engine was loaded,
+#the curves of obj are no more valid
+def set_server(obj, refresh = True):
+    warm_server(obj)
+    return prepare_server(comm, obj, refresh)
+
+#Engine server of obj ready to use, see set_server
+def prepare_server(server, obj, refresh = True):
+    co, triangles = utils.mesh_buffers(obj.data)
+    signature = utils.buffers_signature(co, triangles)
+    #Compared with the topology stored with the curves, the engine may have been started on the modified mesh
+    if utils.check_topology(obj, signature) is False: return False
+    #The signature of the engine mesh is known once exported, in background
+    utils.wait_spline_server(server)
+    if not utils.same_topology(signature, server.signature): return False
+    #Curves drawn now, or unknown topology (files saved before it was stored) taken as the one being edited
+    utils.store_topology(obj[utils.key_name], signature)
+    if server.mesh_size != (server.signature[1], server.signature[0]):
+        raise ConnectionError("Engine mesh differs from the exported one")
     #Set params
-    if bpy.context.scene.decastel_jau: send = "od\n"
-    else: send = "os\n"
-    send += str( bpy.context.scene.subdivisions ) + "\n"
-    comm.s.sendall(send.encode())
+    scene = bpy.context.scene
+    send = engine.params_request(scene.spline_algorithm, scene.subdivisions, scene.path_solver)
+    server.conn.discard(server.conn.send(send))
+    #Vertices moved since exported (edit mode, sculpt): update the engine positions and the curves in place
+    if signature != server.signature:
+        utils.update_geometry(server.conn, co).result()
+        server.signature = signature
+        #The mesh file follows in background: an engine started again after being closed by the pool
+        #loads the current positions, without writing the file or sending them once more
+        threading.Thread(target=export_buffers(server.obj_key, co, triangles, signature), daemon=True).start()
+        if refresh: refresh_curves([(obj, server)])
+    return True
 
 #----------SPLINE DRAWING FUNCTION-----------------------
 
-def draw_curve(obj, curve):
+#Points closer than Scene.simplify_tolerance to the rest of the polyline are not written
+def write_polyline(curve_data, curve):
+    curve = utils.simplify_polyline(curve, bpy.context.scene.simplify_tolerance)
+    curve_data.splines.clear()
+    curve_line = curve_data.splines.new('POLY')
+    curve_line.points.add(len(curve)-1)
+    co = np.ones((len(curve), 4))
+    co[:, :3] = curve
+    curve_line.points.foreach_set("co", co.ravel())
+
+#Curve objects by key, built once instead of a scene search for each curve
+def curve_objects():
+    return {obj[utils.key_name]: obj for obj in bpy.context.scene.objects if utils.key_name in obj}
+
+#Recompute all the curves drawn on the objects of targets [(obj, engine server)], segments of the following
+#curves are requested while the first ones are written, up to REBUILD_BATCH requests in flight for each engine
+#Curves are requested in turn from each object, so that all the engines compute while the results are written
+#Curves cached with the current params and mesh are written from the cache (see utils.store_cache)
+#progress: called after each curve is written
+#Output: number of curves
+def refresh_curves(targets, progress = None):
+    objects = curve_objects()
+    pending = deque()
+    in_flight = 0
+    count = [0]
+    def write_first():
+        curve_item, obj_curve, tag, segments = pending.popleft()
+        curve = []
+        polylines = []
+        tables = []
+        for j, segment in enumerate(segments):
+            poly, bary, table = segment.result()
+            curve += poly if j == 0 else poly[1:]
+            polylines.append(bary)
+            tables.append(table)
+        if obj_curve is not None: write_polyline(obj_curve.data, curve)
+        utils.store_cache(curve_item, tag, polylines, tables)
+        if progress: progress()
+        return len(segments)
+    def curves(obj, server):
+        key = obj[utils.key_name]
+        tag = utils.cache_tag(server.signature)
+        convert = None
+        for i, curve_item in enumerate(utils.obj_curves_get(key).value):
+            count[0] += 1
+            obj_curve = objects.get('c' + str(i) + key)
+            cache = utils.load_cache(curve_item, tag)
+            if cache is None:
+                yield obj, server.conn, curve_item, obj_curve, tag
+                continue
+            if convert is None: convert = utils.bary_converter(obj)
+            if obj_curve is not None: write_polyline(obj_curve.data, utils.cached_polyline(convert, cache))
+            if progress: progress()
+    for curve in itertools.chain.from_iterable(itertools.zip_longest(*[curves(obj, server) for obj, server in targets])):
+        if curve is None: continue
+        obj, conn, curve_item, obj_curve, tag = curve
+        points_bar = [p.get() for p in curve_item.points_bar]
+        segments = [utils.get_curve_samples(conn, obj, points_bar[first:first+4]) for first in range(0, len(points_bar) - 3, 3)]
+        pending.append( (curve_item, obj_curve, tag, segments) )
+        in_flight += len(segments)
+        while in_flight > REBUILD_BATCH * len(targets): in_flight -= write_first()
+    while pending: write_first()
+    return count[0]
+
+#Write the curves of obj from their cache, if all of them have been computed with the current params on the current mesh
+#Output: False if some curve needs the engine
+def write_cached_curves(obj, progress = None):
+    key = obj[utils.key_name]
+    tag = utils.cache_tag(utils.mesh_signature(obj.data))
+    caches = [utils.load_cache(curve_item, tag) for curve_item in utils.obj_curves_get(key).value]
+    if any(cache is None for cache in caches): return False
+    objects = curve_objects()
+    convert = utils.bary_converter(obj)
+    for i, cache in enumerate(caches):
+        obj_curve = objects.get('c' + str(i) + key)
+        if obj_curve is not None: write_polyline(obj_curve.data, utils.cached_polyline(convert, cache))
+        if progress: progress()
+    return True
+
+#Engine processes on the exported mesh of obj with the current params (see batch.py)
+#Output: pool, signature of the exported mesh
+#key: of obj if it is not set yet (see next_key)
+def curves_pool(obj, workers, key = None):
+    mesh, signature = export_buffers(key or obj[utils.key_name], *utils.mesh_buffers(obj.data))()
+    pool = batch.EnginePool(mesh, workers)
+    try:
+        scene = bpy.context.scene
+        pool.set_params(scene.spline_algorithm, scene.subdivisions, scene.path_solver)
+    except:
+        pool.close()
+        raise
+    return pool, signature
+
+#Segment samples of curves [(face, u, v)] on obj, computed by several engine processes (see curves_pool)
+#Output: segments of each curve as batch.eval_curve_samples gives them, signature of the exported mesh
+def eval_curves_parallel(obj, curves, workers):
+    pool, signature = curves_pool(obj, min(workers, len(curves)))
+    try: return batch.eval_curves(pool, curves, batch.eval_curve_samples), signature
+    finally: pool.close()
+
+#Polyline in world coords of the segments of a curve computed by eval_curves_parallel, consecutive segments
+#share their end points
+def segments_polyline(convert, segments):
+    points = np.array([p for j, (poly, table) in enumerate(segments) for p in (poly if j == 0 else poly[1:])], dtype=np.float64)
+    return convert(points[:, 0].astype(np.int64), points[:, 1:])
+
+#Store the segments of a curve computed by eval_curves_parallel in the cache of curve_item, as refresh_curves does
+def store_segments(curve_item, tag, segments):
+    utils.store_cache(curve_item, tag, [poly for poly, table in segments], [table for poly, table in segments])
+
+#Curves cached with the current params and mesh are written from the cache, the others are computed in one job
+def refresh_curves_parallel(obj, workers, progress = None):
+    key = obj[utils.key_name]
+    items = utils.obj_curves_get(key).value
+    tag = utils.cache_tag(utils.mesh_signature(obj.data))
+    caches = [utils.load_cache(curve_item, tag) for curve_item in items]
+    missing = [i for i, cache in enumerate(caches) if cache is None]
+    curves = [[(p.f, p.u, p.v) for p in items[i].points_bar] for i in missing]
+    if missing:
+        results, signature = eval_curves_parallel(obj, curves, workers)
+        tag = utils.cache_tag(signature)
+        for i, segments in zip(missing, results): store_segments(items[i], tag, segments)
+    convert = utils.bary_converter(obj)
+    objects = curve_objects()
+    for i, curve_item in enumerate(items):
+        obj_curve = objects.get('c' + str(i) + key)
+        if obj_curve is not None: write_polyline(obj_curve.data, utils.cached_polyline(convert, utils.load_cache(curve_item, tag)))
+        if progress: progress()
+    return len(items)
+
+#Recompute the polylines of every stored curve with the current parameters, grouped by target object
+#so that each mesh is loaded once
+#workers: engine processes for each object (see batch.py), with 1 the objects are computed in groups
+#of Scene.engine_pool_size on the engines of the pool, concurrently
+#Objects whose curves have an unknown topology (see utils.check_topology) are not rebuilt, editing one of
+#their curves validates them
+#Output: number of curves rebuilt, keys of the objects whose curves have been invalidated, keys of the skipped objects
+def rebuild_curves(workers = 1):
+    targets = []
+    for item in bpy.context.scene.obj_curves:
+        obj = utils.getObjByKey(item.key)
+        if obj is not None and len(item.value) > 0: targets.append(obj)
+    total = sum(len(utils.obj_curves_get(obj[utils.key_name]).value) for obj in targets)
+    wm = bpy.context.window_manager
+    wm.progress_begin(0, max(total, 1))
+    done = [0]
+    def progress():
+        done[0] += 1
+        wm.progress_update(done[0])
+    invalid = []
+    unknown = []
+    #Topology changed since the curves were drawn
+    def invalidate(obj):
+        key = obj[utils.key_name]
+        del obj[utils.key_name]
+        drop_server(key)
+        invalid.append(key)
+    try:
+        valid = []
+        for obj in targets:
+            checked = utils.check_topology(obj, utils.mesh_signature(obj.data))
+            if checked is None: unknown.append(obj[utils.key_name])
+            elif checked: valid.append(obj)
+            else: invalidate(obj)
+        #No engine for the objects whose curves are all cached
+        targets = [obj for obj in valid if not write_cached_curves(obj, progress)]
+        if workers > 1:
+            for obj in targets: refresh_curves_parallel(obj, workers, progress)
+        else:
+            size = bpy.context.scene.engine_pool_size
+            for first in range(0, len(targets), size):
+                #The engines of the group load their meshes in parallel
+                group = [(obj, pooled_server(obj)) for obj in targets[first:first+size]]
+                valid = []
+                for obj, server in group:
+                    if prepare_server(server, obj, refresh = False): valid.append((obj, server))
+                    else: invalidate(obj)
+                refresh_curves(valid, progress)
+    finally: wm.progress_end()
+    return done[0], invalid, unknown
+
+#material: shared by the curves created in bulk, a new one for each curve otherwise
+def draw_curve(obj, curve, material = None):
     #Create curve polygon
     curve_name = 'c'+str( len(utils.obj_curves_get(obj[utils.key_name]).value )) + obj[utils.key_name]
     
@@ -50,17 +338,110 @@ def draw_curve(obj, curve):
     obj_curve[utils.key_name] = curve_name
     bpy.context.view_layer.active_layer_collection.collection.objects.link(obj_curve)
 
-    curve_line = curve_data.splines.new('POLY')
-    curve_line.points.add(len(curve)-1)
-    for i, coord in enumerate(curve):
-        x,y,z = coord
-        curve_line.points[i].co = (x, y, z, 1)
+    write_polyline(curve_data, curve)
     
-    material = bpy.data.materials.new(curve_name+"polygon_material")
-    material.diffuse_color = (0.2,0.2,1,1)
+    if material is None:
+        material = bpy.data.materials.new(curve_name+"polygon_material")
+        material.diffuse_color = (0.2,0.2,1,1)
     curve_data.materials.append(material)
     curve_data.bevel_depth = 0.01
   
+#Key of a new target object
+#Key that add_key gives to the next object
+def next_key():
+    return "o" + str(bpy.context.scene.total)
+
+def add_key(obj):
+    obj[utils.key_name] = next_key()
+    bpy.types.Scene.total += 1
+    utils.push_key(obj[utils.key_name])
+
+#----------IMPORT--------------------------------------------------------
+
+#Add the curves [[face, [u, v]]] to obj: all the segments are computed in one parallel job on pool (see curves_pool),
+#the curve objects share one material
+def add_curves(obj, pool, signature, curves):
+    results = batch.eval_curves(pool, [[(f, uv[0], uv[1]) for f, uv in curve] for curve in curves], batch.eval_curve_samples)
+    tag = utils.cache_tag(signature)
+    convert = utils.bary_converter(obj)
+    material = bpy.data.materials.new(obj.name + "_import_material")
+    material.diffuse_color = (0.2,0.2,1,1)
+    key = obj[utils.key_name]
+    for points_bar, segments in zip(curves, results):
+        #Curve objects are named after the number of curves, the item is added once the curve is drawn
+        draw_curve(obj, segments_polyline(convert, segments), material)
+        store_segments(utils.add_curve(key, points_bar), tag, segments)
+
+class ImportCurvesOperator(bpy.types.Operator, ImportHelper):
+    """Add the paths of an svg file, projected from the view, or an anchors file (face u v lines) as curves on the active object"""
+    bl_idname = "geodesic.import_curves"
+    bl_label = "Import curves"
+    bl_options = {'REGISTER','UNDO'}
+    filter_glob: bpy.props.StringProperty(default="*.svg;*.txt", options={'HIDDEN'})
+    size: bpy.props.FloatProperty(name="Size", min=0.01, max=1.0, default=0.8,
+        description="Side of the svg square relative to the view")
+
+    @classmethod
+    def poll(cls, context):
+        obj = context.view_layer.objects.active
+        #The curve being edited would be invalidated with the others of the object
+        return not edit.is_running and context.space_data.type == 'VIEW_3D' and obj is not None and obj.type == 'MESH'
+
+    def execute(self, context):
+        obj = context.view_layer.objects.active
+        #Curves already on obj are invalidated if its topology changed
+        if utils.key_name in obj and utils.check_topology(obj, utils.mesh_signature(obj.data)) is False:
+            drop_server(obj[utils.key_name])
+            del obj[utils.key_name]
+            self.report({'WARNING'}, "Geometry modified, curves on the objects invalidated")
+        #The key is added with the first curve, the mesh is exported under the one it will get
+        key = obj[utils.key_name] if utils.key_name in obj else next_key()
+        #The engines of the import also parse the svg, the mesh is exported and loaded once
+        pool, signature = curves_pool(obj, context.scene.rebuild_workers, key)
+        try:
+            if self.filepath.endswith(".txt"):
+                curves, skipped = utils.load_anchors(self.filepath), 0
+            else:
+                region = next(r for r in context.area.regions if r.type == 'WINDOW')
+                rv3d = context.space_data.region_3d
+                curves, skipped = [], 0
+                for path in utils.get_svg(pool.conns[0], self.filepath).result():
+                    #Consecutive segments share the end points
+                    points = [path[0][0]] + [p for segment in path for p in segment[1:]]
+                    points_bar = utils.project_points(obj, region, rv3d, points, self.size)
+                    if points_bar is None: skipped += 1
+                    else: curves.append(points_bar)
+            if len(curves) == 0:
+                self.report({'WARNING'}, "No curves on the object")
+                return {'CANCELLED'}
+            if utils.key_name not in obj: add_key(obj)
+            add_curves(obj, pool, signature, curves)
+        finally: pool.close()
+        utils.store_topology(obj[utils.key_name], signature)
+        message = str(len(curves)) + " curves imported"
+        if skipped: message += ", " + str(skipped) + " paths outside the object skipped"
+        self.report({'INFO'}, message)
+        return {'FINISHED'}
+
+#----------EXPORT--------------------------------------------------------
+
+class ExportCurvesOperator(bpy.types.Operator, ExportHelper):
+    """Export the segment samples of all the curves, one file for each object (see batch.pack_samples)"""
+    bl_idname = "geodesic.export_curves"
+    bl_label = "Export curves"
+    filename_ext = ".npz"
+    filter_glob: bpy.props.StringProperty(default="*.npz;*.json", options={'HIDDEN'})
+    format: bpy.props.EnumProperty(name="Format", default="npz",
+        items=[("npz", "NPZ", "Numpy archive (.npz)"),
+               ("raw", "Raw", "Raw arrays (.bin) with their offset table (.json), memory-mappable")])
+
+    def execute(self, context):
+        written, skipped = batch.export_blender(os.path.splitext(self.filepath)[0], self.format, context.scene.rebuild_workers)
+        message = str(len(written)) + " objects exported"
+        if skipped: message += ", " + str(len(skipped)) + " with modified or unknown topology skipped"
+        self.report({'INFO'}, message)
+        return {'FINISHED'}
+
 class GeodesicCurve(bpy.types.Operator):
     #Geodesic curve
     bl_idname = "view3d.modal_operator_geocurve"
@@ -70,11 +451,18 @@ class GeodesicCurve(bpy.types.Operator):
     def __init__(self):
         self.points_bar = []
         self.obj_name = None
+        self.pending = None #Curve being computed by the engine
+        self.timer = None #Polls the pending curve
         
     def modal(self, context, event):
         if event.type in {'MIDDLEMOUSE', 'WHEELUPMOUSE', 'WHEELDOWNMOUSE'}:
             # allow navigation
             return {'PASS_THROUGH'}
+        elif event.type == 'TIMER' and self.pending is not None:
+            try:
+                if not self.pending.done(): return {'RUNNING_MODAL'}
+            except OSError: pass #Engine lost, reported by draw_pending
+            return self.draw_pending(context)
         elif event.type == 'LEFTMOUSE':
             if event.value == 'RELEASE':
                 hit_obj, loc, normal, face_index = utils.ray_cast(context, event)
@@ -82,49 +470,67 @@ class GeodesicCurve(bpy.types.Operator):
                     obj = bpy.context.scene.objects[hit_obj.name]
                     key_name = utils.key_name 
                     if self.obj_name is None:
-                        #If first click save object and triangulate
+                        #If first click save object
                         self.obj_name = obj.name
-                        if key_name not in obj:
-                            obj[key_name] = "o" + str(bpy.context.scene.total)
-                            bpy.types.Scene.total += 1
-                            utils.push_key(obj[key_name])
-                            #Triangulate and recall the ray casting
-                            utils.triangulate_object(obj)
-                            hit_obj, loc, normal, face_index = utils.ray_cast(context, event)     
+                        if key_name not in obj: add_key(obj)
+                        #Engine starts while the other points are picked
+                        warm_server(obj)
                              
                     if len(self.points_bar) < 3:
                         #Save point in barycentric coordinates
-                        mesh = obj.data
-                        poly = mesh.polygons[face_index]
-                        corners = [mesh.vertices[vid].co for vid in poly.vertices]
-                        bcoords = poly_3d_calc(corners, loc)
-                        self.points_bar.append( [face_index , bcoords[1:]] )
+                        self.points_bar.append( utils.hit_point(obj.data, face_index, loc) )
                         
                     #Enough points, draw
                     if len(self.points_bar) == 3:
                         self.points_bar.append( self.points_bar[-1] )    
                         #Create communication if necessary
                         self.report({'INFO'}, "Loading server")
-                        set_server(obj)
+                        valid = set_server(obj)
                         self.report({'INFO'}, "Server loaded")
-                        #Calculate curve and draw
-                        try: curve = utils.get_curve(comm.s, obj, self.points_bar)
-                        except:
-                            del obj[utils.key_name]
-                            utils.reset_spline_server(comm)
-                            self.report({'WARNING'}, "Geometry modified, curves on the objects invalidated") 
+                        if not valid:
+                            self.invalidate(obj)
                             return {'CANCELLED'}
-                        draw_curve(obj, curve)
-                        #Push curve info
-                        utils.add_curve(obj[key_name], self.points_bar)
-                        return {'FINISHED'}
+                        #Calculate curve without blocking, it is drawn when received (ESC cancels it)
+                        timeout = context.scene.request_timeout
+                        self.pending = utils.get_curve_samples(comm.conn, obj, self.points_bar, timeout if timeout > 0 else None)
+                        self.timer = context.window_manager.event_timer_add(0.02, window=context.window)
 
                 return {'RUNNING_MODAL'}
         elif event.type in {'RIGHTMOUSE', 'ESC'}:
+            if self.pending is not None:
+                #The engine stops computing the abandoned curve
+                try: self.pending.cancel()
+                except OSError: pass
+                self.stop_timer(context)
             return {'CANCELLED'}
 
         return {'RUNNING_MODAL'}
 
+    def draw_pending(self, context):
+        self.stop_timer(context)
+        obj = bpy.context.scene.objects[self.obj_name]
+        try: curve, polyline, table = self.pending.result()
+        except engine.Interrupted:
+            self.report({'WARNING'}, "Curve not computed within the timeout")
+            return {'CANCELLED'}
+        except:
+            self.invalidate(obj)
+            return {'CANCELLED'}
+        with profiling.timed("add/draw_curve"): draw_curve(obj, curve)
+        #Push curve info
+        curve_item = utils.add_curve(obj[utils.key_name], self.points_bar)
+        utils.store_cache(curve_item, utils.cache_tag(comm.signature), [polyline], [table])
+        return {'FINISHED'}
+
+    def stop_timer(self, context):
+        context.window_manager.event_timer_remove(self.timer)
+        self.timer = None
+
+    def invalidate(self, obj):
+        drop_server(obj[utils.key_name])
+        del obj[utils.key_name]
+        self.report({'WARNING'}, "Geometry modified, curves on the objects invalidated") 
+
     def invoke(self, context, event):
         if context.space_data.type == 'VIEW_3D':
             if bpy.context.view_layer.objects.active: 
@@ -168,11 +574,15 @@ def menu_func(self, context):
 # Register and add to the "view" menu (required to also use F3 search "Raycast View Modal Operator" for quick access)
 def register():
     bpy.utils.register_class(GeodesicCurve)
+    bpy.utils.register_class(ImportCurvesOperator)
+    bpy.utils.register_class(ExportCurvesOperator)
     bpy.utils.register_class(PrintOperator)
     bpy.types.VIEW3D_MT_view.append(menu_func)
 
 def unregister():
     bpy.utils.unregister_class(GeodesicCurve)
+    bpy.utils.unregister_class(ImportCurvesOperator)
+    bpy.utils.unregister_class(ExportCurvesOperator)
     bpy.types.VIEW3D_MT_view.remove(menu_func)
 
 if __name__ == "__main__":
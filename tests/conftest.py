@@ -0,0 +1,24 @@
+#The add-on modules are imported outside Blender: bpy and mathutils are replaced by fakes with what the module
+#level code of utils uses, the tests only cover functions independent from Blender data
+import os
+import sys
+import types
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def fake_module(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+    return module
+
+if "bpy" not in sys.modules:
+    class PropertyGroup: pass
+    class Operator: pass
+    class Scene: pass
+    bpy = fake_module("bpy", context=mock.MagicMock(), props=mock.MagicMock(), utils=mock.MagicMock(),
+        types=fake_module("bpy.types", PropertyGroup=PropertyGroup, Operator=Operator, Scene=Scene))
+    fake_module("bpy_extras", view3d_utils=mock.MagicMock())
+    fake_module("mathutils", Vector=mock.MagicMock(),
+        interpolate=fake_module("mathutils.interpolate", poly_3d_calc=mock.MagicMock()))
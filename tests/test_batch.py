@@ -0,0 +1,53 @@
+import json
+import numpy as np
+
+import batch
+
+def test_pack_polylines_offsets():
+    polylines = [[(0, 0.0, 0.0), (0, 1.0, 0.0)], [], [(1, 0.0, 1.0), (1, 0.5, 0.5), (1, 0.0, 0.0)]]
+    vertices = np.array([(0, 0, 0), (1, 0, 0), (0, 1, 0), (1, 1, 0)], dtype=np.float64)
+    triangles = np.array([(0, 1, 2), (1, 3, 2)])
+    packed = batch.pack_polylines(polylines, vertices, triangles)
+    assert packed["offsets"].tolist() == [0, 2, 2, 5]
+    assert packed["faces"].tolist() == [0, 0, 1, 1, 1]
+    assert np.allclose(packed["positions"], [(0, 0, 0), (1, 0, 0), (0, 1, 0), (0.5, 1, 0), (1, 0, 0)])
+    assert "positions" not in batch.pack_polylines(polylines)
+
+def test_load_curves_formats(tmp_path):
+    curves = [[(0, 0.25, 0.5), (3, 0.5, 0.0)], [(1, 0.0, 1.0)]]
+    path = str(tmp_path / "curves.json")
+    with open(path, "w") as f: json.dump({"curves": [{"points": curve} for curve in curves]}, f)
+    assert batch.load_curves(path) == curves
+    path = str(tmp_path / "curves.npz")
+    np.savez(path, **batch.pack_polylines(curves))
+    assert batch.load_curves(path) == curves
+
+def test_pack_samples_offsets():
+    #Curve 0: 2 segments (2 + 3 samples), curve 1: 1 segment (2 samples)
+    caches = [
+        (np.array([0, 0, 1, 1, 1]), np.arange(20, dtype=np.float32).reshape(5, 4), np.array([0, 2, 5])),
+        (np.array([2, 2]), np.zeros((2, 4), dtype=np.float32), np.array([0, 2]))
+    ]
+    convert = lambda faces, uvs: np.zeros((len(faces), 3))
+    packed = batch.pack_samples(caches, convert, [False, True])
+    assert packed["segment_offsets"].tolist() == [0, 2, 5, 7]
+    assert packed["curve_offsets"].tolist() == [0, 2, 3]
+    assert packed["faces"].tolist() == [0, 0, 1, 1, 1, 2, 2]
+    assert packed["params"].tolist()[:2] == [2, 6]
+    assert packed["closed"].tolist() == [0, 1]
+
+def test_save_raw_offsets(tmp_path):
+    arrays = {
+        "faces": np.arange(5, dtype=np.int32),
+        "positions": np.arange(21, dtype=np.float32).reshape(7, 3),
+        "offsets": np.array([0, 2, 5], dtype=np.int64)
+    }
+    base = str(tmp_path / "curves")
+    batch.save_raw(base, arrays)
+    with open(base + ".json") as f: table = json.load(f)
+    assert table["file"] == "curves.bin"
+    for name, array in arrays.items():
+        entry = table["arrays"][name]
+        assert entry["offset"] % batch.RAW_ALIGN == 0
+        mapped = np.memmap(base + ".bin", np.dtype(entry["dtype"]), 'r', entry["offset"], tuple(entry["shape"]))
+        assert np.array_equal(mapped, array)
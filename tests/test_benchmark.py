@@ -0,0 +1,19 @@
+import numpy as np
+
+import benchmark
+
+def test_icosphere_sizes():
+    vertices, triangles = benchmark.icosphere(2)
+    assert triangles.shape == (320, 3) and vertices.shape == (162, 3)
+    assert np.allclose(np.linalg.norm(vertices, axis=1), 1)
+
+def test_noisy_torus_sizes():
+    vertices, triangles = benchmark.noisy_torus(8, 4, 0.1, np.random.default_rng(0))
+    assert vertices.shape == (32, 3) and triangles.shape == (64, 3)
+    assert triangles.max() == 31
+
+def test_random_point_in_triangle():
+    rng = np.random.default_rng(0)
+    for i in range(100):
+        face, u, v = benchmark.random_point(rng, 10)
+        assert 0 <= face < 10 and u >= 0 and v >= 0 and u + v <= 1
@@ -0,0 +1,120 @@
+import io
+import json
+import pytest
+
+import engine
+
+#Socket replaying the engine output, received a few bytes at a time so that frames are split across reads
+class FakeSocket:
+    def __init__(self, incoming = b"", step = 5):
+        self.incoming = bytearray(incoming)
+        self.step = step
+        self.sent = bytearray()
+        self.closed = False
+
+    def sendall(self, data):
+        self.sent += data
+
+    def recv(self, size):
+        data = bytes(self.incoming[:min(size, self.step)])
+        del self.incoming[:len(data)]
+        return data
+
+    def shutdown(self, how):
+        pass
+
+    def close(self):
+        self.closed = True
+
+def frame(rid, data, tail = b""):
+    return str(rid).encode() + b" " + str(len(data)).encode() + (b" " + tail if tail else b"") + b"\n" + data
+
+def test_send_frames_requests():
+    sock = FakeSocket()
+    conn = engine.EngineConnection(sock)
+    assert conn.send("h\n") == 0
+    assert conn.send("b\n1\n", deadline = 0.25) == 1
+    assert conn.send(b"g\n1\n\x00\x01") == 2
+    assert bytes(sock.sent) == b"0 2\nh\n" + b"1 4 250\nb\n1\n" + b"2 6\ng\n1\n\x00\x01"
+
+def test_chunks_are_joined():
+    sock = FakeSocket(frame(0, b"line 1\nli", b"+") + frame(0, b"ne 2\n", b"1500"))
+    conn = engine.EngineConnection(sock)
+    rid = conn.send("b\n")
+    assert conn.wait(rid) == ["line 1", "line 2"]
+    assert conn.last_timing[1] == pytest.approx(0.0015)
+    assert conn.partial == {}
+
+def test_responses_matched_by_id():
+    sock = FakeSocket(frame(1, b"second\n", b"+") + frame(0, b"first\n", b"10") + frame(1, b"", b"20"))
+    conn = engine.EngineConnection(sock)
+    first, second = conn.send("m\n"), conn.send("m\n")
+    assert conn.wait(second) == ["second"]
+    assert conn.wait(first) == ["first"]
+
+def test_discarded_response_dropped():
+    sock = FakeSocket(frame(0, b"dropped\n", b"10") + frame(1, b"kept\n", b"10"))
+    conn = engine.EngineConnection(sock)
+    dropped, kept = conn.send("o\n"), conn.send("m\n")
+    conn.discard(dropped)
+    assert conn.wait(kept) == ["kept"]
+    assert conn.responses == {} and conn.discarded == set()
+
+def test_interrupted_response_replaces_chunks():
+    sock = FakeSocket(frame(0, b"partial\n", b"+") + frame(0, b"interrupted\n", b"30 !") + frame(1, b"ok\n", b"5"))
+    conn = engine.EngineConnection(sock)
+    rid = conn.send("b\n", deadline = 0.01)
+    with pytest.raises(engine.Interrupted): conn.wait(rid)
+    assert conn.partial == {}
+    assert conn.wait(conn.send("m\n")) == ["ok"]
+
+def test_failed_request_raises():
+    sock = FakeSocket(frame(0, b"partial\n", b"+") + frame(0, b"error no session 3\n", b"10 !") + frame(1, b"ok\n", b"5"))
+    conn = engine.EngineConnection(sock)
+    with pytest.raises(engine.RequestFailed, match="no session 3"): conn.wait(conn.send("e\nm\n3\n"))
+    assert conn.wait(conn.send("m\n")) == ["ok"]
+
+def test_cancel_sends_cancel_frame():
+    sock = FakeSocket(frame(0, b"interrupted\n", b"10") + frame(2, b"ok\n", b"10"))
+    conn = engine.EngineConnection(sock)
+    rid = conn.send("b\n")
+    conn.cancel(rid)
+    assert sock.sent.endswith(b"1 4\nx\n0\n")
+    assert conn.wait(conn.send("m\n")) == ["ok"]
+
+def test_closed_connection():
+    conn = engine.EngineConnection(FakeSocket())
+    with pytest.raises(ConnectionError): conn.wait(conn.send("m\n"))
+
+def test_recorder_logs_requests_and_responses(tmp_path):
+    path = str(tmp_path / "trace.jsonl")
+    conn = engine.EngineConnection(FakeSocket(frame(0, b"ok\n", b"25")))
+    conn.recorder = engine.Recorder(path)
+    conn.wait(conn.send("m\n"))
+    conn.recorder.close()
+    with open(path) as f: events = [json.loads(line) for line in f]
+    assert [(e["event"], e["id"], e["data"]) for e in events] == [("request", 0, "m\n"), ("response", 0, "ok\n")]
+    assert events[1]["engine_us"] == 25
+
+def test_request_name():
+    assert engine.request_name("e\nm\n1\n") == "session_move"
+    assert engine.request_name("l\n1 0.2 0.3\n") == "straight_path"
+    assert engine.request_name("1 0.2 0.3\n") == "curve"
+    assert engine.request_name(b"g\n3\n") == "geometry"
+    assert engine.request_name("k\n") == "shutdown"
+
+def test_wait_ready():
+    process = type("Process", (), {"stdout": io.StringIO("loading mesh\nREADY 27016\nserving\n")})()
+    assert engine.wait_ready(process) == 27016
+    process.stdout = io.StringIO("loading mesh\n")
+    with pytest.raises(ConnectionError): engine.wait_ready(process)
+
+def test_handshake_checks_version():
+    reply = lambda version: frame(0, b"bezier " + str(version).encode() + b"\n20 12\n", b"10")
+    assert engine.handshake(engine.EngineConnection(FakeSocket(reply(engine.PROTOCOL_VERSION)))) == (20, 12)
+    with pytest.raises(ConnectionError):
+        engine.handshake(engine.EngineConnection(FakeSocket(reply(engine.PROTOCOL_VERSION + 1))))
+
+def test_params_request():
+    assert engine.params_request("de_casteljau_adaptive", 5) == "od\n5\nde_casteljau_adaptive\ndual\n"
+    assert engine.params_request("subdivision_uniform", 3, "primal") == "os\n3\nsubdivision_uniform\nprimal\n"
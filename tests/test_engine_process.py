@@ -0,0 +1,43 @@
+#Requests to a running engine, skipped when the engine executable is not built
+import os
+import time
+import pytest
+
+import batch
+import benchmark
+import engine
+
+pytestmark = pytest.mark.skipif(not os.path.exists(batch.ENGINE), reason="engine not built")
+
+@pytest.fixture
+def conn(tmp_path):
+    mesh = str(tmp_path / "sphere.obj")
+    benchmark.save_obj(mesh, *benchmark.icosphere(5))
+    pool = batch.EnginePool(mesh, 1)
+    yield pool.conns[0]
+    pool.close()
+
+#Enough uniform subdivisions to take much longer than the deadline
+def slow_subdivision(conn):
+    conn.request(engine.params_request("subdivision_uniform", 16))
+    polygon = [(0, 0.2, 0.2), (5000, 0.2, 0.2), (10000, 0.2, 0.2), (15000, 0.2, 0.2)]
+    return "".join(batch.pbar2str(p) for p in polygon)
+
+def test_deadline_interrupts_subdivision_uniform(conn):
+    request = slow_subdivision(conn)
+    start = time.perf_counter()
+    with pytest.raises(engine.Interrupted): conn.wait(conn.send(request, deadline = 0.05))
+    assert time.perf_counter() - start < 2
+
+def test_cancel_interrupts_subdivision_uniform(conn):
+    request = slow_subdivision(conn)
+    start = time.perf_counter()
+    conn.cancel(conn.send(request))
+    #Served once the cancelled request stopped
+    conn.request(engine.params_request("subdivision_uniform", 1))
+    assert time.perf_counter() - start < 2
+
+def test_failed_request_keeps_engine_serving(conn):
+    with pytest.raises(engine.RequestFailed): conn.request("e\nm\n12345\n0\n0\n0\n0.2\n0.2\n")
+    with pytest.raises(engine.RequestFailed): conn.request("od\nnot a number\n")
+    conn.request(engine.params_request("subdivision_uniform", 1))
@@ -0,0 +1,35 @@
+import pytest
+
+import profiling
+
+def test_percentiles():
+    h = profiling.Histogram()
+    for ms in range(100, 0, -1): h.add(ms / 1000)
+    summary = h.summary()
+    assert summary["count"] == 100
+    assert summary["mean_ms"] == pytest.approx(50.5)
+    assert summary["p50_ms"] == pytest.approx(51)
+    assert summary["p95_ms"] == pytest.approx(96)
+    assert summary["p99_ms"] == pytest.approx(100)
+    assert summary["max_ms"] == pytest.approx(100)
+
+def test_single_sample():
+    h = profiling.Histogram()
+    h.add(0.002)
+    assert h.summary()["p50_ms"] == h.summary()["p99_ms"] == pytest.approx(2)
+
+def test_rolling_history():
+    h = profiling.Histogram(size = 10)
+    for ms in range(20): h.add(ms / 1000)
+    summary = h.summary()
+    assert summary["count"] == 20
+    assert summary["p50_ms"] == pytest.approx(15)
+    assert summary["max_ms"] == pytest.approx(19)
+
+def test_record_and_reset():
+    profiling.reset()
+    with profiling.timed("test/phase"): pass
+    profiling.record("test/phase", 0.5)
+    assert profiling.summary()["test/phase"]["count"] == 2
+    profiling.reset()
+    assert profiling.summary() == {}
@@ -0,0 +1,155 @@
+import numpy as np
+import pytest
+from types import SimpleNamespace
+
+import profiling
+import utils
+
+def test_parse_samples():
+    lines = ["2", "3 0.25 0.5 0 0", "4 0.5 0.25 1 2.5", "next"]
+    poly, (params, lengths), pos = utils.parse_samples(lines, 0)
+    assert poly == [(3, 0.25, 0.5), (4, 0.5, 0.25)]
+    assert params == [0.0, 1.0] and lengths == [0.0, 2.5]
+    assert lines[pos] == "next"
+
+def test_curve_length_skips_empty_segments():
+    tables = [([0, 1], [0, 2.5]), ([], []), ([0, 0.5, 1], [0, 1, 1.5])]
+    assert utils.curve_length(tables) == pytest.approx(4.0)
+
+#Engine connection answering every request with the same lines
+class FakeConn:
+    def __init__(self, lines):
+        self.lines = lines
+        self.sent = []
+        self.last_timing = (0.0, 0.0)
+
+    def send(self, request, deadline = None):
+        self.sent.append(request)
+        return len(self.sent) - 1
+
+    def wait(self, rid):
+        return self.lines
+
+#Mesh collections filled with foreach_get as Blender does, attributes flattened in a 1d buffer
+class FakeCollection(list):
+    def foreach_get(self, attr, out):
+        out[:] = np.ravel([getattr(item, attr) for item in self])
+
+def fake_mesh(positions, faces):
+    return SimpleNamespace(vertices=FakeCollection(SimpleNamespace(co=p) for p in positions),
+        polygons=FakeCollection(SimpleNamespace(vertices=f) for f in faces),
+        loops=FakeCollection(SimpleNamespace(vertex_index=i) for f in faces for i in f))
+
+def test_mesh_signature_topology():
+    positions = [(0, 0, 0), (1, 0, 0), (0, 1, 0), (1, 1, 0)]
+    faces = [(0, 1, 2), (1, 3, 2)]
+    signature = utils.mesh_signature(fake_mesh(positions, faces))
+    moved = utils.mesh_signature(fake_mesh([(0, 0, 1)] + positions[1:], faces))
+    flipped = utils.mesh_signature(fake_mesh(positions, [(0, 1, 3), (0, 3, 2)]))
+    assert moved != signature and utils.same_topology(moved, signature)
+    assert not utils.same_topology(flipped, signature)
+
+def test_save_file(tmp_path):
+    mesh = fake_mesh([(0, 0, 0), (1, 0, 0), (0, 1, 0), (1, 1, 0.5)], [(0, 1, 2), (1, 3, 2)])
+    assert utils.is_triangulated(mesh)
+    path = str(tmp_path / "mesh.obj")
+    utils.save_file(mesh, path)
+    with open(path) as f: lines = f.read().splitlines()
+    assert lines[3] == "v 1 1 0.5"
+    assert lines[4:] == ["f 1 2 3", "f 2 4 3"]
+
+def test_simplify_straight_line():
+    points = [(x, 0, 0) for x in np.linspace(0, 1, 11)]
+    assert np.array_equal(utils.simplify_polyline(points, 1e-6), [(0, 0, 0), (1, 0, 0)])
+
+def test_simplify_keeps_corners():
+    points = [(0, 0, 0), (0.5, 0.001, 0), (1, 0, 0), (1, 0.5, 0), (1, 1, 0)]
+    simplified = utils.simplify_polyline(points, 0.01)
+    assert np.array_equal(simplified, [(0, 0, 0), (1, 0, 0), (1, 1, 0)])
+
+def test_simplify_within_tolerance():
+    t = np.linspace(0, np.pi, 200)
+    points = np.stack([np.cos(t), np.sin(t), np.zeros_like(t)], axis=1)
+    simplified = utils.simplify_polyline(points, 0.01)
+    assert 2 < len(simplified) < len(points)
+    #Every original point is close to a segment of the simplified polyline
+    a, b = simplified[:-1], simplified[1:]
+    for p in points:
+        t = np.clip(np.sum((p - a) * (b - a), axis=1) / np.sum((b - a)**2, axis=1), 0, 1)
+        assert np.min(np.linalg.norm(a + t[:, None] * (b - a) - p, axis=1)) <= 0.01 + 1e-12
+
+def test_simplify_disabled():
+    points = [(0, 0, 0), (0.5, 0, 0), (1, 0, 0)]
+    assert len(utils.simplify_polyline(points, 0)) == 3
+    assert len(utils.simplify_polyline(points[:2], 1)) == 2
+
+def test_load_anchors_groups_segments(tmp_path):
+    path = tmp_path / "anchors.txt"
+    path.write_text("".join(str(i) + " 0.25 0.5\n" for i in range(9)) + "\n")
+    curves = utils.load_anchors(str(path))
+    assert len(curves) == 2
+    assert [p[0] for p in curves[1]] == [4, 5, 6, 7]
+    assert curves[0][0] == [0, [0.25, 0.5]]
+
+def test_server_pool_evicts_least_recently_used(monkeypatch):
+    closed = []
+    monkeypatch.setattr(utils, "close_spline_server", closed.append)
+    pool = utils.ServerPool()
+    servers = [utils.ServerCommunication() for i in range(3)]
+    pool.add("a", servers[0], 2)
+    pool.add("b", servers[1], 2)
+    assert pool.get("a") is servers[0]
+    pool.add("c", servers[2], 2)
+    assert closed == [servers[1]]
+    assert list(pool.servers) == ["a", "c"] and pool.get("b") is None
+
+def test_get_mesh_stats():
+    conn = FakeConn(["mesh 1 2.5 1024", "primal_graph 0 0 0"])
+    stats = utils.get_mesh_stats(conn).result()
+    assert conn.sent == ["m\n"]
+    assert stats[0] == dict(name="mesh", built=True, ms=2.5, bytes=1024)
+    assert not stats[1]["built"]
+
+def test_pack_array_roundtrip():
+    samples = np.arange(12, dtype=np.float32).reshape(3, 4)
+    text = utils.pack_array(samples)
+    assert isinstance(text, str)
+    assert np.array_equal(utils.unpack_array(text, np.float32).reshape(-1, 4), samples)
+    #Non contiguous arrays are packed in order
+    assert np.array_equal(utils.unpack_array(utils.pack_array(samples[:, 1]), np.float32), samples[:, 1])
+    assert len(utils.unpack_array(utils.pack_array(np.zeros(0, dtype=np.int32)), np.int32)) == 0
+
+def test_cache_tag(monkeypatch):
+    scene = utils.bpy.context.scene
+    monkeypatch.setattr(scene, "spline_algorithm", "subdivision_adaptive", raising=False)
+    monkeypatch.setattr(scene, "path_solver", "primal", raising=False)
+    monkeypatch.setattr(scene, "subdivisions", 5, raising=False)
+    tag = utils.cache_tag((10, 16, "topology", "geometry"))
+    assert tag == "subdivision_adaptive primal 5 topology geometry"
+    #Topology hash read back by curves_topology
+    assert tag.split()[3] == "topology"
+
+def test_cache_roundtrip():
+    polylines = [[(0, 0.0, 0.0), (1, 0.5, 0.25)], [(1, 0.5, 0.25), (2, 0.0, 1.0), (3, 0.25, 0.25)]]
+    tables = [([0, 1], [0, 1.5]), ([0, 0.5, 1], [0, 1, 2])]
+    curve_item = SimpleNamespace(points_bar=[None] * 7)
+    utils.store_cache(curve_item, "tag", polylines, tables)
+    assert utils.load_cache(curve_item, "other") is None
+    faces, samples, offsets = utils.load_cache(curve_item, "tag")
+    assert offsets.tolist() == [0, 2, 5] and faces.tolist() == [0, 1, 1, 2, 3]
+    assert samples[4].tolist() == [0.25, 0.25, 1, 2]
+    #Cache of a curve whose control points changed
+    curve_item.points_bar += [None] * 3
+    assert utils.load_cache(curve_item, "tag") is None
+
+def test_submit_times_encode_and_convert():
+    profiling.reset()
+    conn = FakeConn(["1", "2"])
+    converted = []
+    pending = utils.submit(conn, lambda: "l\n" + utils.pbar2str((3, (0.25, 0.5))), lambda lines: [int(l) for l in lines],
+        convert = converted.append)
+    assert conn.sent == ["l\n3\n0.25\n0.5\n"]
+    assert pending.result() == [1, 2] and converted == [[1, 2]]
+    phases = profiling.summary()
+    assert {"straight_path/encode", "straight_path/parse", "straight_path/convert"} <= set(phases)
+    profiling.reset()
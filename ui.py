@@ -2,6 +2,7 @@ import sys
 import os
 import bpy
 from bpy.app.handlers import persistent
+from bpy_extras.io_utils import ExportHelper
 
 dir = os.path.dirname(bpy.context.space_data.text.filepath) #Get directory of the .blend file
 sys.path.append(dir) #Setting it as the python directory in the Blender Text editor 
@@ -9,6 +10,7 @@ sys.path.append(dir) #Setting it as the python directory in the Blender Text edi
 import spline
 import edit
 import utils
+import profiling
 
 class MainPanel:
     bl_space_type = "VIEW_3D"
@@ -32,6 +34,14 @@ class GeodesicPanel(MainPanel, bpy.types.Panel):
         row = layout.row()
         row.operator("view3d.edit_curve")
         
+        row = layout.row()
+        row.operator("geodesic.import_curves")
+        row.operator("geodesic.export_curves")
+        
+        row = layout.row()
+        row.prop(context.scene, 'record_requests')
+        row.prop(context.scene, 'record_path', text="")
+        
 
 class PropertiesPanel(MainPanel, bpy.types.Panel):
     bl_parent_id = "OBJECT_PT_geodesic"
@@ -42,10 +52,200 @@ class PropertiesPanel(MainPanel, bpy.types.Panel):
     def draw(self, context):
         layout = self.layout
         row = layout.row()
-        row.prop(context.scene, 'decastel_jau')
+        row.prop(context.scene, 'spline_algorithm')
+        
+        row = layout.row()
+        row.prop(context.scene, 'path_solver')
         
         row = layout.row()
         row.prop(context.scene, 'subdivisions')
+        
+        row = layout.row()
+        row.prop(context.scene, 'simplify_tolerance')
+        
+        row = layout.row()
+        row.prop(context.scene, 'request_timeout')
+        
+        row = layout.row()
+        row.operator("geodesic.rebuild_curves")
+        row.prop(context.scene, 'rebuild_workers')
+        row = layout.row()
+        row.prop(context.scene, 'auto_rebuild')
+        row.prop(context.scene, 'engine_pool_size')
+
+class ProfilingPanel(MainPanel, bpy.types.Panel):
+    bl_parent_id = "PROP_PT_geodesic"
+    bl_label = "Profiling"
+    bl_idname = "PROFILING_PT_geodesic"
+    bl_options = {"DEFAULT_CLOSED"}
+
+    def draw(self, context):
+        layout = self.layout
+        row = layout.row()
+        row.operator("geodesic.dump_profile")
+        row.operator("geodesic.reset_profile")
+        #Percentiles of each phase in ms
+        col = layout.column(align=True)
+        for name, s in profiling.summary().items():
+            col.label(text="{}: {:.1f} / {:.1f} / {:.1f} ms ({})".format(name, s["p50_ms"], s["p95_ms"], s["p99_ms"], s["count"]))
+        row = layout.row()
+        row.operator("geodesic.mesh_stats")
+        #Load or build time and memory of the engine mesh data
+        col = layout.column(align=True)
+        for r in mesh_stats:
+            col.label(text="{}: {:.1f} ms, {:.1f} MB".format(r["name"], r["ms"], r["bytes"] / 2**20) if r["built"] else r["name"] + ": not built")
+        row = layout.row()
+        row.operator("geodesic.profile_algorithms")
+        row.prop(context.scene, 'profile_tolerance')
+        #Median time and max deviation of each algorithm on the last profiled curve
+        col = layout.column(align=True)
+        for r in algorithm_profile:
+            col.label(text="{} {}: {:.1f} ms, {:.2g}".format(r["algorithm"], r["solver"], r["ms"], r["max_deviation"]))
+
+class DumpProfileOperator(bpy.types.Operator, ExportHelper):
+    """Save p50/p95/p99 latencies of each operation phase to a JSON file"""
+    bl_idname = "geodesic.dump_profile"
+    bl_label = "Dump JSON"
+    filename_ext = ".json"
+
+    def execute(self, context):
+        profiling.dump(self.filepath)
+        self.report({'INFO'}, "Profile saved in " + self.filepath)
+        return {'FINISHED'}
+
+class ResetProfileOperator(bpy.types.Operator):
+    """Clear the recorded latencies"""
+    bl_idname = "geodesic.reset_profile"
+    bl_label = "Reset"
+
+    def execute(self, context):
+        profiling.reset()
+        return {'FINISHED'}
+
+bpy.types.Scene.profile_tolerance = bpy.props.FloatProperty(name="Tolerance", min=0.0, default=0.001, precision=4,
+    description="Maximum deviation of an acceptable algorithm, relative to the mesh size")
+
+algorithm_profile = [] #Results of the last ProfileAlgorithmsOperator, fastest first
+
+class ProfileAlgorithmsOperator(bpy.types.Operator):
+    """Time every algorithm and path solver on the first segment of the active curve, with the deviation from a finer curve"""
+    bl_idname = "geodesic.profile_algorithms"
+    bl_label = "Profile algorithms"
+    repeat: bpy.props.IntProperty(name="Repeat", min=1, max=100, default=5)
+    use_fastest: bpy.props.BoolProperty(name="Use fastest", default=False,
+        description="Select the fastest algorithm within the tolerance")
+
+    @classmethod
+    def poll(cls, context):
+        obj = context.view_layer.objects.active
+        return not edit.is_running and obj is not None and utils.key_name in obj and obj[utils.key_name][0] == 'c'
+
+    def execute(self, context):
+        key = context.view_layer.objects.active[utils.key_name]
+        idx = key.find('o')
+        target = utils.getObjByKey(key[idx:])
+        if target is None or not spline.set_server(target, refresh = False):
+            self.report({'WARNING'}, "Curve invalidated since the geometry has been modified")
+            return {'CANCELLED'}
+        points_bar = [p.get() for p in utils.obj_curves_get(key[idx:]).value[int(key[1:idx])].points_bar[:4]]
+        try: results = utils.profile_algorithms(spline.comm.conn, points_bar, self.repeat).result()
+        except Exception as e:
+            self.report({'WARNING'}, "Profiling failed: " + str(e))
+            return {'CANCELLED'}
+        algorithm_profile[:] = sorted(results, key=lambda r: r["ms"])
+        acceptable = [r for r in algorithm_profile if r["max_deviation"] <= context.scene.profile_tolerance]
+        if not acceptable:
+            self.report({'WARNING'}, "No algorithm within the tolerance")
+            return {'FINISHED'}
+        fastest = acceptable[0]
+        if self.use_fastest:
+            context.scene.spline_algorithm = fastest["algorithm"]
+            context.scene.path_solver = fastest["solver"]
+        self.report({'INFO'}, "Fastest within the tolerance: {} {} ({:.1f} ms)".format(fastest["algorithm"], fastest["solver"], fastest["ms"]))
+        return {'FINISHED'}
+
+mesh_stats = [] #Results of the last MeshStatsOperator
+
+class MeshStatsOperator(bpy.types.Operator):
+    """Load time and memory of the engine mesh of the active object, and of the structures built when first needed"""
+    bl_idname = "geodesic.mesh_stats"
+    bl_label = "Mesh stats"
+
+    @classmethod
+    def poll(cls, context):
+        obj = context.view_layer.objects.active
+        return not edit.is_running and obj is not None and utils.key_name in obj and obj[utils.key_name][0] in "co"
+
+    def execute(self, context):
+        key = context.view_layer.objects.active[utils.key_name]
+        target = utils.getObjByKey(key[key.find('o'):]) if key[0] == 'c' else context.view_layer.objects.active
+        if target is None or not spline.set_server(target, refresh = False):
+            self.report({'WARNING'}, "Curve invalidated since the geometry has been modified")
+            return {'CANCELLED'}
+        try: mesh_stats[:] = utils.get_mesh_stats(spline.comm.conn).result()
+        except Exception as e:
+            self.report({'WARNING'}, "Mesh stats failed: " + str(e))
+            return {'CANCELLED'}
+        total = sum(r["bytes"] for r in mesh_stats)
+        self.report({'INFO'}, "Engine mesh data: {:.1f} MB".format(total / 2**20))
+        return {'FINISHED'}
+
+class RebuildCurvesOperator(bpy.types.Operator):
+    """Recompute every stored curve with the current parameters"""
+    bl_idname = "geodesic.rebuild_curves"
+    bl_label = "Rebuild all curves"
+
+    @classmethod
+    def poll(cls, context):
+        return not edit.is_running
+
+    def execute(self, context):
+        rebuild_all(self.report)
+        return {'FINISHED'}
+
+def rebuild_all(report):
+    try: count, invalid, unknown = spline.rebuild_curves(bpy.context.scene.rebuild_workers)
+    except Exception as e:
+        report({'WARNING'}, "Rebuild failed: " + str(e))
+        return
+    if invalid: report({'WARNING'}, "Geometry modified, curves invalidated on " + str(len(invalid)) + " objects")
+    if unknown: report({'WARNING'}, "Unknown topology, curves not rebuilt on " + str(len(unknown)) + " objects (edit one of their curves)")
+    report({'INFO'}, str(count) + " curves rebuilt")
+
+def report_console(level, message):
+    print(message)
+
+#Curve parameters changed
+def params_changed():
+    if bpy.context.scene.auto_rebuild and not edit.is_running: rebuild_all(report_console)
+
+#Start the engine of the active object (or of the target of the active curve) before it is needed
+def warm_active():
+    obj = bpy.context.view_layer.objects.active
+    if edit.is_running or obj is None or utils.key_name not in obj: return
+    key = obj[utils.key_name]
+    if key[0] == 'c': obj = utils.getObjByKey(key[key.find('o'):])
+    elif key[0] != 'o': return
+    if obj is None: return
+    try: spline.warm_server(obj)
+    except Exception as e: print("Engine warm-up failed: ", e)
+
+msgbus_owner = object()
+
+def subscribe():
+    bpy.msgbus.subscribe_rna(key=(bpy.types.LayerObjects, "active"), owner=msgbus_owner, args=(), notify=warm_active)
+    for name in ("spline_algorithm", "path_solver", "subdivisions"):
+        bpy.msgbus.subscribe_rna(key=bpy.context.scene.path_resolve(name, False), owner=msgbus_owner, args=(), notify=params_changed)
+
+#Object keys of the new file may match the ones of the engines and of the exported meshes
+@persistent
+def file_loaded(dummy):
+    spline.pool.close()
+    spline.pool.exported.clear()
+    #Subscriptions are cleared on file load
+    bpy.msgbus.clear_by_owner(msgbus_owner)
+    subscribe()
+    if bpy.context.scene.auto_rebuild: rebuild_all(report_console)
 
 @persistent
 def remove_tan(scene):    
@@ -57,16 +257,32 @@ def remove_tan(scene):
 def register():
     bpy.utils.register_class(GeodesicPanel)
     bpy.utils.register_class(PropertiesPanel)
+    bpy.utils.register_class(ProfilingPanel)
+    bpy.utils.register_class(DumpProfileOperator)
+    bpy.utils.register_class(ResetProfileOperator)
+    bpy.utils.register_class(RebuildCurvesOperator)
+    bpy.utils.register_class(ProfileAlgorithmsOperator)
+    bpy.utils.register_class(MeshStatsOperator)
     spline.register()
     edit.register()
     
     bpy.app.handlers.undo_post.append(remove_tan)
     bpy.app.handlers.redo_post.append(remove_tan)
+    bpy.app.handlers.load_post.append(file_loaded)
+    subscribe()
 def unregister():
     bpy.utils.unregister_class(GeodesicPanel)
     bpy.utils.unregister_class(PropertiesPanel)
+    bpy.utils.unregister_class(ProfilingPanel)
+    bpy.utils.unregister_class(DumpProfileOperator)
+    bpy.utils.unregister_class(ResetProfileOperator)
+    bpy.utils.unregister_class(RebuildCurvesOperator)
+    bpy.utils.unregister_class(ProfileAlgorithmsOperator)
+    bpy.utils.unregister_class(MeshStatsOperator)
     spline.unregister()
     edit.unregister()
+    bpy.msgbus.clear_by_owner(msgbus_owner)
+    bpy.app.handlers.load_post.remove(file_loaded)
 
 if __name__ == "__main__":
     register()
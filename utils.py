@@ -1,13 +1,31 @@
 import bpy
-import bmesh
-import sys
-import socket
 import subprocess
+import bisect
+import time
+import threading
+import hashlib
+import base64
+import numpy as np
+from collections import OrderedDict
 from bpy_extras import view3d_utils
 from mathutils import Vector
-
-bpy.types.Scene.decastel_jau   = bpy.props.BoolProperty(default=True) 
+from mathutils.interpolate import poly_3d_calc
+
+import engine
+import profiling
+
+bpy.types.Scene.spline_algorithm = bpy.props.EnumProperty(name="Algorithm", default="de_casteljau_uniform",
+    items=[(name, name.replace("_", " ").capitalize(), "") for name in engine.ALGORITHMS],
+    description="Algorithm computing the curves")
+bpy.types.Scene.path_solver = bpy.props.EnumProperty(name="Paths", default="dual",
+    items=[("dual", "Dual", "Shortest paths over the triangle graph"),
+        ("primal", "Primal", "Shortest paths over the vertex graph, built by the engine on first use")],
+    description="Solver of the geodesic paths joining the curve points")
 bpy.types.Scene.subdivisions = bpy.props.IntProperty(min=0, max=10, default=4)
+bpy.types.Scene.request_timeout = bpy.props.FloatProperty(name="Timeout", min=0.0, default=0.0, unit='TIME_ABSOLUTE',
+    description="Seconds after which the engine gives up computing a new curve, 0 for no limit")
+bpy.types.Scene.simplify_tolerance = bpy.props.FloatProperty(name="Simplify", min=0.0, default=0.0, precision=4, subtype='DISTANCE',
+    description="Maximum distance of the drawn curves from the computed ones, 0 keeps every point")
 
 #----------KEY FUNCTION----------------------------------------------------
 key_name = "geo_key"
@@ -46,11 +64,18 @@ class CurveInfo(bpy.types.PropertyGroup):
     points_bar: bpy.props.CollectionProperty(type=BarycentriCoord)
     is_closed:  bpy.props.BoolProperty()
     smooth:  bpy.props.BoolProperty(default=True)
+    #Segment samples computed by the engine, see store_cache
+    cache_tag: bpy.props.StringProperty()
+    cache_faces: bpy.props.StringProperty()
+    cache_samples: bpy.props.StringProperty()
+    cache_offsets: bpy.props.StringProperty()
 bpy.utils.register_class(CurveInfo)
 
 class ObjCurvesItem(bpy.types.PropertyGroup):
     key: bpy.props.StringProperty()
     value: bpy.props.CollectionProperty(type=CurveInfo)
+    #Topology hash of the mesh the curves are drawn on (see mesh_signature), empty if not known yet
+    topology: bpy.props.StringProperty()
 bpy.utils.register_class(ObjCurvesItem)
 
 bpy.types.Scene.obj_curves = bpy.props.CollectionProperty(type=ObjCurvesItem)
@@ -70,6 +95,7 @@ def add_curve(key, points_bar):
         p_bar_item.f = p[0]
         p_bar_item.u = p[1][0]
         p_bar_item.v = p[1][1]
+    return curve_item
 
 def update_curve(key, info):
     idx = key.find('o')
@@ -114,196 +140,608 @@ def print_obj_curves():
     print("Number of context geo objs: ",  len(bpy.context.scene.obj_curves))
     for item in bpy.context.scene.obj_curves:
         print("key: ", item.key, " n_curves: ", len(item.value))
+
+#----------CURVE TOPOLOGY--------------------------------------------------
+#The barycentric coords of the curves index the triangles of the mesh they were drawn on: its topology hash
+#is saved with them, so that a topology change is detected also across file loads and engine restarts
+
+#Topology hash the curves of key were drawn on, from the cache tags of files saved before it was stored
+#Output: None if unknown
+def curves_topology(key):
+    item = obj_curves_get(key)
+    if item is None: return None
+    if item.topology: return item.topology
+    for curve_item in item.value:
+        if curve_item.cache_tag: return curve_item.cache_tag.split()[3]
+    return None
+
+#signature: current mesh_signature of obj
+#Output: True if the curves of obj are on the current topology, False if it changed, None if unknown
+def check_topology(obj, signature):
+    topology = curves_topology(obj[key_name])
+    if topology is None: return None
+    return topology == signature[2]
+
+def store_topology(key, signature):
+    item = obj_curves_get(key)
+    if item is not None: item.topology = signature[2]
+
+#----------CURVE CACHE-----------------------------------------------------
+#The segment samples of each curve are saved with it in the .blend as packed arrays, so that the curves are
+#drawn and edited without computing them again while the params and the mesh are the same
+
+#Params and mesh (topology and positions hashes of mesh_signature) the samples have been computed with
+def cache_tag(signature):
+    scene = bpy.context.scene
+    return " ".join([scene.spline_algorithm, scene.path_solver, str(scene.subdivisions), signature[2], signature[3]])
+
+def pack_array(array):
+    return base64.b64encode(np.ascontiguousarray(array).tobytes()).decode("ascii")
+
+def unpack_array(text, dtype):
+    return np.frombuffer(base64.b64decode(text), dtype=dtype)
+
+#polylines: samples of each segment in barycentric coords, tables: their (curve parameters, arc lengths), see parse_samples
+def store_cache(curve_item, tag, polylines, tables):
+    offsets = np.zeros(len(polylines) + 1, dtype=np.int32)
+    offsets[1:] = np.cumsum([len(poly) for poly in polylines])
+    points = np.array([p for poly in polylines for p in poly], dtype=np.float64).reshape(-1, 3)
+    samples = np.empty((len(points), 4), dtype=np.float32)
+    samples[:, :2] = points[:, 1:]
+    samples[:, 2] = [t for params, lengths in tables for t in params]
+    samples[:, 3] = [s for params, lengths in tables for s in lengths]
+    curve_item.cache_faces = pack_array(points[:, 0].astype(np.int32))
+    curve_item.cache_samples = pack_array(samples)
+    curve_item.cache_offsets = pack_array(offsets)
+    curve_item.cache_tag = tag
+
+#Output: faces (P), samples (P, 4) as "u v t length", offsets (S+1) with the samples of segment i in [offsets[i], offsets[i+1]),
+#None if not computed with tag or not matching the control points
+def load_cache(curve_item, tag):
+    if curve_item.cache_tag != tag: return None
+    offsets = unpack_array(curve_item.cache_offsets, np.int32)
+    if len(offsets) != (len(curve_item.points_bar) - 1) // 3 + 1: return None
+    faces = unpack_array(curve_item.cache_faces, np.int32)
+    samples = unpack_array(curve_item.cache_samples, np.float32).reshape(-1, 4)
+    return faces, samples, offsets
+
+#Polyline of the whole curve in world coords, consecutive segments share their end points
+#convert: see bary_converter
+def cached_polyline(convert, cache):
+    faces, samples, offsets = cache
+    keep = np.ones(len(faces), dtype=bool)
+    keep[offsets[1:-1]] = False
+    return convert(faces[keep], samples[keep, :2])
+
+#Segments as parse_update gives them
+#Output: polylines in 3d coords, sample tables and polylines in barycentric coords of each segment
+def cached_segments(convert, cache):
+    faces, samples, offsets = cache
+    positions = convert(faces, samples[:, :2])
+    segments, tables, polylines = [], [], []
+    for first, last in zip(offsets[:-1], offsets[1:]):
+        segments.append( [tuple(p) for p in positions[first:last].tolist()] )
+        tables.append( (samples[first:last, 2].tolist(), samples[first:last, 3].tolist()) )
+        polylines.append( [(int(f), float(u), float(v)) for f, (u, v) in zip(faces[first:last], samples[first:last, :2])] )
+    return segments, tables, polylines
     
 #----------C++ ENGINE COMMUNICATION FUNCTION-----------------------------
 
 class ServerCommunication:
     def __init__(self):
-        self.s = None #Socket
+        self.conn = None #Connection to the engine (engine.EngineConnection)
         self.process = None #Subprocess for c++ engine
         self.obj_key = None #Name of the current working object
-
-#Create TCP socket for geodesic spline calculations                
-def create_socket():
-    HOST = "127.0.0.1"  # The server's hostname or IP address
-    PORT = 27015  # The port used by the server
-
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    sock.connect((HOST, PORT))
-    return sock
+        self.mesh = None #Mesh file loaded by the engine
+        self.recorder = None #Engine requests log (engine.Recorder), if recording
+        self.ready = None #Set when the engine started in background is connected (threading.Event)
+        self.error = None #Engine start failure
+        self.mesh_size = None #Triangles and vertices loaded by the engine, from the handshake
+        self.signature = None #mesh_signature of the mesh loaded by the engine, known once exported
+        self.started = None #Event of the current start, None once closed (see connect_spline_server)
+        self.lock = threading.Lock() #Guards process, conn and started between the background start and a close
+
+#Start C++ engine in subprocess without waiting for it, the start and the connection are made in background
+#mesh: file path, or export function returning the file path and the mesh signature (see spline.export_mesh):
+#hashing and writing a large mesh runs in background too, before the engine process is started
+#port: 0 lets the system pick a free one, so that several engines can run at once
+def start_spline_server(directory, comm, mesh = None, port = 0):
+    command = [directory + "\\bezier\\bin\\splinegui.exe", "--port", str(port)]
+    if mesh is None: mesh = directory + "\\bezier\\data\\tmp.obj"
+    comm.conn = None
+    comm.process = None
+    comm.error = None
+    comm.ready = threading.Event()
+    comm.started = comm.ready
+    threading.Thread(target=connect_spline_server, args=(comm, command, mesh, comm.ready), daemon=True).start()
+
+#Background part of the start: mesh export, engine process, handshake line, connection and handshake request
+def connect_spline_server(comm, command, mesh, ready):
+    conn = None
+    try:
+        if callable(mesh): mesh, comm.signature = mesh()
+        comm.mesh = mesh
+        with comm.lock:
+            if comm.started is not ready: raise ConnectionError("Engine closed before its start")
+            process = comm.process = subprocess.Popen([command[0], mesh] + command[1:], 
+                universal_newlines=True,
+                stdout=subprocess.PIPE
+                )
+        conn = engine.connect(port = engine.wait_ready(process))
+        mesh_size = engine.handshake(conn)
+    except Exception as e:
+        if conn is not None: conn.close()
+        conn, error = None, e
+    with comm.lock:
+        #Engine closed meanwhile, another one may be starting
+        if comm.started is not ready:
+            if conn is not None: conn.close()
+        elif conn is None: comm.error = error
+        else:
+            comm.mesh_size = mesh_size
+            if comm.recorder:
+                comm.recorder.mesh(comm.mesh)
+                conn.recorder = comm.recorder
+            comm.conn = conn
+            print("New socket: ", conn.s)
+    ready.set()
+
+#Block until the engine is connected, usually already done if started in advance
+def wait_spline_server(comm):
+    comm.ready.wait()
+    if comm.error is not None: raise comm.error
 
 #Run C++ engine in subprocess    
-def run_spline_server(directory, comm):
-    command = directory + "\\bezier\\bin\\splinegui.exe"
-    mesh = directory + "\\bezier\\data\\tmp.obj"
-    comm.process = subprocess.Popen([command, mesh], 
-        universal_newlines=True,
-        stdout=subprocess.PIPE
-        )
- 
-    line = comm.process.stdout.readline()
-    line = comm.process.stdout.readline()
-    print("Waited for line ", line)
-    comm.s = create_socket()
-    print("New socket: ", comm.s)
+def run_spline_server(directory, comm, mesh = None):
+    start_spline_server(directory, comm, mesh)
+    wait_spline_server(comm)
 
 #Kill C++ engine subprocess   
 def close_spline_server(comm):
-    comm.s.sendall(b"a\n")
+    if comm.conn is not None: comm.conn.send("k\n")
     reset_spline_server(comm)
     
+#Also stops a start still in background, the engine process is then not started or killed
 def reset_spline_server(comm):
-    subprocess.Popen("TASKKILL /F /PID {pid} /T".format(pid=comm.process.pid))
-    comm.process = None
-    comm.s.shutdown(socket.SHUT_RDWR)
-    comm.s.close()
+    with comm.lock:
+        process, conn = comm.process, comm.conn
+        comm.process = comm.conn = comm.started = None
+    if process is not None: subprocess.Popen("TASKKILL /F /PID {pid} /T".format(pid=process.pid))
+    if conn is not None: 
+        conn.close()
+        print("Closed socket: ", conn.s)
     comm.obj_key = None
-    print("Closed socket: ", comm.s)
 
-#Save mesh in tmp.obj that will be the input for the C++ engine
+#Engines of several objects, each one keeps the mesh of its object loaded so that switching objects
+#does not restart it. Beyond size engines the least recently used one is closed
+class ServerPool:
+    def __init__(self):
+        self.servers = OrderedDict() #Object key -> ServerCommunication, least recently used first
+        self.exported = {} #Object key -> mesh_signature of its last exported mesh file
+
+    #Engine of the object, now the most recently used, None if not running
+    def get(self, key):
+        server = self.servers.get(key)
+        if server is not None: self.servers.move_to_end(key)
+        return server
+
+    def add(self, key, server, size):
+        while self.servers and len(self.servers) >= size:
+            old_key, old = self.servers.popitem(last=False)
+            close_spline_server(old)
+        self.servers[key] = server
+
+    #Kill the engine of the object, its mesh is no more valid
+    def remove(self, key):
+        server = self.servers.pop(key, None)
+        if server is not None and server.started is not None: reset_spline_server(server)
+
+    def close(self):
+        for server in self.servers.values():
+            if server.started is not None: close_spline_server(server)
+        self.servers.clear()
+
+#----------MESH EXPORT-----------------------------------------------------------
+#The engine works on triangles: the polygons of triangulated meshes, otherwise the loop triangles,
+#so the user's mesh is never rewritten. Faces of control points and polylines index these triangles
+
+#Every polygon has at least 3 loops, all of them are triangles iff there are 3 loops per polygon
+def is_triangulated(mesh):
+    return len(mesh.loops) == 3 * len(mesh.polygons)
+
+def loop_triangles(mesh):
+    if len(mesh.loop_triangles) == 0 and len(mesh.polygons) > 0: mesh.calc_loop_triangles()
+    return mesh.loop_triangles
+
+#Engine triangles as (F, 3) vertex indices
+def mesh_triangles(mesh):
+    if is_triangulated(mesh): faces = mesh.polygons
+    else:
+        mesh.calc_loop_triangles()
+        faces = mesh.loop_triangles
+    triangles = np.empty(len(faces) * 3, dtype=np.int32)
+    faces.foreach_get("vertices", triangles)
+    return triangles.reshape(-1, 3)
+
+def triangle_vertices(mesh, face_idx):
+    if is_triangulated(mesh): return mesh.polygons[face_idx].vertices
+    return loop_triangles(mesh)[face_idx].vertices
+
+#Polygon containing the engine triangle face_idx
+def triangle_polygon(mesh, face_idx):
+    if is_triangulated(mesh): return face_idx
+    return loop_triangles(mesh)[face_idx].polygon_index
+
+#Control point from a ray cast hit on polygon face_index, [triangle, [u, v]]
+#Loop triangles of a polygon are consecutive, starting after the loop triangles of the previous polygons
+def hit_point(mesh, face_index, loc):
+    if is_triangulated(mesh): faces = [face_index]
+    else:
+        poly = mesh.polygons[face_index]
+        first = poly.loop_start - 2 * face_index
+        faces = range(first, first + poly.loop_total - 2)
+    best = None
+    for face in faces:
+        corners = [mesh.vertices[vid].co for vid in triangle_vertices(mesh, face)]
+        bcoords = poly_3d_calc(corners, loc)
+        #Triangle containing loc: no negative weight, up to the numerical error
+        if best is None or min(bcoords) > min(best[1]): best = (face, bcoords)
+    return [best[0], best[1][1:]]
+
+#Vertex positions (V*3) and engine triangles (F, 3), copied with foreach_get: read on the main thread,
+#they can be hashed and written in background
+def mesh_buffers(mesh):
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    return co, mesh_triangles(mesh)
+
+#Cheap change detection: vertex and triangle counts, hash of the triangle vertices (topology) and hash of the positions
+#Buffers are hashed as raw bytes, no Python object per vertex
+#Positions are the ones of the mesh data, as everywhere else (engine mesh, ray cast hits, curve drawing): shape keys
+#and modifiers are not applied, so they are not detected as deformations
+def buffers_signature(co, triangles):
+    topology = hashlib.blake2b(triangles.tobytes(), digest_size=16)
+    geometry = hashlib.blake2b(co.tobytes(), digest_size=16)
+    return (len(co) // 3, len(triangles), topology.hexdigest(), geometry.hexdigest())
+
+def mesh_signature(mesh):
+    return buffers_signature(*mesh_buffers(mesh))
+
+#Deformation only, barycentric coordinates of the curves are still valid
+def same_topology(signature_1, signature_2):
+    return signature_1[:3] == signature_2[:3]
+
+#Save mesh in an obj file that will be the input for the C++ engine
 #Needed to keep data structure alligned with the C++ engine
-def save_file(mesh, name): 
+def save_file(mesh, name):
+    save_buffers(name, *mesh_buffers(mesh))
+
+#Obj file from the buffers of mesh_buffers, no bpy access
+def save_buffers(name, co, triangles):
     with open(name, 'w+') as f1:
-        for p in mesh.vertices:
-            coord = p.co
-            f1.write("v " +  str(coord[0]) + " " + str(coord[1]) + " " + str(coord[2]) + "\n" )
-        for f in mesh.polygons:
-            v1, v2, v3 = f.vertices 
-            f1.write("f " + str(v1+1) + " " + str(v2+1) + " " + str(v3+1) + "\n")      
-            
-#Send control points in barycentric coords to server
-def send_point_bar(sock, points_bar):
-    send = ""
-    for point in points_bar:
-        send += pbar2str(point)
-    sock.sendall(send.encode())
-    
-#Send final two points of current polygon and new one
-def send_tan_extension(sock, p1, p2):
-    send = "n\n"
-    send += pbar2str( p1.get() ) #For tangent calculation
-    send += pbar2str( p2.get() ) #Start point of the new curve
-    sock.sendall(send.encode())
-
-def send_point_eval(sock, points_bar, t0):
-    send = "p\n" + str(t0) + "\n"
-    for point in points_bar:
-        send += pbar2str(point)
-    sock.sendall(send.encode())
-
-def send_split(sock, points_bar, t0):
-    send = "s\n" + str(t0) + "\n"
-    for point in points_bar:
-        send += pbar2str(point)
-    sock.sendall(send.encode())
+        np.savetxt(f1, co.reshape(-1, 3), fmt="v %.9g %.9g %.9g")
+        np.savetxt(f1, triangles + 1, fmt="f %d %d %d")
+
+#Engine requests below return a Pending response: several requests can be sent
+#before waiting for the first result, the engine works on them while Blender draws
+#Phases of each request are recorded in profiling: encode, send, wait (blocked on the socket), roundtrip,
+#engine (compute time), parse and convert (barycentric to world coords)
+class Pending:
+    def __init__(self, conn, rid, parse, name, convert = None):
+        self.conn = conn
+        self.rid = rid
+        self.parse = parse #Converts the response lines in the result
+        self.convert = convert #Converts the polylines of the result to world coords in place
+        self.name = name #Operation name for profiling
     
+    #Wait for the response
+    def result(self):
+        start = time.perf_counter()
+        lines = self.conn.wait(self.rid)
+        received = time.perf_counter()
+        res = self.parse(lines)
+        roundtrip, engine_time = self.conn.last_timing
+        profiling.record(self.name + "/wait", received - start)
+        profiling.record(self.name + "/roundtrip", roundtrip)
+        profiling.record(self.name + "/engine", engine_time)
+        profiling.record(self.name + "/parse", time.perf_counter() - received)
+        if self.convert is not None:
+            with profiling.timed(self.name + "/convert"): self.convert(res)
+        return res
+
+    #Response received, result will not block
+    def done(self):
+        return self.conn.poll(self.rid)
+
+    #Stop the engine computation, the result is no more available
+    def cancel(self):
+        self.conn.cancel(self.rid)
+
+#request: text or bytes, or a function building it so that the encoding is timed
+#deadline: seconds after which the engine gives up, result then raises engine.Interrupted
+def submit(conn, request, parse, deadline = None, convert = None):
+    start = time.perf_counter()
+    if callable(request): request = request()
+    name = engine.request_name(request)
+    profiling.record(name + "/encode", time.perf_counter() - start)
+    with profiling.timed(name + "/send"): rid = conn.send(request, deadline)
+    return Pending(conn, rid, parse, name, convert)
+
 def pbar2str(point):
     face, coord = point
     return str(face) + "\n" + str(coord[0]) + "\n" + str(coord[1]) + "\n" 
 
-#Read single polyline from the server
-#Input: obj if want the points in 3d coords (barycentric otherwise), remaining data if present (for successive read calls)
-#Output: polyline in barycentric coordinates and remaining data if present (for successive read calls)
-#Note: remainder variable needed only if need to read multiple consecutive polylines
-def recv_points(sock, remainders = (None, [])):
+def parse_point(line):
+    coords = line.split()
+    return [int(coords[0]), [float(coords[1]), float(coords[2])]]
+
+#Parse polyline starting at lines[pos] (length line followed by the points)
+#Output: polyline in barycentric coordinates and position of the following line
+def parse_polyline(lines, pos):
+    n = int(lines[pos])
     poly = []
-    n = -1
-    #Line_remainder: if row has been separated in two different messages
-    #Data_remainder: after finished reading there may be remaining data for following poly read
-    #Note: only one of the two possible
-    line_remainder, data_remainder = remainders
-    while n < 0 or len(poly) < n:   
-        #Read data if there is none 
-        if len(data_remainder) == 0: 
-            data = sock.recv(2048).decode()
-            #If last line was splitted append it in the front
-            if line_remainder is not None: 
-                data = line_remainder + data
-                line_remainder = None
-            poly_points = data.splitlines(True)    
-        #Get there remaining data if present
-        else: 
-            poly_points = data_remainder
-            data_remainder = []  
-        #Read points
-        for idx in range(len(poly_points)):
-            p = poly_points[idx]
-            #Truncated line
-            if p.count('\n') != 1 and p[-1] != '\n': 
-                line_remainder = p
-                break
-            #First line is polyline len
-            if n < 0: n = int(p)
-            #Following lines are points
-            else:        
-                coords = p.split()
-                poly.append( (int(coords[0]), float(coords[1]), float(coords[2])) )
-                #Check if finished reading
-                if len(poly) == n: 
-                    if idx < len(poly_points)-1: data_remainder = poly_points[idx+1:]
-                    break
-    return poly, (line_remainder, data_remainder)
-
-def get_straight_path(sock, obj, p1, p2):
-    send = "l\n"
-    send += pbar2str( p1 )
-    send += pbar2str( p2 )
-    sock.sendall(send.encode())
-    path, _ = recv_points(sock)
-    return path
-
-def get_curve(sock, obj, points_bar):
-    send_point_bar(sock, points_bar)
-    curve, _ = recv_points(sock)
-    convert_coords(obj, curve)
-    return curve
-
-#Receive polygon and curve
-#OUTPUT: control polygon points idx in the mesh, control points idx in the previous list, curve points idx
-"""
-def get_all_data(sock, obj, points_bar):
-    #Send control points to the engine
-    send_point_bar(sock, points_bar)
-    control_points = []
-    control_points_idx = [0]
-    #Receive control polygon
-    remainder = (None, [])
-    for i in range(len(points_bar) - 1):
-        tmp, remainder = recv_points(sock, remainder)
-        control_points_idx.append( control_points_idx[-1] + len(tmp) - 1 )
-        if len( control_points ) != 0:
-            tmp = tmp[1:]
-        control_points = control_points + tmp
-    convert_coords(obj, control_points)
-    #Receive curve
-    curve, _ = recv_points(sock, remainder)
-    convert_coords(obj, curve)
-    return control_points, control_points_idx, curve
-
-
-def get_extension(sock, obj):
-    control_points = []
-    control_points_idx = [0]
-    #Receive control polygon
-    remainder = (None, [])
-    for i in range(3):
-        tmp, remainder = recv_points(sock, remainder)
-        control_points_idx.append( control_points_idx[-1] + len(tmp) - 1 )
-        if len( control_points ) != 0:
-            tmp = tmp[1:]
-        control_points = control_points + tmp
-    convert_coords(obj, control_points)
-    #Receive curve
-    curve, _ = recv_points(sock, remainder)
-    convert_coords(obj, curve)
-    return control_points, control_points_idx, curve
+    for p in lines[pos+1:pos+1+n]:
+        coords = p.split()
+        poly.append( (int(coords[0]), float(coords[1]), float(coords[2])) )
+    return poly, pos + 1 + n
+
+#Segment of control points in barycentric coords, sampled as in the curve sessions
+#Output: polyline in 3d coords, polyline in barycentric coords and sample table (see parse_samples)
+def get_curve_samples(conn, obj, points_bar, deadline = None):
+    def parse(lines):
+        poly, table, _ = parse_samples(lines, 0)
+        return list(poly), poly, table
+    return submit(conn, lambda: "b\n" + "".join(pbar2str(point) for point in points_bar), parse, deadline,
+        lambda res: convert_coords(obj, res[0]))
+
+#Cubic segments of the paths of an svg file, parsed by the engine
+#Output: list of paths, each one a list of segments of 4 points (x, y) in [0, 1] with y up
+def get_svg(conn, filename):
+    def parse(lines):
+        paths = []
+        pos = 1
+        for i in range(int(lines[0])):
+            n = int(lines[pos])
+            segments = []
+            for line in lines[pos+1:pos+1+n]:
+                c = [float(x) for x in line.split()]
+                segments.append( [(c[0], c[1]), (c[2], c[3]), (c[4], c[5]), (c[6], c[7])] )
+            paths.append(segments)
+            pos += 1 + n
+        return paths
+    return submit(conn, "v\n" + filename + "\n", parse)
+
+#Time and deviation of every algorithm and path solver on the control polygon, repeat runs each
+#Output: [{algorithm, solver, ms, max_deviation, mean_deviation, points}], deviations relative to the mesh size
+def profile_algorithms(conn, points_bar, repeat):
+    send = lambda: "f\n" + str(repeat) + "\n" + "".join(pbar2str(p) for p in points_bar)
+    def parse(lines):
+        results = []
+        for line in lines:
+            algorithm, solver, ms, max_deviation, mean_deviation, points = line.split()
+            results.append(dict(algorithm=algorithm, solver=solver, ms=float(ms), max_deviation=float(max_deviation),
+                mean_deviation=float(mean_deviation), points=int(points)))
+        return results
+    return submit(conn, send, parse)
+
+#Load time and memory of the engine mesh and of the structures the engine builds when first needed
+#Output: [{name, built, ms, bytes}], the mesh first
+def get_mesh_stats(conn):
+    def parse(lines):
+        results = []
+        for line in lines:
+            name, built, ms, size = line.split()
+            results.append(dict(name=name, built=built == "1", ms=float(ms), bytes=int(size)))
+        return results
+    return submit(conn, "m\n", parse)
+
+#Replace the vertex positions of the engine mesh, the topology must be the same
+#co: positions (V*3) of mesh_buffers, sent as raw little endian floats
+def update_geometry(conn, co):
+    send = lambda: b"g\n" + str(len(co) // 3).encode() + b"\n" + np.ascontiguousarray(co, dtype='<f4').tobytes()
+    def parse(lines):
+        if lines[0] == "error": raise ConnectionError("Engine geometry update failed")
+    return submit(conn, send, parse)
+
+#----------CURVE SESSIONS--------------------------------------------------
+#The engine keeps the control points and segments of the edited curve, requests carry only the edit
+
+session_count = 0
+
+#Session ids are chosen by the client, so that requests on a new session can be sent before its creation is answered
+def new_session_id():
+    global session_count
+    session_count += 1
+    return session_count
+
+#Request for session op, parse gets the response lines following the session id
+#args: text, or a function building it (see submit)
+def session_request(conn, op, session_id, args, parse, convert = None):
+    send = lambda: "e\n" + op + "\n" + str(session_id) + "\n" + (args() if callable(args) else args)
+    return submit(conn, send, lambda lines: parse(lines[1:]), convert = convert)
+
+#Parse session update: replacements [start, end) of control points and of segment polylines
+#Output: update ([(start, end, points)], [(start, end, [(polyline to convert, sample table, polyline in barycentric coords)])])
+#and position of the following line
+def parse_update(lines, pos):
+    points = []
+    n = int(lines[pos])
+    pos += 1
+    for k in range(n):
+        start, end, count = [int(x) for x in lines[pos].split()]
+        points.append( (start, end, [parse_point(l) for l in lines[pos+1:pos+1+count]]) )
+        pos += 1 + count
+    segments = []
+    n = int(lines[pos])
+    pos += 1
+    for k in range(n):
+        start, end, count = [int(x) for x in lines[pos].split()]
+        pos += 1
+        items = []
+        for j in range(count):
+            poly, table, pos = parse_samples(lines, pos)
+            items.append( (list(poly), table, poly) )
+        segments.append( (start, end, items) )
+    return (points, segments), pos
+
+#Segment polylines of a parsed update in 3d coords
+def convert_update(obj, update):
+    for start, end, items in update[1]:
+        for curve, table, poly in items: convert_coords(obj, curve)
+
+#Parse segment samples starting at lines[pos], lines are "face u v t length"
+#Output: polyline in barycentric coordinates, sample table (curve parameters, cumulative arc lengths) and position of the following line
+def parse_samples(lines, pos):
+    n = int(lines[pos])
+    poly = []
+    params = []
+    lengths = []
+    for p in lines[pos+1:pos+1+n]:
+        coords = p.split()
+        poly.append( (int(coords[0]), float(coords[1]), float(coords[2])) )
+        params.append(float(coords[3]))
+        lengths.append(float(coords[4]))
+    return poly, (params, lengths), pos + 1 + n
+
+#Parse the two tangent paths of an anchor (empty if not present)
+def parse_tangents(lines, pos):
+    tan_1, pos = parse_polyline(lines, pos)
+    tan_2, pos = parse_polyline(lines, pos)
+    return (tan_1, tan_2), pos
+
+def convert_tangents(obj, tans):
+    for tan in tans: convert_coords(obj, tan)
+
+#Replace items [start, end) of a collection of barycentric coords with points
+def splice_points(points_bar, start, end, points):
+    common = min(end - start, len(points))
+    for i in range(common): update_point(points_bar[start + i], points[i])
+    for i in range(common, end - start): points_bar.remove(start + common)
+    for i in range(common, len(points)):
+        add_point(points_bar, points[i])
+        points_bar.move(len(points_bar) - 1, start + i)
+
+#Apply session update to the control points collection and to the lists of segment polylines (3d and barycentric coords)
+#and sample tables
+def apply_update(update, points_bar, segments, tables, polylines):
+    points_splices, segments_splices = update
+    for start, end, points in points_splices: splice_points(points_bar, start, end, points)
+    for start, end, items in segments_splices: 
+        segments[start:end] = [poly for poly, table, bary in items]
+        tables[start:end] = [table for poly, table, bary in items]
+        polylines[start:end] = [bary for poly, table, bary in items]
+
+def curve_length(tables):
+    return sum(lengths[-1] for params, lengths in tables if len(lengths) > 0)
+
+#Point of the curve at arc length s, interpolated on the segment samples without engine requests
+#Output: global parameter (integer part is the segment index) and point in 3d coords
+def eval_arc_length(segments, tables, s):
+    for i, (params, lengths) in enumerate(tables):
+        if len(lengths) < 2: continue
+        if s > lengths[-1] and i < len(tables) - 1:
+            s -= lengths[-1]
+            continue
+        k = min(max(bisect.bisect_left(lengths, s), 1), len(lengths) - 1)
+        span = lengths[k] - lengths[k-1]
+        w = (s - lengths[k-1]) / span if span > 0 else 0.0
+        w = min(max(w, 0.0), 1.0)
+        t = params[k-1] + (params[k] - params[k-1]) * w
+        p1, p2 = Vector(segments[i][k-1]), Vector(segments[i][k])
+        return i + t, p1.lerp(p2, w)
+
+#Create session from control points (or reset it if already existing)
+#Output: update containing all the segments
+def session_create(conn, obj, session_id, points_bar, closed):
+    args = lambda: str(int(closed)) + "\n" + "".join(pbar2str(point) for point in points_bar)
+    return session_request(conn, "c", session_id, args, lambda lines: parse_update(lines, 0)[0],
+        lambda update: convert_update(obj, update))
+
+#Session of a curve whose segments are already known (see load_cache), the engine does not compute them
+#Output: empty update
+def session_restore(conn, obj, session_id, points_bar, closed):
+    args = lambda: str(int(closed)) + "\n" + "".join(pbar2str(point) for point in points_bar)
+    return session_request(conn, "r", session_id, args, lambda lines: parse_update(lines, 0)[0],
+        lambda update: convert_update(obj, update))
+
+#Move control point idx (and mirror its tangent if smooth)
+#Output: update and tangent paths of the closest anchor
+def session_move(conn, obj, session_id, idx, point, smooth):
+    args = lambda: str(idx) + "\n" + str(int(smooth)) + "\n" + pbar2str(point)
+    def parse(lines):
+        update, pos = parse_update(lines, 0)
+        tans, _ = parse_tangents(lines, pos)
+        return update, tans
+    def convert(res):
+        convert_update(obj, res[0])
+        convert_tangents(obj, res[1])
+    return session_request(conn, "m", session_id, args, parse, convert)
+
+#Add a segment from the last anchor to point
+def session_extend(conn, obj, session_id, point):
+    return session_request(conn, "i", session_id, lambda: pbar2str(point), lambda lines: parse_update(lines, 0)[0],
+        lambda update: convert_update(obj, update))
+
+#Split the curve at t0 (integer part is the segment index)
+def session_split(conn, obj, session_id, t0):
+    return session_request(conn, "s", session_id, str(t0) + "\n", lambda lines: parse_update(lines, 0)[0],
+        lambda update: convert_update(obj, update))
+
+#Remove control points idx-1, idx, idx+1
+def session_delete(conn, obj, session_id, idx):
+    return session_request(conn, "x", session_id, str(idx) + "\n", lambda lines: parse_update(lines, 0)[0],
+        lambda update: convert_update(obj, update))
+
+def session_close(conn, obj, session_id, closed, smooth):
+    args = str(int(closed)) + "\n" + str(int(smooth)) + "\n"
+    return session_request(conn, "o", session_id, args, lambda lines: parse_update(lines, 0)[0],
+        lambda update: convert_update(obj, update))
+
+def session_tangents(conn, obj, session_id, idx):
+    return session_request(conn, "t", session_id, str(idx) + "\n", lambda lines: parse_tangents(lines, 0)[0],
+        lambda tans: convert_tangents(obj, tans))
+
+def session_end(conn, session_id):
+    return session_request(conn, "q", session_id, "", lambda lines: None)
+
+#Ramer-Douglas-Peucker: points are dropped while the polyline stays within tolerance of the original one
+#Output: (N, 3) array, first and last point always kept
+def simplify_polyline(points, tolerance):
+    points = np.array(points, dtype=np.float64).reshape(-1, 3)
+    if tolerance <= 0 or len(points) < 3: return points
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2: continue
+        a, ab = points[first], points[last] - points[first]
+        inner = points[first+1:last] - a
+        #Distance from the chord, from its end points beyond them
+        length2 = ab @ ab
+        t = np.clip(inner @ ab / length2, 0, 1) if length2 > 0 else np.zeros(len(inner))
+        dist = np.linalg.norm(inner - t[:, None] * ab, axis=1)
+        k = np.argmax(dist)
+        if dist[k] > tolerance:
+            mid = first + 1 + k
+            keep[mid] = True
+            stack += [(first, mid), (mid, last)]
+    return points[keep]
+
+#Converter of points in barycentric coords, faces (N) and uvs (N, 2), to world coords (N, 3) in bulk, as convert_coords
+#The mesh buffers are read once for all the points converted
+def bary_converter(obj):
+    co = np.empty(len(obj.data.vertices) * 3, dtype=np.float32)
+    obj.data.vertices.foreach_get("co", co)
+    vertices = co.reshape(-1, 3)
+    triangles = mesh_triangles(obj.data)
+    mat = np.array(obj.matrix_world)
+    def convert(faces, uvs):
+        tri = vertices[triangles[faces]] #(N, 3 corners, 3)
+        u, v = uvs[:, 0:1], uvs[:, 1:2]
+        return (tri[:, 0]*(1-u-v) + tri[:, 1]*u + tri[:, 2]*v) @ mat[:3, :3].T + mat[:3, 3]
+    return convert
 
-#Convert list of points in barycentric coordinates in 3d points
-def obj_to_world(ob, p):
-    mat = ob.matrix_world
-    mesh = ob.data
-    return mat@p
-"""
 #Convert list of points in barycentric coordinates in 3d points
 def convert_coords(ob, points):
     mat = ob.matrix_world
@@ -311,21 +749,34 @@ def convert_coords(ob, points):
     
     for i in range(len(points)):
         face_idx, a, b = points[i]
-        face = mesh.polygons[face_idx]
-        v1, v2, v3 = face.vertices
+        v1, v2, v3 = triangle_vertices(mesh, face_idx)
         points[i] = mat@(mesh.vertices[v1].co*(1-a-b) + mesh.vertices[v2].co*a + mesh.vertices[v3].co*b)
 
-#----------EDITING UTILS--------------------------------------------------------
-def triangulate_object(obj):
-    me = obj.data
-    bm = bmesh.new()
-    bm.from_mesh(me)
+#Control points of the anchors files of the engine (import_control_points): "face u v" lines, 4 for each segment
+#Output: list of single segment curves in barycentric coords
+def load_anchors(filename):
+    with open(filename) as f:
+        points = [parse_point(line) for line in f if line.strip()]
+    return [points[i:i+4] for i in range(0, len(points) - 3, 4)]
+
+#Points (x, y) in [0, 1] projected on obj from the view: the unit square is mapped to a square centered
+#in the region, size is its side relative to the smaller side of the region
+#Output: points in barycentric coords, None if a point misses obj
+def project_points(obj, region, rv3d, points, size):
+    side = size * min(region.width, region.height)
+    x0, y0 = (region.width - side) / 2, (region.height - side) / 2
+    matrix_inv = obj.matrix_world.inverted()
+    result = []
+    for x, y in points:
+        coord = (x0 + x * side, y0 + y * side)
+        origin = matrix_inv @ view3d_utils.region_2d_to_origin_3d(region, rv3d, coord)
+        direction = matrix_inv.to_3x3() @ view3d_utils.region_2d_to_vector_3d(region, rv3d, coord)
+        success, loc, normal, face_index = obj.ray_cast(origin, direction)
+        if not success: return None
+        result.append(hit_point(obj.data, face_index, loc))
+    return result
 
-    bmesh.ops.triangulate(bm, faces=bm.faces[:], quad_method='BEAUTY', ngon_method='BEAUTY')
-    
-    bm.to_mesh(me)
-    bm.free()
-    
+#----------EDITING UTILS--------------------------------------------------------
 def ray_cast(context, event, coord = None):
     """Run this function on left mouse, execute the ray cast"""
     # get the context arguments